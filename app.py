@@ -1,6 +1,7 @@
 import streamlit as st
-import pandas as pd
 import os
+import time
+import uuid
 
 # ==============================================================================
 # IMPORT FUNGSI ETL DARI main.py
@@ -15,30 +16,66 @@ st.set_page_config(page_title="Dashboard ETL Pendapatan", layout="centered", pag
 st.title("Generate Laporan Pendapatan")
 st.caption("Automated ETL Pipeline untuk Monitoring Laporan Excel")
 
+# Setiap job punya folder kerja sendiri (EtlJob.create): temp file & state relatif (HISTORY_DIR) tidak dibagi.
+# Registry mapping kolom SENGAJA dipakai bersama semua job (akses di bawah file_lock) supaya drift schema
+# antar upload tetap terdeteksi → path absolut, tidak ikut di-resolve ke folder job.
+SCHEMA_REGISTRY = os.path.abspath(main.CONFIG["SCHEMA_REGISTRY"]) if main.CONFIG.get("SCHEMA_REGISTRY") else None
+
 # ==============================================================================
 # HELPER FUNCTIONS
 # ==============================================================================
-def save_uploaded_file(uploaded_file, folder_path, filename):
-    """Simpan file upload dari Streamlit ke folder lokal"""
-    if uploaded_file is not None:
-        file_path = os.path.join(folder_path, filename)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        return file_path
-    return None
-
-def process_all_data(config):
-    """Wrapper untuk ETL pipeline dari main.py dengan config Streamlit"""
-    main.CONFIG.update(config)
-    
-    try:
-        m1, m2, raw, kode_nama_map = main.extract_data()
-        final = main.transform_data(m1, m2, raw, kode_nama_map)
-        main.load_data(final)
-        return config["OUTPUT_FILE"]
-    except Exception as e:
-        st.error(f"❌ Error ETL: {e}")
-        return None
+@st.cache_resource
+def get_stage_cache():
+    """Cache hasil extract+transform, satu untuk semua sesi (dibatasi STAGE_CACHE_MAX_MB)"""
+    return main.StageResultCache(main.CONFIG.get("STAGE_CACHE_MAX_MB", 512))
+
+@st.cache_resource
+def get_job_queue():
+    """Antrian job ETL background, satu untuk semua sesi (round-robin antar user)"""
+    return main.JobQueue()
+
+def get_owner_id():
+    """ID pemilik job, disimpan di URL supaya job tetap bisa diambil setelah browser reload"""
+    if "owner" not in st.query_params:
+        st.query_params["owner"] = uuid.uuid4().hex[:12]
+    return st.query_params["owner"]
+
+STAGE_LABEL = {
+    "baru": "Menunggu", "prefetch": "Prefetch input", "extract": "[1/3] Extract", "transform": "[2/3] Transform",
+    "load": "[3/3] Load (Dashboard & Summary)", "save": "[3/3] Menulis file Excel", "selesai": "Selesai", "gagal": "Gagal",
+}
+
+def show_job_status(status):
+    """Tampilkan status satu job: posisi antrian, stage berjalan, baris tertulis per sheet, tombol download"""
+    with st.container(border=True):
+        st.markdown(f"**Job `{status['job_id']}`** — {status['label']}.xlsx")
+        if status["state"] == "antri":
+            st.info(f"⏳ Dalam antrian (posisi {status['position']})")
+            return
+        if status["state"] == "gagal":
+            st.error(f"❌ Error ETL: {status['error']}")
+            return
+        st.caption(f"{STAGE_LABEL.get(status['stage'], status['stage'])} · {status['elapsed']:.0f} detik")
+        for sheet, info in status["sheets"].items():
+            total = info["total"] or 0
+            st.progress(min(info["rows"] / total, 1.0) if total else 1.0, text=f"{sheet}: {info['rows']:,}/{total:,} baris")
+        if status["state"] == "selesai":
+            output = get_job_queue().result(status["job_id"])
+            if output is None:
+                # Output dilepas dari memory server setelah di-download (atau terbuang batas JOB_HISTORY_MAX_MB)
+                st.info("📥 Laporan sudah di-download. Generate ulang kalau butuh file lagi.")
+                return
+            st.success("✅ Laporan berhasil dibuat!")
+            st.download_button(
+                " Download Laporan Excel",
+                output.getvalue(),
+                file_name=status["label"] + ".xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True,
+                on_click=get_job_queue().release_output,
+                args=(status["job_id"],),
+                key=f"download_{status['job_id']}"
+            )
 
 # ==============================================================================
 # MAIN UI
@@ -65,6 +102,8 @@ with st.sidebar:
     bulan_ini = st.selectbox("Bulan Ini (Data Raw)", BULAN_LIST, index=10, 
                              help="Bulan dari file data raw (misal: November untuk file 11 Lampiran Pendapatan November.xlsx)")
     output_filename = st.text_input("Nama File Output", "Laporan_Final")
+    values_mode = st.checkbox("Dashboard berisi angka (buka instan)", value=False,
+                              help="SUMIF Dashboard dihitung saat generate, rumus asli disimpan di sheet 'Audit Rumus'")
 
 # --- MAIN AREA ---
 st.markdown("### Proses ETL")
@@ -76,45 +115,40 @@ if process_btn:
     if not all([template_file, input_file, rekap_file, pelanggan_file, opt_file]):
         st.error("⚠️ Mohon lengkapi semua file upload di sidebar!")
     else:
-        # Setup folder temporary
-        folder = "temp_upload"
-        os.makedirs(folder, exist_ok=True)
-        
-        # Config untuk ETL
-        config = {
-            "TEMPLATE_FILE": save_uploaded_file(template_file, folder, "template.xlsx"),
-            "INPUT_FILE": save_uploaded_file(input_file, folder, "input.xlsx"),
-            "FILE_REKAP": save_uploaded_file(rekap_file, folder, "rekap.xlsx"),
-            "FILE_PELANGGAN": save_uploaded_file(pelanggan_file, folder, "pelanggan.xlsx"),
-            "FILE_OPT": save_uploaded_file(opt_file, folder, "opt.xlsx"),
-            "OUTPUT_FILE": os.path.join(folder, output_filename + ".xlsx"),
+        # Job ETL per klik: file upload langsung dibaca dari memory (tanpa simpan ke disk),
+        # output ditulis ke BytesIO. File di atas INMEMORY_MAX_MB otomatis di-spill ke temp file.
+        job = main.EtlJob.create({
+            "TEMPLATE_FILE": template_file,
+            "INPUT_FILE": input_file,
+            "FILE_REKAP": rekap_file,
+            "FILE_PELANGGAN": pelanggan_file,
+            "FILE_OPT": opt_file,
+            "OUTPUT_FILE": None,
             "BULAN_LALU": bulan_lalu,
             "BULAN_INI": bulan_ini,
             "DASHBOARD_HEADER_ROW": 2, 
-            "DASHBOARD_DATA_START": 3
-        }
-        
-        # Jalankan ETL
-        with st.spinner("⏳ Sedang memproses ETL Pipeline..."):
-            output_path = process_all_data(config)
+            "DASHBOARD_DATA_START": 3,
+            "OUTPUT_MODE": "values" if values_mode else "formula",
+            "SCHEMA_REGISTRY": SCHEMA_REGISTRY,
+        })
         
-        if output_path and os.path.exists(output_path):
-            st.success("✅ Laporan berhasil dibuat!")
-            
-            # Download button
-            with open(output_path, "rb") as f:
-                st.download_button(
-                    " Download Laporan Excel",
-                    f,
-                    file_name=output_filename + ".xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
-            
-            st.balloons()
-        else:
-            st.error("❌ Gagal membuat laporan. Silakan cek file input dan coba lagi.")
+        # Jalankan ETL di background: halaman tidak terblokir, status di-poll di bawah.
+        # Lampiran & Rekap sama dengan run sebelumnya (hanya bulan / nama output berubah) → hanya load_data yang jalan.
+        get_job_queue().submit(job, owner=get_owner_id(), stage_cache=get_stage_cache(), label=output_filename)
+
+# --- STATUS JOB (TERBARU DI ATAS) ---
+job_statuses = [get_job_queue().status(job_id) for job_id in reversed(get_job_queue().jobs_for(get_owner_id()))]
+job_statuses = [status for status in job_statuses if status is not None]
+for status in job_statuses:
+    show_job_status(status)
+    if status["state"] == "selesai" and status["job_id"] not in st.session_state.setdefault("celebrated", set()):
+        st.session_state["celebrated"].add(status["job_id"])
+        st.balloons()
 
 # --- FOOTER ---
 st.markdown("---")
 
+# --- POLLING: rerun sampai semua job sesi ini selesai ---
+if any(status["state"] in ("antri", "jalan") for status in job_statuses):
+    time.sleep(1.5)
+    st.rerun()
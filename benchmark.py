@@ -0,0 +1,558 @@
+"""Benchmark komponen ETL (jalankan manual, bukan bagian dari pipeline)
+
+Usage:
+    python benchmark.py cleansing --rows 10000 50000 200000
+    python benchmark.py unpivot --rows 10000 50000 --density 0.05
+    python benchmark.py realisasi --rows 10000 50000 100000
+    python benchmark.py pelanggan --rows 10000 50000 200000
+    python benchmark.py generate --out dummy_input --tier sedang
+    python benchmark.py pipeline --tiers kecil sedang besar --report bench.json [--baseline bench_lama.json]
+    python benchmark.py engines --tier sedang [--file lampiran.xlsx] [--xlsb lampiran.xlsb]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import main
+
+# ==============================================================================
+# DATA DUMMY
+# ==============================================================================
+def make_konsol_frame(n_rows, n_products=60, seed=0, density=0.1):
+    """DataFrame mirip sheet Konsol setelah rename (Customer Number, Customer Name, kode produk...)"""
+    rng = np.random.default_rng(seed)
+    cust_no = (2000000000 + np.arange(n_rows)).astype(object)
+    cust_name = np.array([f"PT Pelanggan {i}" for i in range(n_rows)], dtype=object)
+
+    # ~1% row sampah: summary pivot, nomor pendek, grand total
+    junk_idx = rng.choice(n_rows, size=max(n_rows // 100, 4), replace=False)
+    junk_kinds = [("Digital Platform", "Digital Platform"), (123, "short number"),
+                  (2000099999, "Sum of Value"), (2000088888, "Grand Total")]
+    for i, idx in enumerate(junk_idx):
+        cust_no[idx], cust_name[idx] = junk_kinds[i % len(junk_kinds)]
+
+    values = rng.integers(0, 10**7, size=(n_rows, n_products)) * (rng.random((n_rows, n_products)) < density)
+    df = pd.DataFrame(values, columns=main.CUSTOM_KODE_PRODUK_ORDER[:n_products])
+    df.insert(0, 'Customer Name', cust_name)
+    df.insert(0, 'Customer Number', cust_no)
+    return df
+
+# ==============================================================================
+# IMPLEMENTASI LAMA (row-wise, untuk pembanding)
+# ==============================================================================
+def legacy_cleanse_customer_rows(df_raw):
+    mask_grand_total = df_raw.apply(lambda row: row.astype(str).str.lower().str.contains('grand total', na=False).any(), axis=1)
+    df_raw = df_raw[~mask_grand_total].copy()
+
+    def is_valid_customer_row(row):
+        cust_no = str(row['Customer Number']).strip().replace('.0', '').replace('.', '')
+        cust_name = str(row.get('Customer Name', '')).lower().strip() if 'Customer Name' in row.index else ''
+        if not cust_no.isdigit():
+            return False
+        if len(cust_no) < 8:
+            return False
+        if cust_name in main.SUMMARY_NAME_EXACT:
+            return False
+        if any(keyword in cust_name for keyword in main.SUMMARY_NAME_KEYWORDS):
+            return False
+        return True
+
+    return df_raw[df_raw.apply(is_valid_customer_row, axis=1)].copy()
+
+# ==============================================================================
+# BENCHMARKS
+# ==============================================================================
+def _timeit(fn, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def bench_cleansing(row_counts, with_legacy=True):
+    """Bandingkan cleanse_customer_rows (vectorized) vs apply(axis=1) lama per jumlah row"""
+    print("🧹 Benchmark row cleansing (Grand Total + pivot summary filter)")
+    print(f"   {'rows':>10} | {'vectorized':>12} | {'per 1k rows':>12} | {'legacy':>10} | {'speedup':>8}")
+    for n in row_counts:
+        df = make_konsol_frame(n)
+        t_new, (df_new, report) = _timeit(lambda: main.cleanse_customer_rows(df))
+        per_k = t_new / n * 1000
+        if with_legacy:
+            t_old, df_old = _timeit(lambda: legacy_cleanse_customer_rows(df), repeat=1)
+            assert df_old.index.equals(df_new.index), "Hasil vectorized beda dengan implementasi lama!"
+            print(f"   {n:>10,} | {t_new:>11.4f}s | {per_k:>11.5f}s | {t_old:>9.3f}s | {t_old / t_new:>7.1f}x")
+        else:
+            print(f"   {n:>10,} | {t_new:>11.4f}s | {per_k:>11.5f}s | {'-':>10} | {'-':>8}")
+    print(f"   Drop per rule (n={row_counts[-1]:,}): {report}")
+
+def _measure(fn):
+    """(detik, peak memori MB via tracemalloc, hasil)
+
+    Waktu diukur di run terpisah tanpa tracemalloc (tracing memperlambat alokasi kecil).
+    """
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, result
+
+def legacy_melt_unpivot(df_raw, id_cols, prod_cols):
+    df_melt = pd.melt(df_raw, id_vars=id_cols, value_vars=prod_cols, var_name='Produk_Raw', value_name='Value')
+    df_melt['Value'] = pd.to_numeric(df_melt['Value'], errors='coerce').fillna(0)
+    return df_melt[df_melt['Value'] != 0].copy()
+
+def bench_unpivot(row_counts, density, n_products):
+    """Peak memori & waktu: pd.melt + filter vs sparse_unpivot (koordinat nonzero)"""
+    print(f"🔄 Benchmark unpivot Konsol ({n_products} produk, density nonzero {density:.0%})")
+    print(f"   {'rows':>10} | {'long rows':>10} | {'melt time':>10} | {'melt peak':>10} | {'sparse time':>11} | {'sparse peak':>11}")
+    for n in row_counts:
+        df = make_konsol_frame(n, n_products=n_products, density=density)
+        id_cols = ['Customer Number', 'Customer Name']
+        prod_cols = [c for c in df.columns if c not in id_cols]
+        t_melt, peak_melt, df_melt = _measure(lambda: legacy_melt_unpivot(df, id_cols, prod_cols))
+        t_sparse, peak_sparse, df_sparse = _measure(lambda: main.sparse_unpivot(df, id_cols, prod_cols))
+        assert len(df_melt) == len(df_sparse) and (df_melt['Value'].to_numpy() == df_sparse['Value'].to_numpy()).all()
+        print(f"   {n:>10,} | {len(df_sparse):>10,} | {t_melt:>9.3f}s | {peak_melt:>8.1f}MB | {t_sparse:>10.3f}s | {peak_sparse:>9.1f}MB")
+
+def make_realisasi_frame(n_rows, seed=0):
+    """DataFrame mirip df_final (kolom Realisasi)"""
+    rng = np.random.default_rng(seed)
+    kode = rng.choice(main.CUSTOM_KODE_PRODUK_ORDER, size=n_rows).astype(str)
+    return pd.DataFrame({
+        'Customer Number': 2000000000 + rng.integers(0, n_rows, size=n_rows),
+        'Customer Name': [f"PT Pelanggan {i}" for i in rng.integers(0, n_rows, size=n_rows)],
+        'Kode Produk': kode,
+        'Produk/Layanan': np.char.add('Produk Layanan ', kode),
+        'Value': rng.integers(1, 10**7, size=n_rows),
+        'Business Portofolio Segment 0': 'Digital', 'Kode 0': 'K0',
+        'Product Portofolio Segmen 1': 'Seg 1', 'Kode 1': 'K1',
+        'Product Portofolio Segmen 2': 'Seg 2', 'Kode 2': 'K2',
+        'Product Portofolio Segmen 3': 'Seg 3', 'Kode 3': 'K3', 'SEGMEN': 'SEG',
+    })
+
+def legacy_write_realisasi(df, path):
+    from openpyxl import Workbook
+    from openpyxl.utils.dataframe import dataframe_to_rows
+    wb = Workbook()
+    ws = wb.active
+    for c, name in enumerate(df.columns, 1): ws.cell(1, c).value = name
+    for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=False), 2):
+        for c_idx, val in enumerate(row, 1): ws.cell(r_idx, c_idx).value = val
+    wb.save(path)
+
+def streamed_write_realisasi(df, path):
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    for c, name in enumerate(df.columns, 1): ws.cell(1, c).value = name
+    main.save_workbook_streaming(wb, path, {ws.title: main.StreamedSheetRows(df, start_row=2)})
+
+def bench_realisasi(row_counts):
+    """Waktu & peak memori tulis sheet Realisasi: cell loop openpyxl vs StreamedSheetRows"""
+    print("💾 Benchmark tulis sheet Realisasi (14 kolom)")
+    print(f"   {'rows':>10} | {'cell loop':>10} | {'loop peak':>10} | {'streaming':>10} | {'stream peak':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in row_counts:
+            df = make_realisasi_frame(n)
+            path = os.path.join(tmp, "out.xlsx")
+            t_old, peak_old, _ = _measure(lambda: legacy_write_realisasi(df, path))
+            t_new, peak_new, _ = _measure(lambda: streamed_write_realisasi(df, path))
+            print(f"   {n:>10,} | {t_old:>9.2f}s | {peak_old:>8.1f}MB | {t_new:>9.2f}s | {peak_new:>9.1f}MB")
+
+BULAN = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli", "Agustus",
+         "September", "Oktober", "November", "Desember"]
+
+def make_pelanggan_frame(n_rows, seed=0):
+    """DataFrame mirip export Data Pelanggan (id, kode produk, tanggal invalid '--/--/--', revenue per bulan)"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'idPerusahaan': np.arange(n_rows),
+        'idCustomerSap': 2000000000 + np.arange(n_rows),
+        'namaPerusahaan': [f"PT Pelanggan {i}" for i in range(n_rows)],
+        'kodeMasterProduk': rng.choice(main.CUSTOM_KODE_PRODUK_ORDER, size=n_rows),
+        'tanggalMulai': rng.choice(np.array(['--/--/--', '2025-01-01', None], dtype=object), size=n_rows),
+    })
+    for prefix in ('carryOver', 'newRevenue'):
+        for b in BULAN:
+            df[f"{prefix}{b}"] = np.where(rng.random(n_rows) < 0.3, rng.random(n_rows) * 1e6, np.nan)
+    return df
+
+def make_pelanggan_template(n_formulas=12):
+    """Workbook dengan sheet 'Data Pelanggan': header row 3, formula template di row 4"""
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data Pelanggan"
+    df_head = make_pelanggan_frame(1)
+    for c, name in enumerate(df_head.columns, 1):
+        ws.cell(3, c).value = 'Nama Pelanggan' if name == 'namaPerusahaan' else name
+    first_formula_col = len(df_head.columns) + 1
+    for i in range(n_formulas):
+        col = first_formula_col + i
+        ws.cell(3, col).value = f"Kalkulasi {i}"
+        ws.cell(4, col).value = f'=IF(D4>0,SUM(F4:Q4)*{i + 1},$A$4)'
+    return wb, ws
+
+def legacy_write_pelanggan(df, raw_to_template, path):
+    """Loop lama update_sheet_pelanggan: iterrows + re.sub formula per cell + ws.cell"""
+    import re
+    wb, ws = make_pelanggan_template()
+    template_formulas = {c: ws.cell(4, c).value for c in range(1, ws.max_column + 1)
+                         if isinstance(ws.cell(4, c).value, str) and ws.cell(4, c).value.startswith('=')}
+    ws.delete_rows(4, ws.max_row - 3)
+    for row_idx, row_data in df.iterrows():
+        excel_row = row_idx + 4
+        for raw_col, template_col_idx in raw_to_template.items():
+            val = row_data[raw_col]
+            if pd.notna(val):
+                if str(val).strip() in main.INVALID_CELL_STRINGS:
+                    continue
+                ws.cell(excel_row, template_col_idx).value = val
+        for col_idx, formula_template in template_formulas.items():
+            if col_idx in raw_to_template.values():
+                continue
+            ws.cell(excel_row, col_idx).value = re.sub(r'([A-Z]+)4\b', r'\g<1>' + str(excel_row), formula_template)
+    wb.save(path)
+
+def bulk_write_pelanggan(df, raw_to_template, path):
+    wb, ws = make_pelanggan_template()
+    stream = main.prepare_bulk_rows(ws, df, raw_to_template, start_row=4)
+    main.save_workbook_streaming(wb, path, {ws.title: stream})
+
+def bench_pelanggan(row_counts, with_legacy=True):
+    """Waktu & peak memori tulis Data Pelanggan: loop per cell lama vs prepare_bulk_rows + streaming"""
+    print("👥 Benchmark tulis sheet Data Pelanggan (29 kolom raw + 12 kolom formula)")
+    print(f"   {'rows':>10} | {'cell loop':>10} | {'loop peak':>10} | {'bulk':>10} | {'bulk peak':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in row_counts:
+            df = make_pelanggan_frame(n)
+            raw_to_template = {c: i for i, c in enumerate(df.columns, 1)}
+            path = os.path.join(tmp, "out.xlsx")
+            t_new, peak_new, _ = _measure(lambda: bulk_write_pelanggan(df, raw_to_template, path))
+            if with_legacy:
+                t_old, peak_old, _ = _measure(lambda: legacy_write_pelanggan(df, raw_to_template, path))
+                print(f"   {n:>10,} | {t_old:>9.2f}s | {peak_old:>8.1f}MB | {t_new:>9.2f}s | {peak_new:>8.1f}MB")
+            else:
+                print(f"   {n:>10,} | {'-':>10} | {'-':>10} | {t_new:>9.2f}s | {peak_new:>8.1f}MB")
+
+# ==============================================================================
+# INPUT SINTETIS (PENGGANTI FILE ASLI YANG RAHASIA)
+# ==============================================================================
+# Ukuran input per tier: customer Konsol, produk (kolom kode), baris export Pelanggan/OPT
+TIERS = {
+    "kecil": dict(customers=1000, products=61, pelanggan_rows=2000),
+    "sedang": dict(customers=5000, products=61, pelanggan_rows=10000),
+    "besar": dict(customers=20000, products=61, pelanggan_rows=50000),
+}
+UNKNOWN_KODES = [120, 121, 999]  # kode di Lampiran yang tidak ada di 61 kode (di-drop saat sort Realisasi)
+TEMPLATE_OLD_ROWS = 500  # baris data lama di sheet Data Pelanggan/OPT template (ditimpa saat load)
+
+def _write_only_workbook(path, sheets):
+    """Tulis {nama sheet: iterable row} dengan openpyxl write_only (cepat untuk jutaan cell)"""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for title, rows in sheets.items():
+        ws = wb.create_sheet(title)
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+
+def _konsol_rows(kodes, n_customers, density, rng):
+    """Sheet Konsol: 1 row judul, row nama produk, row header (Customer No + kode), data + row sampah"""
+    yield ["Lampiran Pendapatan"]
+    yield [None, None] + [f"Produk Layanan {k}" for k in kodes] + [None]
+    yield ["Customer No", "Customer Name"] + list(kodes) + ["Grand Total"]
+    values = rng.integers(1, 10**7, size=(n_customers, len(kodes))) * (rng.random((n_customers, len(kodes))) < density)
+    for i in range(n_customers):
+        row_vals = [int(v) if v else None for v in values[i]]
+        yield [2000000000 + i, f"PT Pelanggan {i}"] + row_vals + [int(values[i].sum())]
+        if i % 500 == 0:
+            # Row summary pivot / nomor pendek yang harus dibuang cleanse_customer_rows
+            yield ["Digital Platform", "Digital Platform"] + [1] * len(kodes) + [None]
+            yield [None, "Subtotal"] + [1] * len(kodes) + [None]
+            yield [123, "short number"] + [1] * len(kodes) + [None]
+    yield ["Grand Total", None] + [int(v) for v in values.sum(axis=0)] + [int(values.sum())]
+
+def _rekap_sheets(kodes):
+    cols = ['No', 'ICON+ Product', 'Business Portofolio Segment 0', 'Kode 0', 'Product Portofolio Segmen 1', 'Kode 1',
+            'Product Portofolio Segmen 2', 'Kode 2', 'Product Portofolio Segmen 3', 'Kode 3', 'SEGMEN']
+    pdf = [["Rekap Validasi Kode Produk"], [], cols]
+    for j, k in enumerate(kodes):
+        pdf.append([j + 1, float(k), f"BPS {k % 3}", f"K0{k % 3}", f"Produk Layanan {k}", f"K1{k}",
+                    f"Seg2 {k}", f"K2{k}", f"Seg3 {k}", f"K3{k}", f"SEG {k % 4}"])
+        if j % 10 == 0:
+            pdf.append([j + 1, float(k), "duplikat", None, None, None, None, None, None, None, None])
+    sap = [["Data SAP"], ["Nama Produk", "Kode di SAP"]] + [[f"Produk SAP {k}", float(k)] for k in kodes[:10]]
+    return {"ALL PRODUCT PDF": pdf, "Data SAP": sap}
+
+def _export_rows(special_col, n_rows, kodes, rng):
+    """Export sistem Data Pelanggan/OPT: header row 1, carryOver/newRevenue per bulan"""
+    yield (['idPerusahaan', 'idCustomerSap', 'idPelanggan', special_col, 'nomorKontrak', 'kodeMasterProduk',
+            'namaMasterProduk', 'tanggalMulai'] + [f"carryOver{b}" for b in BULAN] + [f"newRevenue{b}" for b in BULAN])
+    kode_choice = rng.choice(np.array(list(kodes) + [None, "--"], dtype=object), size=n_rows)
+    tanggal = rng.choice(np.array(["--/--/--", "2025-01-01", None], dtype=object), size=n_rows)
+    revenue = np.where(rng.random((n_rows, 24)) < 0.3, np.round(rng.random((n_rows, 24)) * 1e6, 2), np.nan)
+    for i in range(n_rows):
+        yield ([i, 2000000000 + i, f"P{i}", f"PT Pelanggan {i}", f"K-{i:06d}", kode_choice[i],
+                f"Produk Layanan {kode_choice[i]}", tanggal[i]] + [None if v != v else float(v) for v in revenue[i]])
+
+def _make_template(path, kodes, bulan_lalu_idx):
+    """Template BANGER: Dashboard (61 kode + Grand Total row 64), Summary, Realisasi bulan lalu, Data Pelanggan/OPT"""
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Dashboard"
+    ws.cell(1, 1).value = "DASHBOARD PENDAPATAN"
+    header = (["Kode Produk", "Nama Produk"] + [f"Info {i}" for i in range(7)] + [f"Kumulatif {b}" for b in BULAN]
+              + ["Sisa"] + [f"SA {b}" for b in BULAN])
+    for c, h in enumerate(header, 1):
+        ws.cell(2, c).value = h
+    for r, k in enumerate(main.CUSTOM_KODE_PRODUK_ORDER, 3):
+        ws.cell(r, 1).value = k
+        ws.cell(r, 2).value = f"Produk Layanan {k}"
+        for m in range(bulan_lalu_idx + 1):
+            ws.cell(r, 10 + m).value = float(r * 1000 * (m + 1))  # Kumulatif s.d. bulan lalu
+            ws.cell(r, 23 + m).value = float(r * 1000)              # SA per bulan
+        ws.cell(r, 5).value = f"=SUMIF('Data Pelanggan'!$AO$4:$AO$12429,A{r},'Data Pelanggan'!$AY$4:$AY$12429)"
+    ws.cell(64, 1).value = "Grand Total"
+    summary = wb.create_sheet("Summary")
+    summary["B2"], summary["C2"] = "Target Desember", f"Realisasi {BULAN[bulan_lalu_idx]}"
+    summary["B3"], summary["C3"] = 326470130576, "=Dashboard!U64"
+    realisasi = wb.create_sheet(f"Realisasi {BULAN[bulan_lalu_idx]}")
+    realisasi.append(["Customer Number", "Customer Name", "Kode Produk", "Produk/Layanan", "Value"])
+    for i in range(TEMPLATE_OLD_ROWS):
+        realisasi.append([2000000000 + i, f"PT Pelanggan {i}", str(kodes[i % len(kodes)]), "lama", 1])
+    for name, special, label_col in (("Data Pelanggan", "Nama Pelanggan", 47), ("Data OPT", "hargaInstallasi", 83)):
+        sheet = wb.create_sheet(name)
+        sheet.cell(2, label_col).value = "Bulan Berjalan"
+        sheet.cell(2, label_col + 1).value = bulan_lalu_idx + 1
+        heads = ['idPerusahaan', 'idCustomerSap', 'idPelanggan', special, 'nomor kontrak', 'kodeMasterProduk',
+                 'namaMasterProduk', 'tanggalMulai']
+        for c, h in enumerate(heads, 1):
+            sheet.cell(3, c).value = h
+        for b_i, b in enumerate(BULAN):
+            sheet.cell(3, 51 + b_i).value = f"carryOver{b}"
+            sheet.cell(3, 63 + b_i).value = f"newRevenue{b}"
+        sheet.cell(3, 41).value, sheet.cell(3, 42).value = "Kode Gabung", "Total"
+        for r in range(4, 4 + TEMPLATE_OLD_ROWS):
+            for c in range(1, 9):
+                sheet.cell(r, c).value = f"lama{r}"
+            sheet.cell(r, 41).value = f"=F{r}"
+            sheet.cell(r, 42).value = f"=SUM(AY{r}:BV{r})"
+        sheet.cell(1, 42).value = f"=SUBTOTAL(9,AP4:AP{3 + TEMPLATE_OLD_ROWS})"
+    wb.save(path)
+
+def generate_inputs(out_dir, customers=1000, products=61, pelanggan_rows=2000, density=0.1,
+                    bulan_ini="Desember", seed=0):
+    """Tulis 5 file input sintetis (Lampiran, Rekap, Pelanggan, OPT, Template) ke out_dir
+    
+    Returns:
+        dict override CONFIG (path file + BULAN_LALU/BULAN_INI) siap dipakai main.EtlJob
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    kodes = main.CUSTOM_KODE_PRODUK_ORDER[:products] + UNKNOWN_KODES
+    bulan_idx = BULAN.index(bulan_ini)
+    paths = {key: os.path.join(out_dir, name) for key, name in (
+        ("INPUT_FILE", "lampiran.xlsx"), ("FILE_REKAP", "rekap.xlsx"), ("FILE_PELANGGAN", "pelanggan.xlsx"),
+        ("FILE_OPT", "opt.xlsx"), ("TEMPLATE_FILE", "template.xlsx"))}
+    _write_only_workbook(paths["INPUT_FILE"], {"Data Konsol": _konsol_rows(kodes, customers, density, rng)})
+    _write_only_workbook(paths["FILE_REKAP"], _rekap_sheets(kodes[:-1]))
+    _write_only_workbook(paths["FILE_PELANGGAN"], {"Sheet1": _export_rows("namaPerusahaan", pelanggan_rows, kodes, rng)})
+    _write_only_workbook(paths["FILE_OPT"], {"Sheet1": _export_rows("hargaInstalasi", pelanggan_rows, kodes, rng)})
+    _make_template(paths["TEMPLATE_FILE"], kodes, bulan_idx - 1)
+    return {**paths, "BULAN_LALU": BULAN[bulan_idx - 1], "BULAN_INI": bulan_ini}
+
+# ==============================================================================
+# BENCHMARK SELURUH PIPELINE (PER STAGE, PER TIER)
+# ==============================================================================
+PIPELINE_STAGES = ["extract", "transform", "realisasi", "dashboard_formulas", "update_sheet Data Pelanggan",
+                   "update_sheet Data OPT", "update_dashboard_sumif_formulas", "save"]
+
+def run_pipeline_tier(tier, params, tmp):
+    """Generate input tier lalu jalankan EtlJob penuh (tanpa cache/prefetch), return hasil per stage"""
+    t0 = time.perf_counter()
+    config = generate_inputs(os.path.join(tmp, tier), **params)
+    t_generate = time.perf_counter() - t0
+    job = main.EtlJob({**config, "OUTPUT_FILE": os.path.join(tmp, tier, "output.xlsx"),
+                       "USE_CACHE": False, "PREFETCH_WORKERS": 0})
+    t0 = time.perf_counter()
+    job.run()
+    total = time.perf_counter() - t0
+    stages = {}
+    for r in job.profiler.stages:
+        stages.setdefault(r["name"], {k: r.get(k) for k in ("wall_s", "cpu_s", "rss_mb", "rows_in", "rows_out")})
+    return {"params": params, "generate_s": round(t_generate, 2), "total_s": round(total, 2), "stages": stages}
+
+def _scaling(results):
+    """Detik per 1.000 baris Konsol per stage antar tier (naik tajam = tidak linear)"""
+    curves = {}
+    for stage in PIPELINE_STAGES + ["total"]:
+        curves[stage] = {}
+        for tier, res in results.items():
+            wall = res["total_s"] if stage == "total" else (res["stages"].get(stage) or {}).get("wall_s")
+            if wall is not None:
+                curves[stage][tier] = round(wall / res["params"]["customers"] * 1000, 4)
+    return curves
+
+def compare_baseline(results, baseline, tolerance):
+    """Stage yang melambat > tolerance (dan > 0.5 detik absolut) dibanding report baseline"""
+    regressions = []
+    for tier, res in results.items():
+        old = baseline.get("tiers", {}).get(tier)
+        if not old:
+            continue
+        pairs = [("total", res["total_s"], old["total_s"])]
+        pairs += [(stage, (res["stages"].get(stage) or {}).get("wall_s"), (old["stages"].get(stage) or {}).get("wall_s"))
+                  for stage in PIPELINE_STAGES]
+        for stage, new_s, old_s in pairs:
+            if new_s is not None and old_s and new_s > old_s * (1 + tolerance) and new_s - old_s > 0.5:
+                regressions.append((tier, stage, old_s, new_s))
+    return regressions
+
+def bench_pipeline(tiers, report_path=None, baseline_path=None, tolerance=0.25):
+    """Waktu per stage seluruh pipeline (extract → save) untuk beberapa ukuran input sintetis"""
+    print(f"🏭 Benchmark pipeline penuh per tier: {', '.join(tiers)}")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for tier in tiers:
+            results[tier] = run_pipeline_tier(tier, TIERS[tier], tmp)
+    
+    short = {"update_sheet Data Pelanggan": "pelanggan", "update_sheet Data OPT": "opt",
+             "update_dashboard_sumif_formulas": "sumif", "dashboard_formulas": "dashboard"}
+    names = [short.get(s, s) for s in PIPELINE_STAGES]
+    print(f"   {'tier':>8} | {'customers':>9} | {'rows out':>9} | " + " | ".join(f"{n:>9}" for n in names) + f" | {'total':>8}")
+    for tier, res in results.items():
+        rows_out = (res["stages"].get("transform") or {}).get("rows_out") or 0
+        walls = [(res["stages"].get(s) or {}).get("wall_s") for s in PIPELINE_STAGES]
+        cells = " | ".join(f"{w:>8.2f}s" if w is not None else f"{'-':>9}" for w in walls)
+        print(f"   {tier:>8} | {res['params']['customers']:>9,} | {rows_out:>9,} | {cells} | {res['total_s']:>7.2f}s")
+    curves = _scaling(results)
+    print("   Detik per 1k customer (scaling): " + ", ".join(f"{tier}={v}" for tier, v in curves["total"].items()))
+    
+    report = {"generated": time.strftime("%Y-%m-%dT%H:%M:%S"), "tiers": results, "scaling_s_per_1k_customers": curves}
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"   Report disimpan: {report_path}")
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = compare_baseline(results, json.load(f), tolerance)
+        for tier, stage, old_s, new_s in regressions:
+            print(f"   ⚠️  REGRESI {tier}/{stage}: {old_s:.2f}s → {new_s:.2f}s")
+        if not regressions:
+            print(f"   ✅ Tidak ada regresi > {tolerance:.0%} dibanding {baseline_path}")
+        return not regressions
+    return True
+
+# ==============================================================================
+# ENGINE BACA EXCEL (OPENPYXL vs CALAMINE vs PYXLSB)
+# ==============================================================================
+def _read_konsol(path, engine):
+    """Buka + probe header + baca full sheet Konsol (tanpa cache), seperti extract_data"""
+    with main.WorkbookStream(path, engine) as book:
+        sheet = next(s for s in book.sheet_names if "Konsol" in s)
+        return book.read_frame_with_probe(sheet, main.find_konsol_header_row)[2]
+
+def bench_engines(paths, repeat=3):
+    """Waktu baca Lampiran per engine yang ter-install (+ pd.read_excel openpyxl sebagai acuan), cek hasil identik"""
+    print("📖 Benchmark engine baca Excel (open + probe header + full read sheet Konsol)")
+    print(f"   {'file':>20} | {'format':>6} | {'engine':>18} | {'waktu':>8} | {'speedup':>7} | hasil")
+    for path in paths:
+        fmt = main.detect_excel_format(path)
+        engines = [e for e in main.EXCEL_ENGINES[fmt] if importlib.util.find_spec(main._ENGINE_MODULES[e])]
+        timings = {}
+        if fmt == "xlsx":
+            sheet = next(s for s in pd.ExcelFile(path).sheet_names if "Konsol" in s)
+            timings["pd.read_excel"] = (_timeit(lambda: pd.read_excel(path, sheet_name=sheet, header=None), repeat)[0], None)
+        reference = None
+        for engine in engines:
+            t, df = _timeit(lambda: _read_konsol(path, engine), repeat)
+            if reference is None:
+                reference, same = df, "acuan"
+            else:
+                same = "identik" if df.equals(reference) else "⚠️ BEDA"
+            timings[engine] = (t, same)
+        slowest = max(t for t, _ in timings.values())
+        for engine, (t, same) in timings.items():
+            print(f"   {os.path.basename(path):>20} | {fmt:>6} | {engine:>18} | {t:>7.2f}s | {slowest / t:>6.1f}x | {same or '-'}")
+        missing = [e for e in main.EXCEL_ENGINES[fmt] if e not in engines]
+        if missing:
+            print(f"   (engine tidak ter-install untuk {fmt}: {', '.join(missing)})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark komponen ETL")
+    sub = parser.add_subparsers(dest="suite", required=True)
+
+    p_clean = sub.add_parser("cleansing", help="Row cleansing engine extract_data")
+    p_clean.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000, 200000])
+    p_clean.add_argument("--no-legacy", action="store_true", help="Skip implementasi lama (lambat di row besar)")
+
+    p_unpivot = sub.add_parser("unpivot", help="Peak memori pd.melt vs sparse unpivot transform_data")
+    p_unpivot.add_argument("--rows", type=int, nargs="+", default=[10000, 50000, 100000])
+    p_unpivot.add_argument("--density", type=float, default=0.08, help="Proporsi cell nonzero (Konsol biasanya < 10%%)")
+    p_unpivot.add_argument("--products", type=int, default=61)
+
+    p_real = sub.add_parser("realisasi", help="Tulis sheet Realisasi: cell loop vs streaming XML")
+    p_real.add_argument("--rows", type=int, nargs="+", default=[10000, 50000, 100000])
+
+    p_pel = sub.add_parser("pelanggan", help="Tulis Data Pelanggan/OPT: loop per cell vs bulk writer")
+    p_pel.add_argument("--rows", type=int, nargs="+", default=[10000, 50000, 200000])
+    p_pel.add_argument("--no-legacy", action="store_true", help="Skip implementasi lama (lambat di row besar)")
+
+    p_gen = sub.add_parser("generate", help="Tulis 5 file input sintetis (untuk run manual main.py)")
+    p_gen.add_argument("--out", default="dummy_input", help="Folder output")
+    p_gen.add_argument("--tier", choices=list(TIERS), default="kecil")
+    p_gen.add_argument("--customers", type=int, help="Override jumlah customer Konsol")
+    p_gen.add_argument("--pelanggan-rows", type=int, help="Override jumlah baris export Pelanggan/OPT")
+    p_gen.add_argument("--bulan", default="Desember", help="Bulan ini (template = bulan sebelumnya)")
+
+    p_pipe = sub.add_parser("pipeline", help="Waktu per stage seluruh pipeline di beberapa ukuran input")
+    p_pipe.add_argument("--tiers", nargs="+", choices=list(TIERS), default=["kecil", "sedang"])
+    p_pipe.add_argument("--report", help="Simpan hasil (JSON) untuk jadi baseline run berikutnya")
+    p_pipe.add_argument("--baseline", help="Report JSON lama: tandai stage yang melambat")
+    p_pipe.add_argument("--tolerance", type=float, default=0.25, help="Batas perlambatan relatif (default 0.25 = 25%%)")
+
+    p_eng = sub.add_parser("engines", help="Waktu baca Lampiran: openpyxl vs calamine (vs pyxlsb untuk .xlsb)")
+    p_eng.add_argument("--tier", choices=list(TIERS), default="sedang", help="Ukuran Lampiran sintetis")
+    p_eng.add_argument("--file", help="Pakai file Lampiran ini (default: generate sintetis)")
+    p_eng.add_argument("--xlsb", help="File Lampiran .xlsb tambahan (tidak ada writer xlsb untuk data sintetis)")
+    p_eng.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.suite == "generate":
+        params = dict(TIERS[args.tier])
+        if args.customers:
+            params["customers"] = args.customers
+        if args.pelanggan_rows:
+            params["pelanggan_rows"] = args.pelanggan_rows
+        config = generate_inputs(args.out, bulan_ini=args.bulan, **params)
+        print(f"✅ Input sintetis ({args.tier}: {params}) ditulis ke '{args.out}':")
+        print(json.dumps(config, indent=2))
+    elif args.suite == "pipeline":
+        if not bench_pipeline(args.tiers, args.report, args.baseline, args.tolerance):
+            raise SystemExit(1)
+    elif args.suite == "engines":
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [args.file or generate_inputs(tmp, **TIERS[args.tier])["INPUT_FILE"]]
+            bench_engines(paths + ([args.xlsb] if args.xlsb else []), args.repeat)
+    elif args.suite == "cleansing":
+        bench_cleansing(args.rows, with_legacy=not args.no_legacy)
+    elif args.suite == "unpivot":
+        bench_unpivot(args.rows, args.density, args.products)
+    elif args.suite == "realisasi":
+        bench_realisasi(args.rows)
+    elif args.suite == "pelanggan":
+        bench_pelanggan(args.rows, with_legacy=not args.no_legacy)
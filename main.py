@@ -1,11 +1,30 @@
 import pandas as pd
 import numpy as np
-import shutil
 import os
+import io
+import re
+import json
+import hashlib
+import functools
+import datetime
+import difflib
+import time
+import uuid
+import tempfile
+import threading
+import tracemalloc
 import warnings
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import openpyxl
 from openpyxl import load_workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.utils import get_column_letter
+from openpyxl.utils import get_column_letter, column_index_from_string
+from openpyxl.utils.datetime import to_excel
+from openpyxl.cell.cell import Cell, MergedCell, ILLEGAL_CHARACTERS_RE, ERROR_CODES
+from openpyxl.utils.exceptions import IllegalCharacterError
+from xml.sax.saxutils import escape as xml_escape
 
 # Matikan warning agar terminal bersih
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
@@ -23,7 +42,51 @@ CONFIG = {
     "BULAN_LALU": "November",   
     "BULAN_INI": "Desember",   
     "DASHBOARD_HEADER_ROW": 2, 
-    "DASHBOARD_DATA_START": 3
+    "DASHBOARD_DATA_START": 3,
+    # "sparse" = unpivot hanya cell nonzero (hemat memori), "melt" = pd.melt lama
+    "UNPIVOT_MODE": "sparse",
+    # Cache hasil parsing workbook input (key = hash isi file + sheet + header)
+    "USE_CACHE": True,
+    "CACHE_DIR": ".etl_cache",
+    "CACHE_MAX_MB": 1024,
+    # Engine baca workbook input: "auto" = tercepat yang ter-install sesuai format asli file (magic bytes),
+    # atau paksa "calamine" / "openpyxl" / "pyxlsb"
+    "EXCEL_ENGINE": "auto",
+    # Jumlah proses untuk parse workbook input paralel di awal run (0 = baca berurutan per stage)
+    "PREFETCH_WORKERS": 4,
+    # Nama file output mode batch (--batch), field: {no} nomor bulan, {bulan}/{BULAN} nama bulan
+    "BATCH_OUTPUT_PATTERN": "{no:02d} BANGER {BULAN}.xlsx",
+    # Batas memory cache hasil extract+transform di app Streamlit (dipakai bersama semua sesi)
+    "STAGE_CACHE_MAX_MB": 512,
+    # Input bytes/file-like (upload) di atas batas ini ditulis ke temp file, di bawahnya tetap di memory
+    "INMEMORY_MAX_MB": 100,
+    # Antrian job background app Streamlit: jumlah thread pemroses & jumlah job selesai yang disimpan
+    "JOB_WORKERS": 1,
+    "JOB_HISTORY_MAX": 50,
+    # Batas total ukuran output (BytesIO) job selesai yang ditahan di memory; job terlama dibuang duluan
+    "JOB_HISTORY_MAX_MB": 256,
+    # Profiling per stage: path report JSON (None = tidak ditulis), peak memory via tracemalloc (lebih lambat)
+    "PROFILE_REPORT": None,
+    "PROFILE_MEMORY": False,
+    # "formula" = SUMIF live di Dashboard, "values" = angka hasil groupby pandas (file buka instan)
+    "OUTPUT_MODE": "formula",
+    # Mode values: simpan rumus SUMIF asli sebagai teks di sheet audit
+    "AUDIT_SHEET": True,
+    # Hitung rumus (SUM/SUMIF/SUBTOTAL/aritmetika) di Python → file output punya cached value untuk data_only=True
+    "CACHED_VALUES": True,
+    # Riwayat per bulan (Parquet append-only, partisi tahun/bulan), opt-in per job; path relatif = folder kerja job.
+    # None = tidak disimpan / tidak dibaca. Saldo bulan lalu tetap dari template, history hanya cadangan
+    "HISTORY_DIR": None,
+    # Tahun laporan BULAN_INI, WAJIB kalau HISTORY_DIR diisi; BULAN_LALU Desember saat BULAN_INI Januari = tahun sebelumnya
+    "TAHUN": None,
+    # Kolom raw export yang namanya beda dengan header template row 3: {sheet: {kolom raw: header template}}
+    "SPECIAL_COLUMN_MAPPINGS": {
+        "Data Pelanggan": {"namaPerusahaan": "Nama Pelanggan"},
+        "Data OPT": {"hargaInstalasi": "hargaInstallasi"},  # template pakai 2L, raw 1L
+    },
+    # Registry mapping kolom raw → template per fingerprint header (JSON, path relatif = folder kerja job);
+    # None = hitung ulang tiap run
+    "SCHEMA_REGISTRY": ".etl_schema_mappings.json"
 }
 
 # === CUSTOM SORT ORDER untuk kodeMasterProduk (dari mentor) ===
@@ -41,6 +104,15 @@ def super_clean(val):
     if pd.isna(val): return ""
     return str(val).strip().lower().replace('.0', '')
 
+def as_str_series(s):
+    """Versi vectorized str(val): NaN jadi 'nan' (sama dengan str(np.nan), konsisten di pandas 2 & 3)"""
+    return s.astype(str).fillna('nan')
+
+def super_clean_series(s):
+    """Versi vectorized super_clean untuk satu Series (NaN → "")"""
+    cleaned = as_str_series(s).str.strip().str.lower().str.replace('.0', '', regex=False)
+    return cleaned.where(s.notna(), "")
+
 def safe_write(ws, row, col, value, fill=None, font=None):
     """Write to Excel cell with error handling (non-critical errors only)"""
     try:
@@ -51,13 +123,127 @@ def safe_write(ws, row, col, value, fill=None, font=None):
     except Exception as e:
         print(f"⚠️  Warning: Gagal menulis cell ({row}, {col}): {e}")
 
+# Storage cell openpyxl (Worksheet._cells {(row, col): Cell}) atribut privat → hanya diakses lewat
+# sheet_cells(), dan hanya di versi openpyxl yang sudah dites (minor lain: warning sekali)
+OPENPYXL_CELL_STORAGE_TESTED = ("3.0", "3.1")
+_cell_storage_checked = False
+
+def has_cell_storage(ws):
+    """True kalau storage cell privat worksheet bisa dipakai langsung (bentuk dict {(row, col): Cell})"""
+    global _cell_storage_checked
+    if not isinstance(getattr(ws, "_cells", None), dict):
+        return False
+    if not _cell_storage_checked:
+        _cell_storage_checked = True
+        if not openpyxl.__version__.startswith(tuple(v + "." for v in OPENPYXL_CELL_STORAGE_TESTED)):
+            print(f"⚠️  Warning: openpyxl {openpyxl.__version__} belum dites untuk akses storage cell "
+                  f"(dites: {', '.join(OPENPYXL_CELL_STORAGE_TESTED)}), cek hasil output")
+    return True
+
+def sheet_cells(ws):
+    """Dict {(row, col): Cell} berisi cell yang benar-benar ada (iterasi tidak membuat cell kosong)
+    
+    Satu-satunya jalur ke ws._cells. Jangan diubah langsung; buang row lewat truncate_sheet_rows.
+    """
+    if not has_cell_storage(ws):
+        raise RuntimeError(f"❌ openpyxl {openpyxl.__version__}: storage cell worksheet tidak dikenal "
+                           f"(dites: {', '.join(OPENPYXL_CELL_STORAGE_TESTED)})")
+    return ws._cells
+
+def truncate_sheet_rows(ws, start_row):
+    """Buang semua cell di row >= start_row sekaligus (pengganti ws.delete_rows untuk hapus data lama)
+    
+    delete_rows menggeser & membuat ulang cell per posisi grid (lambat di sheet besar), padahal
+    semua row di bawah header memang dibuang. Di sini storage cell cukup disaring sekali.
+    Row header, lebar kolom, style, data validation & merged range TIDAK disentuh (sama seperti delete_rows).
+    Versi openpyxl dengan storage cell yang tidak dikenal → fallback ke ws.delete_rows.
+    
+    Returns:
+        Jumlah cell yang dibuang
+    """
+    if not has_cell_storage(ws):
+        before = sum(1 for row in ws.iter_rows(min_row=start_row) for cell in row if cell.value is not None)
+        if ws.max_row >= start_row:
+            ws.delete_rows(start_row, ws.max_row - start_row + 1)
+        return before
+    cells = sheet_cells(ws)
+    before = len(cells)
+    ws._cells = {key: cell for key, cell in cells.items() if key[0] < start_row}
+    ws._current_row = ws.max_row if ws._cells else 0
+    return before - len(ws._cells)
+
 def clean_header(header):
     """Normalize header untuk anti-typo mapping (lowercase, hapus symbol/spaces)"""
     import re
     if pd.isna(header): return ""
     return re.sub(r'[^a-z0-9]', '', str(header).lower())
 
-def find_column_by_name(ws, col_name, header_row=3, fuzzy=True):
+class SheetHeaderIndex:
+    """Index teks header satu sheet, dibangun SEKALI (satu pass atas row header), dipakai semua lookup kolom
+    
+    Per cell disimpan teks (strip), lowercase (cari label / nama bulan) dan hasil clean_header
+    (mapping anti-typo), jadi lookup berikutnya tidak scan cell & jalankan regex ulang.
+    
+    Usage:
+        idx = SheetHeaderIndex.from_worksheet(ws, rows=range(1, 6), max_col=99)
+        idx.find("Nama Pelanggan", row=3)   # kolom atau None
+        idx.find_text("bulan berjalan")     # (row, kolom) pertama atau None
+    """
+    def __init__(self, cells):
+        """cells: iterable (row, kolom, nilai) urut row lalu kolom; cell kosong dilewati"""
+        self.entries = []   # (row, col, teks, lower, clean)
+        self.by_clean = {}  # clean_header → [(row, col), ...]
+        for row, col, value in cells:
+            if value is None or value == "" or pd.isna(value):
+                continue
+            clean = clean_header(value)
+            self.entries.append((row, col, str(value).strip(), str(value).lower(), clean))
+            self.by_clean.setdefault(clean, []).append((row, col))
+
+    @classmethod
+    def from_worksheet(cls, ws, rows, max_col=None):
+        """Header dari worksheet openpyxl (baca storage cell langsung, cell kosong tidak dibuat)"""
+        cells = sheet_cells(ws)
+        max_col = max_col or ws.max_column
+        return cls((r, c, cells[(r, c)].value) for r in rows for c in range(1, max_col + 1) if (r, c) in cells)
+
+    @classmethod
+    def from_cells(cls, cells):
+        """Header dari dict {(row, col): nilai} (mis. TemplateXmlReader.read_cells)"""
+        return cls((r, c, v) for (r, c), v in sorted(cells.items()))
+
+    @classmethod
+    def from_frame(cls, df):
+        """Header dari DataFrame probe (row & kolom = posisi 0-based, seperti iloc)"""
+        return cls((r, c, v) for r, values in enumerate(df.to_numpy(dtype=object)) for c, v in enumerate(values))
+
+    def row(self, row):
+        """[(kolom, teks header)] satu row, urut kolom"""
+        return [(c, text) for r, c, text, _, _ in self.entries if r == row]
+
+    def find(self, name, row=None, fuzzy=False):
+        """Kolom pertama yang clean_header-nya sama dengan name (fuzzy: saling substring), None kalau tidak ada"""
+        target = clean_header(name)
+        if not fuzzy:
+            return next((c for r, c in self.by_clean.get(target, []) if row is None or r == row), None)
+        return next((c for r, c, _, _, clean in self.entries
+                     if (row is None or r == row) and (target in clean or clean in target)), None)
+
+    def find_text(self, needle, row=None):
+        """(row, kolom) pertama yang teksnya (lowercase) mengandung needle"""
+        return next(((r, c) for r, c, _, lower, _ in self.entries
+                     if (row is None or r == row) and needle in lower), None)
+
+    def columns_with(self, *needles, row=None):
+        """Semua kolom yang teksnya (lowercase) mengandung SEMUA needle"""
+        return [c for r, c, _, lower, _ in self.entries
+                if (row is None or r == row) and all(n in lower for n in needles)]
+
+    def find_row(self, labels):
+        """Row pertama yang punya cell (lowercase) persis salah satu labels"""
+        return next((r for r, _, _, lower, _ in self.entries if lower in labels), None)
+
+def find_column_by_name(ws, col_name, header_row=3, fuzzy=True, index=None):
     """Cari index kolom berdasarkan nama header (anti-hardcode magic numbers)
     
     Args:
@@ -65,23 +251,13 @@ def find_column_by_name(ws, col_name, header_row=3, fuzzy=True):
         col_name: nama kolom yang dicari (case-insensitive)
         header_row: baris header (default row 3)
         fuzzy: allow partial match (default True)
+        index: SheetHeaderIndex sheet ini (dipakai ulang antar lookup); default dibangun dari header_row
     
     Returns:
         int: column index (1-based) atau None jika tidak ketemu
     """
-    col_clean = clean_header(col_name)
-    for col_idx in range(1, ws.max_column + 1):
-        cell_val = ws.cell(header_row, col_idx).value
-        if not cell_val:
-            continue
-        cell_clean = clean_header(str(cell_val))
-        if fuzzy:
-            if col_clean in cell_clean or cell_clean in col_clean:
-                return col_idx
-        else:
-            if col_clean == cell_clean:
-                return col_idx
-    return None
+    index = index or SheetHeaderIndex.from_worksheet(ws, rows=[header_row])
+    return index.find(col_name, row=header_row, fuzzy=fuzzy)
 
 def validate_required_columns(df, required_cols, context="DataFrame"):
     """Validasi kolom wajib ada di DataFrame (fail fast dengan error jelas)
@@ -145,82 +321,1364 @@ def custom_sort_by_kode_produk(df, kode_col):
     return df_sorted
 
 # ==============================================================================
-# FASE 1: EXTRACT (GLOBAL SEARCH)
+# INPUT DI MEMORY (BYTES / FILE-LIKE)
 # ==============================================================================
-# FASE 1: EXTRACT (GLOBAL SEARCH)
+class InputBuffer:
+    """File input di memory (upload Streamlit / bytes) yang bisa dibuka berkali-kali seperti path
+
+    Setiap open() dapat BytesIO baru atas bytes yang sama, jadi WorkbookStream, TemplateXmlReader
+    dan load_workbook membaca tanpa file di disk. Nama dipakai untuk pesan log (format dari isi file).
+    """
+    def __init__(self, data, name="upload.xlsx"):
+        # bytes immutable → disimpan apa adanya; bytearray / memoryview baru di-copy
+        self.data = data if isinstance(data, bytes) else bytes(data)
+        self.name = name
+        self._digest = None
+
+    def __str__(self):
+        return self.name
+
+    def __len__(self):
+        return len(self.data)
+
+    def open(self):
+        return io.BytesIO(self.data)
+
+    @property
+    def digest(self):
+        """SHA-256 isi (sama dengan ParsedFrameCache.file_digest file yang sama di disk)"""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+        return self._digest
+
+def as_input(value, spill_dir=None, max_mb=None):
+    """bytes / file-like → InputBuffer, atau path temp file kalau lebih besar dari INMEMORY_MAX_MB
+    
+    Path (str / PathLike), None dan InputBuffer dikembalikan apa adanya.
+    """
+    if value is None or isinstance(value, (str, os.PathLike, InputBuffer)):
+        return value
+    name = os.path.basename(getattr(value, "name", None) or "upload.xlsx")
+    if hasattr(value, "getvalue"):  # BytesIO / UploadedFile Streamlit: bytes internal, tanpa copy
+        data = value.getvalue()
+    elif hasattr(value, "read"):
+        data = value.read()
+    else:
+        data = value
+    max_mb = CONFIG.get("INMEMORY_MAX_MB", 100) if max_mb is None else max_mb
+    if len(data) > max_mb * 1024 * 1024:
+        fd, path = tempfile.mkstemp(prefix="etl_", suffix=os.path.splitext(name)[1] or ".xlsx", dir=spill_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return path
+    return InputBuffer(data, name)
+
+def input_exists(src):
+    return isinstance(src, InputBuffer) or os.path.exists(src)
+
+def open_input(src):
+    """Argumen untuk reader (load_workbook / ZipFile): path apa adanya, InputBuffer → BytesIO baru"""
+    return src.open() if isinstance(src, InputBuffer) else src
+
 # ==============================================================================
-def extract_data():
-    print(f"🚀 [1/3] EXTRACT: Mapping Master Data...")
+# EXCEL READER (SINGLE-OPEN STREAMING)
+# ==============================================================================
+_MAGIC_ZIP = b"PK\x03\x04"
+_MAGIC_OLE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+# Engine per format, urut tercepat dulu; modul = nama package Python yang harus ter-install
+EXCEL_ENGINES = {"xlsx": ["calamine", "openpyxl"], "xlsb": ["calamine", "pyxlsb"], "xls": ["calamine"]}
+_ENGINE_MODULES = {"calamine": "python_calamine", "openpyxl": "openpyxl", "pyxlsb": "pyxlsb"}
+_FORMAT_EXTENSIONS = {"xlsx": (".xlsx", ".xlsm", ".xltx", ".xltm"), "xlsb": (".xlsb",), "xls": (".xls",)}
+
+def detect_excel_format(src):
+    """Format asli workbook dari magic bytes, bukan ekstensi: 'xlsx' (juga xlsm), 'xlsb' atau 'xls'
     
-    # Validasi file exists
-    if not os.path.exists(CONFIG["FILE_REKAP"]):
-        raise FileNotFoundError(f"❌ File Rekap tidak ditemukan: {CONFIG['FILE_REKAP']}")
-    if not os.path.exists(CONFIG["INPUT_FILE"]):
-        raise FileNotFoundError(f"❌ File Input tidak ditemukan: {CONFIG['INPUT_FILE']}")
+    xlsx & xlsb sama-sama ZIP → dibedakan dari part workbook (xl/workbook.bin = binary).
+    """
+    from zipfile import ZipFile, BadZipFile
+    with (src.open() if isinstance(src, InputBuffer) else open(src, "rb")) as f:
+        head = f.read(8)
+        if head.startswith(_MAGIC_OLE):
+            return "xls"
+        if head.startswith(_MAGIC_ZIP):
+            try:
+                with ZipFile(f) as z:
+                    return "xlsb" if "xl/workbook.bin" in z.namelist() else "xlsx"
+            except BadZipFile:
+                pass
+    raise ValueError(f"❌ {src} bukan file Excel (xlsx/xlsb/xls) yang valid")
+
+def select_excel_engine(fmt, preferred="auto"):
+    """Engine tercepat yang ter-install untuk format ini (atau engine yang dipaksa di EXCEL_ENGINE)"""
+    import importlib.util
+    candidates = EXCEL_ENGINES[fmt]
+    if preferred and preferred != "auto":
+        if preferred not in candidates:
+            raise ValueError(f"❌ Engine '{preferred}' tidak bisa membaca file {fmt}. Pilihan: {candidates}")
+        candidates = [preferred]
+    for engine in candidates:
+        if importlib.util.find_spec(_ENGINE_MODULES[engine]) is not None:
+            return engine
+    packages = " / ".join(_ENGINE_MODULES[e].replace("_", "-") for e in candidates)
+    raise ImportError(f"❌ File {fmt} butuh package {packages} (pip install {packages.split(' / ')[0]})")
+
+class WorkbookStream:
+    """Buka workbook SEKALI dalam mode read-only streaming, lalu baca banyak sheet dari handle yang sama
+
+    Konversi cell & pembentukan DataFrame mengikuti pd.read_excel (openpyxl/pyxlsb/calamine engine),
+    jadi hasilnya identik dengan read_excel tapi file tidak di-parse berulang kali. Format dideteksi
+    dari isi file (.xlsb yang diberi nama .xlsx tetap terbaca), engine dipilih lewat select_excel_engine.
+
+    Usage:
+        with WorkbookStream(path) as book:
+            df = book.read_frame("ALL PRODUCT PDF", header=2)
+    """
+    def __init__(self, path, engine=None):
+        self.path = path
+        self.format = detect_excel_format(path)
+        self.engine = select_excel_engine(self.format, engine or CONFIG.get("EXCEL_ENGINE", "auto"))
+        self._handle = None
+        source = open_input(path)
+        if not isinstance(path, InputBuffer) and not str(path).lower().endswith(_FORMAT_EXTENSIONS[self.format]):
+            # Engine memilih parser dari ekstensi → ekstensi salah (xlsb dinamai .xlsx) dibuka sebagai file object
+            source = self._handle = open(path, "rb")
+        if self.engine == "calamine":
+            from python_calamine import load_workbook as open_calamine
+            self.book = open_calamine(source)
+            self.sheet_names = list(self.book.sheet_names)
+        elif self.engine == "pyxlsb":
+            from pyxlsb import open_workbook as open_xlsb
+            self.book = open_xlsb(source)
+            self.sheet_names = list(self.book.sheets)
+        else:
+            self.book = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+            self.sheet_names = self.book.sheetnames
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.book.close()
+        if self._handle is not None:
+            self._handle.close()
+
+    @staticmethod
+    def _convert_cell(value, is_error=False):
+        # Sama dengan pandas: None → "" (supaya jadi Unnamed/NaN), error → NaN, float bulat → int
+        if value is None:
+            return ""
+        if is_error:
+            return np.nan
+        if isinstance(value, float):
+            val = int(value)
+            return val if val == value else value
+        return value
+
+    @staticmethod
+    def _convert_calamine_cell(value):
+        # Sama dengan CalamineReader pandas: float bulat → int, date → datetime (setara openpyxl)
+        if isinstance(value, float):
+            val = int(value)
+            return val if val == value else value
+        if type(value) is datetime.date:
+            return datetime.datetime(value.year, value.month, value.day)
+        return value
+
+    def iter_rows(self, sheet_name):
+        """Generator row (list nilai, trailing kosong sudah di-trim) langsung dari stream XML"""
+        if self.engine == "calamine":
+            # Calamine (Rust): row kosong di atas tetap dikirim, kolom kosong di kiri tidak → isi lagi
+            # supaya index kolom sama dengan openpyxl. Cell kosong / error = ""
+            convert = self._convert_calamine_cell
+            sheet = self.book.get_sheet_by_name(sheet_name)
+            lead = [""] * (sheet.start[1] if sheet.start else 0)
+            for row in sheet.iter_rows():
+                converted_row = lead + [convert(v) for v in row]
+                while converted_row and converted_row[-1] == "":
+                    converted_row.pop()
+                yield converted_row
+            return
+
+        if self.engine == "pyxlsb":
+            # pyxlsb sparse: row kosong tidak dikirim, isi gap supaya nomor row tetap sama
+            previous_row_number = -1
+            with self.book.get_sheet(sheet_name) as sheet:
+                for row in sheet.rows(sparse=True):
+                    converted_row = [self._convert_cell(cell.v) for cell in row]
+                    while converted_row and converted_row[-1] == "":
+                        converted_row.pop()
+                    if converted_row:
+                        for _ in range(row[0].r - previous_row_number - 1):
+                            yield []
+                        yield converted_row
+                        previous_row_number = row[0].r
+            return
+
+        from openpyxl.cell.cell import TYPE_ERROR
+        ws = self.book[sheet_name]
+        ws.reset_dimensions()  # dimension tag di file export sering salah
+        for row in ws.rows:
+            converted_row = [self._convert_cell(c.value, c.data_type == TYPE_ERROR) for c in row]
+            while converted_row and converted_row[-1] == "":
+                converted_row.pop()
+            yield converted_row
+
+    @staticmethod
+    def rows_to_frame(rows, header=0):
+        """Bentuk DataFrame dari list row mentah (logika sama persis dengan pd.read_excel)"""
+        from pandas.io.parsers import TextParser
+
+        # Trim trailing empty rows & extend semua row ke lebar maksimum
+        last_row_with_data = max((i for i, r in enumerate(rows) if r), default=-1)
+        rows = rows[: last_row_with_data + 1]
+        if not rows:
+            return pd.DataFrame()
+        max_width = max(len(r) for r in rows)
+        rows = [r + [""] * (max_width - len(r)) if len(r) < max_width else r for r in rows]
+        return TextParser(rows, header=header, skip_blank_lines=False).read()
+
+    def read_frame(self, sheet_name, header=0):
+        """Pengganti pd.read_excel(path, sheet_name, header) tanpa membuka ulang file"""
+        return self.rows_to_frame(list(self.iter_rows(sheet_name)), header=header)
+
+    def read_frame_with_probe(self, sheet_name, probe_fn, probe_rows=20):
+        """Baca sheet SEKALI: probe_fn(df_probe) → header row dari N row pertama, lalu lanjut ke data
+
+        Returns:
+            tuple: (df_probe, hasil probe_fn, DataFrame full dengan header hasil probe)
+        """
+        rows_iter = self.iter_rows(sheet_name)
+        rows = []
+        for row in rows_iter:
+            rows.append(row)
+            if len(rows) >= probe_rows:
+                break
+        df_probe = self.rows_to_frame(rows, header=None)
+        probe_result = probe_fn(df_probe)
+        h_row = probe_result[0] if isinstance(probe_result, tuple) else probe_result
+
+        # Lanjutkan stream yang sama (tidak parse ulang row yang sudah dibaca)
+        rows.extend(rows_iter)
+        return df_probe, probe_result, self.rows_to_frame(rows, header=h_row)
+
+# ==============================================================================
+# PARSED FRAME CACHE (CONTENT-ADDRESSED PARQUET)
+# ==============================================================================
+def write_atomic(path, writer):
+    """Tulis ke file sementara lalu rename: job lain yang baca file sama tidak lihat file setengah jadi"""
+    tmp = f"{path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        writer(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+@contextmanager
+def file_lock(path, timeout=30.0, poll=0.05):
+    """Lock antar thread & proses untuk read-modify-write file bersama (<path>.lock dibuat eksklusif)
     
+    Portable (Windows/Linux, tanpa fcntl). Lock yang lebih tua dari timeout dianggap basi
+    (proses pemegang mati) dan diambil alih.
+    """
+    lock = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > timeout:
+                    os.remove(lock)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"❌ Lock {lock} tidak lepas dalam {timeout:.0f} detik")
+            time.sleep(poll)
     try:
-        df_pdf = pd.read_excel(CONFIG["FILE_REKAP"], sheet_name="ALL PRODUCT PDF", header=2)
-    except ValueError as e:
-        raise ValueError(f"❌ Sheet 'ALL PRODUCT PDF' tidak ditemukan di {CONFIG['FILE_REKAP']}. Error: {e}")
-    
-    df_pdf.columns = [str(c).strip() for c in df_pdf.columns]
-    
-    # Validasi kolom wajib
-    validate_required_columns(df_pdf, ['ICON+ Product'], context="ALL PRODUCT PDF")
-    
-    # Mencari nama produk di semua level segmen
-    potential_name_cols = ['Product Portofolio Segmen 1', 'Product Portofolio Segmen 2', 'Product Portofolio Segmen 3', 'SEGMEN']
-    prod_to_kode = {}
-    for _, row in df_pdf.iterrows():
-        kode_icon = str(row['ICON+ Product']).strip().replace('.0', '')
-        if not kode_icon or kode_icon == 'nan': continue
-        for col in potential_name_cols:
-            if col in df_pdf.columns:
-                nama_raw = str(row[col]).strip()
-                if nama_raw and nama_raw != 'nan':
-                    prod_to_kode[super_clean(nama_raw)] = kode_icon
-
-    # Fallback ke tab SAP jika ada yang belum tercover
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock)
+
+class ParsedFrameCache:
+    """Cache DataFrame hasil parsing Excel, key = SHA-256 isi file + parameter baca (sheet, header)
+
+    Disimpan sebagai Parquet (pyarrow), tanpa pickle. Kolom object campur tipe (angka + teks,
+    tanggal + '--/--/--') disimpan sebagai string bertag per cell ('i:12', 's:--/--/--', ...) dan
+    dikembalikan ke tipe Python aslinya saat load, jadi frame hasil cache identik dengan hasil parse.
+    Eviction LRU berdasarkan total ukuran folder cache (file di-touch setiap cache hit).
+    
+    Selain disk ada layer memory untuk hasil prefetch (lihat prefetch_inputs): entry memory
+    dicek duluan (juga saat cache disk dimatikan) dan frame/objek diambil SEKALI (pop), jadi
+    mutasi di stage tidak bocor ke pembacaan berikutnya. File yang di-pin (mode batch, lihat
+    run_batch) tetap di memory selama batch: setiap baca dapat copy DataFrame.
+    """
+    def __init__(self, cache_dir, max_mb=1024, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.enabled = enabled
+        self._digests = {}  # (abspath, size, mtime) → digest, supaya file tidak di-hash ulang
+        self.memory = {}    # key → hasil prefetch di proses ini
+        self.record = False  # True di worker prefetch: semua put juga dicatat ke memory
+        self.pinned = set()  # prefix digest file yang entry-nya ditahan di memory (mode batch)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def active(self):
+        """Perlu hitung key (digest file)? → cache disk aktif, sedang merekam, ada hasil prefetch / pin"""
+        return self.enabled or self.record or bool(self.memory) or bool(self.pinned)
+
+    def pin(self, path):
+        """Tahan semua hasil baca file ini di memory sampai unpin_all() (dipakai ulang tiap bulan batch)"""
+        self.pinned.add(self.file_digest(path)[:32])
+
+    def unpin_all(self):
+        for key in [k for k in self.memory if self._is_pinned(k)]:
+            del self.memory[key]
+        self.pinned.clear()
+
+    def _is_pinned(self, key):
+        return key[:32] in self.pinned
+
+    def _remember(self, key, value):
+        if self.record or self._is_pinned(key):
+            self.memory[key] = value
+
+    def _take(self, key):
+        if not self._is_pinned(key):
+            return self.memory.pop(key)
+        value = self.memory[key]
+        return value.copy() if isinstance(value, pd.DataFrame) else value
+
+    def file_digest(self, path):
+        """SHA-256 isi file (streaming per 1 MB)"""
+        if isinstance(path, InputBuffer):
+            return path.digest
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._digests:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(chunk)
+            self._digests[memo_key] = h.hexdigest()
+        return self._digests[memo_key]
+
+    @staticmethod
+    def make_key(digest, **params):
+        payload = json.dumps(params, sort_keys=True, default=str)
+        return f"{digest[:32]}-{hashlib.sha256(payload.encode()).hexdigest()[:16]}"
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}.{ext}")
+
+    def _touch(self, path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def get_meta(self, key, remember=True):
+        if key in self.memory:
+            return list(self.memory[key])
+        if not self.enabled:
+            return None
+        path = self._path(key, "json")
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        with open(path, "r", encoding="utf-8") as f:
+            value = json.load(f)
+        if remember:
+            self._remember(key, value)
+        return value
+
+    def _write_atomic(self, path, writer):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_atomic(path, writer)
+
+    def put_meta(self, key, value, remember=True):
+        if remember:
+            self._remember(key, value)
+        if not self.enabled:
+            return
+        def writer(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+        self._write_atomic(self._path(key, "json"), writer)
+
+    def get_object(self, key):
+        """Objek Python dari layer memory (hasil prefetch / pin), mis. ProductCatalog. None kalau miss
+        
+        Objek tidak pernah di-pickle ke disk; yang perlu persisten simpan frame (put) + JSON (put_meta).
+        """
+        return self._take(key) if key in self.memory else None
+
+    def put_object(self, key, obj):
+        self._remember(key, obj)
+
+    def get(self, key):
+        """Return DataFrame dari cache atau None (miss / cache dimatikan)"""
+        if key in self.memory:
+            self.hits += 1
+            return self._take(key)
+        if not self.enabled:
+            return None
+        path = self._path(key, "parquet")
+        if os.path.exists(path):
+            try:
+                df = self._load_parquet(path)
+            except Exception as e:
+                print(f"⚠️  Warning: Cache rusak, parse ulang ({os.path.basename(path)}): {e}")
+                os.remove(path)
+            else:
+                self._touch(path)
+                self.hits += 1
+                if self._is_pinned(key):
+                    self._remember(key, df.copy())
+                return df
+        self.misses += 1
+        return None
+
+    def put(self, key, df, remember=True):
+        if remember:
+            self._remember(key, df.copy() if self._is_pinned(key) else df)
+        if not self.enabled:
+            return
+        try:
+            self._write_atomic(self._path(key, "parquet"), lambda tmp: self._save_parquet(df, tmp))
+        except ImportError:
+            print("⚠️  Warning: pyarrow tidak ter-install, cache disk dimatikan (pip install pyarrow)")
+            self.enabled = False
+            return
+        except (TypeError, ValueError) as e:
+            # Tipe cell yang tidak dikenal encoder → frame tidak di-cache (bukan fallback pickle)
+            print(f"⚠️  Warning: Frame tidak bisa disimpan ke cache, akan di-parse ulang ({key}): {e}")
+            return
+        self.evict()
+
+    # Tag tipe cell kolom campur → (encode ke teks, decode dari teks); bool dicek sebelum int
+    _CELL_TAGS = {
+        "b": (lambda v: "1" if v else "0", lambda t: t == "1"),
+        "i": (str, int),
+        "f": (repr, float),
+        "s": (str, str),
+        "T": (lambda v: v.isoformat(), pd.Timestamp),
+        "d": (lambda v: v.isoformat(), datetime.datetime.fromisoformat),
+        "D": (lambda v: v.isoformat(), datetime.date.fromisoformat),
+        "t": (lambda v: v.isoformat(), datetime.time.fromisoformat),
+        "x": (lambda v: str(v // datetime.timedelta(microseconds=1)), lambda t: datetime.timedelta(microseconds=int(t))),
+        "N": (lambda v: "", lambda t: pd.NaT),
+    }
+
+    @staticmethod
+    def _cell_tag(value):
+        if value is pd.NaT:
+            return "N"
+        if isinstance(value, (bool, np.bool_)):
+            return "b"
+        if isinstance(value, (int, np.integer)):
+            return "i"
+        if isinstance(value, (float, np.floating)):
+            return "f"
+        if isinstance(value, str):
+            return "s"
+        if isinstance(value, pd.Timestamp):
+            return "T"
+        if isinstance(value, datetime.datetime):
+            return "d"
+        if isinstance(value, datetime.date):
+            return "D"
+        if isinstance(value, datetime.time):
+            return "t"
+        if isinstance(value, datetime.timedelta):
+            return "x"
+        raise TypeError(f"tipe cell {type(value).__name__} tidak didukung cache")
+
+    @classmethod
+    def _encode_mixed(cls, values):
+        """Kolom object campur tipe → list string bertag ('tag:teks'), None tetap None"""
+        encoded = []
+        for v in values:
+            if v is None:
+                encoded.append(None)
+            else:
+                tag = cls._cell_tag(v)
+                encoded.append(f"{tag}:{cls._CELL_TAGS[tag][0](v)}")
+        return encoded
+
+    @classmethod
+    def _decode_mixed(cls, values):
+        decoded = []
+        for v in values:
+            if v is None:
+                decoded.append(None)
+            else:
+                tag, _, text = v.partition(":")
+                decoded.append(cls._CELL_TAGS[tag][1](text))
+        return decoded
+
+    @staticmethod
+    def _save_parquet(df, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Parquet wajib nama kolom string → simpan label asli (int 756, dll) di metadata
+        labels = [[type(c).__name__, c if isinstance(c, (int, float, str)) else str(c)] for c in df.columns]
+        df_store = df.copy(deep=False)
+        df_store.columns = [str(i) for i in range(len(df.columns))]
+        # Kolom object yang ditolak Arrow (campur tipe) → string bertag, posisinya dicatat di metadata
+        mixed = []
+        for i, name in enumerate(df_store.columns):
+            if df_store[name].dtype == object:
+                try:
+                    pa.array(df_store[name], from_pandas=True)
+                except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                    df_store[name] = pd.Series(ParsedFrameCache._encode_mixed(df_store[name]), index=df_store.index, dtype=object)
+                    mixed.append(i)
+        try:
+            table = pa.Table.from_pandas(df_store, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            raise TypeError(str(e))
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               b"etl_columns": json.dumps(labels).encode(),
+                                               b"etl_mixed": json.dumps(mixed).encode()})
+        pq.write_table(table, path)
+
+    @staticmethod
+    def _load_parquet(path):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        labels = json.loads(table.schema.metadata[b"etl_columns"])
+        df = table.to_pandas()
+        for i in json.loads(table.schema.metadata.get(b"etl_mixed", b"[]")):
+            values = ParsedFrameCache._decode_mixed(table.column(str(i)).to_pylist())
+            df[str(i)] = pd.Series(values, index=df.index, dtype=object)
+        casters = {"int": int, "float": float}
+        df.columns = [casters.get(t, lambda v: v)(v) for t, v in labels]
+        return df
+
+    def entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        paths = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if not f.endswith(".tmp")]
+        return [p for p in paths if os.path.isfile(p)]
+
+    def evict(self):
+        """Hapus entry paling lama tidak dipakai sampai total ukuran <= CACHE_MAX_MB"""
+        entries = []
+        for p in self.entries():
+            try:
+                entries.append((os.path.getmtime(p), os.path.getsize(p), p))
+            except FileNotFoundError:
+                pass  # sudah dihapus proses lain (worker prefetch paralel)
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        removed = 0
+        for path in self.entries():
+            os.remove(path)
+            removed += 1
+        return removed
+
+_frame_cache = None
+
+def get_frame_cache():
+    """Cache global sesuai CONFIG (dibuat ulang kalau CONFIG cache berubah)"""
+    global _frame_cache
+    settings = (CONFIG.get("CACHE_DIR", ".etl_cache"), CONFIG.get("CACHE_MAX_MB", 1024), CONFIG.get("USE_CACHE", True))
+    if _frame_cache is None or (_frame_cache.cache_dir, _frame_cache.max_bytes / 1024 / 1024, _frame_cache.enabled) != settings:
+        _frame_cache = ParsedFrameCache(*settings)
+    return _frame_cache
+
+class CachedWorkbook:
+    """Interface sama dengan WorkbookStream, tapi baca dari cache dulu
+
+    Workbook baru dibuka (lazy) kalau ada sheet yang belum ter-cache → warm run tidak parse Excel sama sekali.
+    """
+    def __init__(self, path, cache=None, engine=None):
+        self.path = path
+        self.cache = cache or get_frame_cache()
+        self.engine = engine
+        self.digest = self.cache.file_digest(path) if self.cache.active else None
+        self._stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    @property
+    def stream(self):
+        if self._stream is None:
+            self._stream = WorkbookStream(self.path, self.engine)
+        return self._stream
+
+    @property
+    def sheet_names(self):
+        if self.digest is None:
+            return self.stream.sheet_names
+        key = self.cache.make_key(self.digest, kind="sheet_names")
+        names = self.cache.get_meta(key)
+        if names is None:
+            names = list(self.stream.sheet_names)
+            self.cache.put_meta(key, names)
+        return names
+
+    def _frame_key(self, sheet_name, header):
+        return self.cache.make_key(self.digest, kind="frame", sheet=sheet_name, header=header)
+
+    def read_frame(self, sheet_name, header=0):
+        if self.digest is None:
+            return self.stream.read_frame(sheet_name, header=header)
+        key = self._frame_key(sheet_name, header)
+        df = self.cache.get(key)
+        if df is None:
+            df = self.stream.read_frame(sheet_name, header=header)
+            self.cache.put(key, df)
+        return df
+
+    def read_frame_with_probe(self, sheet_name, probe_fn, probe_rows=20):
+        if self.digest is None:
+            return self.stream.read_frame_with_probe(sheet_name, probe_fn, probe_rows)
+        key_probe = self.cache.make_key(self.digest, kind="probe", sheet=sheet_name, rows=probe_rows)
+        df_probe = self.cache.get(key_probe)
+        if df_probe is not None:
+            probe_result = probe_fn(df_probe)
+            h_row = probe_result[0] if isinstance(probe_result, tuple) else probe_result
+            df = self.cache.get(self._frame_key(sheet_name, h_row))
+            if df is not None:
+                return df_probe, probe_result, df
+
+        df_probe, probe_result, df = self.stream.read_frame_with_probe(sheet_name, probe_fn, probe_rows)
+        h_row = probe_result[0] if isinstance(probe_result, tuple) else probe_result
+        self.cache.put(key_probe, df_probe)
+        self.cache.put(self._frame_key(sheet_name, h_row), df)
+        return df_probe, probe_result, df
+
+class StageResultCache:
+    """Cache hasil extract+transform di memory, key = hash isi Lampiran & Rekap + config transform
+
+    Hasil transform hanya bergantung pada Lampiran, Rekap dan UNPIVOT_MODE; bulan, template,
+    Pelanggan/OPT dan nama output hanya dipakai load_data. Jadi run ulang dengan upload sama
+    (ganti bulan / nama file) langsung ke load_data. Satu instance dipakai bersama beberapa
+    sesi (thread) → akses dikunci. Dibatasi total ukuran DataFrame, entry paling lama tidak
+    dipakai dibuang duluan (LRU).
+    """
+    def __init__(self, max_mb=512):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries = OrderedDict()  # key → (df_final, ukuran byte)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(job):
+        """Key dari digest isi file (bukan path: tiap upload disimpan di folder job baru)"""
+        cfg = job.config
+        digest = "".join(job.cache.file_digest(cfg[k])[:32] for k in ("INPUT_FILE", "FILE_REKAP"))
+        return job.cache.make_key(hashlib.sha256(digest.encode()).hexdigest(), kind="stage",
+                                  unpivot=cfg.get("UNPIVOT_MODE", "sparse"))
+
+    @property
+    def total_bytes(self):
+        return sum(size for _, size in self._entries.values())
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return  # lebih besar dari batas → tidak di-cache sama sekali
+        with self._lock:
+            self._entries[key] = (df, size)
+            self._entries.move_to_end(key)
+            total = self.total_bytes
+            while total > self.max_bytes:
+                _, (_, dropped) = self._entries.popitem(last=False)
+                total -= dropped
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# ==============================================================================
+# PROFILING PER STAGE (WAKTU, CPU, MEMORY, JUMLAH BARIS)
+# ==============================================================================
+def _rss_bytes():
+    """RSS proses saat ini: psutil kalau ada, fallback /proc (Linux), selain itu None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
     try:
-        xls_rekap = pd.ExcelFile(CONFIG["FILE_REKAP"])
-        sap_sheet = next((s for s in xls_rekap.sheet_names if "sap" in s.lower()), None)
-        if sap_sheet:
-            df_sap = pd.read_excel(CONFIG["FILE_REKAP"], sheet_name=sap_sheet, header=1)
-            validate_required_columns(df_sap, ['Nama Produk', 'Kode di SAP'], context="SAP Sheet")
-            for _, row in df_sap.iterrows():
-                nama_sap = str(row['Nama Produk']).strip()
-                kode_sap = str(row['Kode di SAP']).strip().replace('.0', '')
-                if nama_sap != 'nan' and super_clean(nama_sap) not in prod_to_kode:
-                    prod_to_kode[super_clean(nama_sap)] = kode_sap
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class StageProfiler:
+    """Catat wall time, CPU time, memory & rows in/out per stage → report JSON
+    
+    Stage boleh bersarang (mis. update_sheet di dalam load): setiap record menyimpan nama parent.
+    Memory: RSS di akhir stage (selalu), peak alokasi Python per stage kalau trace_memory=True
+    (tracemalloc, overhead besar → hanya untuk investigasi).
+    
+    Usage:
+        with job.profiler.stage("transform", rows_in=len(df_raw)) as stage:
+            ...
+            stage["rows_out"] = len(df_final)
+    """
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = []
+        self._stack = []
+        self._started_trace = False
+        self.started = time.time()
+
+    def begin(self, name, rows_in=None):
+        """Mulai stage (pasangan end). Pemanggil pakai stage() supaya end tetap jalan saat error"""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_trace = True
+        record = {"name": name, "parent": self._stack[-1]["name"] if self._stack else None,
+                  "depth": len(self._stack), "rows_in": rows_in, "rows_out": None}
+        if self.trace_memory:
+            if self._stack:
+                # Peak parent sejauh ini disimpan dulu sebelum counter peak di-reset untuk stage anak
+                parent = self._stack[-1]
+                parent["_peak"] = max(parent.get("_peak", 0), tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        record["_t0"] = (time.perf_counter(), time.process_time())
+        self.stages.append(record)
+        self._stack.append(record)
+        return record
+
+    def end(self, record, rows_out=None):
+        wall0, cpu0 = record.pop("_t0")
+        record["wall_s"] = round(time.perf_counter() - wall0, 4)
+        record["cpu_s"] = round(time.process_time() - cpu0, 4)
+        if rows_out is not None:
+            record["rows_out"] = rows_out
+        if self.trace_memory:
+            peak = max(record.pop("_peak", 0), tracemalloc.get_traced_memory()[1])
+            record["peak_alloc_mb"] = round(peak / 1024 / 1024, 2)
+            if len(self._stack) > 1:
+                parent = self._stack[-2]
+                parent["_peak"] = max(parent.get("_peak", 0), peak)
+        rss = _rss_bytes()
+        record["rss_mb"] = round(rss / 1024 / 1024, 1) if rss else None
+        self._stack.remove(record)
+        if not self._stack and self._started_trace:
+            tracemalloc.stop()
+            self._started_trace = False
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        record = self.begin(name, rows_in)
+        try:
+            yield record
+        finally:
+            self.end(record)
+
+    def annotate(self, **fields):
+        """Isi field (mis. rows_in) stage terdalam yang sedang jalan; untuk fungsi yang baca datanya sendiri"""
+        if self._stack:
+            self._stack[-1].update(fields)
+
+    def report(self, **info):
+        """Dict siap json.dump: info run + daftar stage urut mulai"""
+        return {**info, "started": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "trace_memory": self.trace_memory, "stages": [dict(r) for r in self.stages]}
+
+    def save(self, path, **info):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(**info), f, indent=2, default=str)
+
+    def print_summary(self):
+        print("📊 PROFIL STAGE:")
+        for r in self.stages:
+            indent = "   " * (1 + r["depth"])
+            rows = f" rows {r['rows_in'] if r['rows_in'] is not None else '-'}→{r['rows_out'] if r['rows_out'] is not None else '-'}"
+            peak = f" peak {r['peak_alloc_mb']} MB" if "peak_alloc_mb" in r else ""
+            print(f"{indent}> {r['name']}: {r.get('wall_s', 0):.2f}s wall, {r.get('cpu_s', 0):.2f}s CPU,{rows}{peak}")
+
+def run_with_code_profiler(fn, kind, out_path=None):
+    """Jalankan fn() di bawah cProfile / pyinstrument (opsional, dari CLI --profile)
+    
+    cProfile → stats .prof (buka dengan snakeviz / pstats) + 25 fungsi teratas dicetak;
+    pyinstrument → report HTML. pyinstrument tidak ter-install → jalan tanpa profiler.
+    """
+    if kind == "cprofile":
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn)
+        finally:
+            out_path = out_path or "etl_profile.prof"
+            profiler.dump_stats(out_path)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+            print(f"📊 cProfile disimpan: {out_path}")
+    if kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("⚠️  pyinstrument tidak ter-install (pip install pyinstrument), jalan tanpa profiler")
+            return fn()
+        profiler = Profiler()
+        profiler.start()
+        try:
+            return fn()
+        finally:
+            profiler.stop()
+            out_path = out_path or "etl_profile.html"
+            with open(out_path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            print(f"📊 pyinstrument disimpan: {out_path}")
+    return fn()
+
+# ==============================================================================
+# ETL JOB (KONFIGURASI + FOLDER KERJA PER RUN)
+# ==============================================================================
+# Key config berisi path file → di-resolve terhadap folder kerja job
+FILE_CONFIG_KEYS = ["INPUT_FILE", "FILE_REKAP", "FILE_PELANGGAN", "FILE_OPT", "TEMPLATE_FILE", "OUTPUT_FILE"]
+# Key config berisi folder/file state antar run → di-resolve terhadap folder kerja job (tidak dibagi antar user)
+STATE_PATH_KEYS = ["HISTORY_DIR", "SCHEMA_REGISTRY"]
+
+class EtlJob:
+    """Satu run ETL: salinan config + folder kerja + cache sendiri, dibawa ke setiap stage
+    
+    Stage (extract_data, transform_data, load_data, update_sheet_*) membaca config dari job,
+    bukan dari CONFIG global, jadi beberapa job bisa jalan bersamaan (user Streamlit berbeda,
+    job terjadwal) tanpa saling menimpa. Path relatif di config di-resolve ke work_dir.
+    Cache disk dipakai bersama (content-addressed), layer memory (prefetch/pin) milik job sendiri.
+    
+    File input boleh bytes / file-like (upload) → InputBuffer di memory, temp file hanya di atas
+    INMEMORY_MAX_MB. OUTPUT_FILE=None / file-like → output ditulis ke job.output (BytesIO, return run()),
+    di luar config: config tetap kecil saat di-pickle ke proses worker (prefetch / run_jobs).
+    """
+    def __init__(self, config=None, work_dir=None, job_id=None, cache=None):
+        self.job_id = job_id or uuid.uuid4().hex[:8]
+        self.work_dir = os.path.abspath(work_dir) if work_dir else None
+        self.config = {**CONFIG, **(config or {})}
+        self.progress = {"stage": "baru", "sheets": {}}  # dibaca UI (JobQueue.status) selama run
+        self.on_progress = None  # callback opsional on_progress(job) setiap report()
+        self.profiler = StageProfiler(self.config.get("PROFILE_MEMORY", False))
+        self.temp_files = []  # input besar yang di-spill ke disk oleh as_input (hapus via cleanup)
+        self.output = None  # sink output di memory (OUTPUT_FILE None / file-like), bukan bagian config
+        self.owns_work_dir = False  # True kalau work_dir dibuat create() → dihapus cleanup() kalau kosong
+        for key in FILE_CONFIG_KEYS:
+            value = self.config.get(key)
+            if key == "OUTPUT_FILE":
+                if not isinstance(value, (str, os.PathLike)):
+                    self.output = io.BytesIO() if value is None else value
+                    self.config[key] = None
+                    continue
+            else:
+                converted = self.config[key] = as_input(value, self.work_dir, self.config.get("INMEMORY_MAX_MB"))
+                if converted is not value and isinstance(converted, str):
+                    self.temp_files.append(converted)
+                value = converted
+            if self.work_dir and isinstance(value, (str, os.PathLike)) and not os.path.isabs(value):
+                self.config[key] = os.path.join(self.work_dir, value)
+        for key in STATE_PATH_KEYS:
+            value = self.config.get(key)
+            if self.work_dir and isinstance(value, (str, os.PathLike)) and not os.path.isabs(value):
+                self.config[key] = os.path.join(self.work_dir, value)
+        if self.config.get("HISTORY_DIR") and not self.config.get("TAHUN"):
+            raise ValueError("❌ HISTORY_DIR diisi tapi TAHUN kosong: isi tahun laporan BULAN_INI (CONFIG['TAHUN'] / --tahun)")
+        self.cache = cache or ParsedFrameCache(self.config.get("CACHE_DIR", ".etl_cache"),
+                                               self.config.get("CACHE_MAX_MB", 1024),
+                                               self.config.get("USE_CACHE", True))
+
+    @classmethod
+    def create(cls, config=None, base_dir="temp_upload"):
+        """Job baru dengan folder kerja unik di base_dir (file upload & output tidak bentrok antar job)"""
+        job_id = uuid.uuid4().hex[:8]
+        os.makedirs(base_dir, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix=f"job_{job_id}_", dir=base_dir)
+        job = cls(config, work_dir=work_dir, job_id=job_id)
+        job.owns_work_dir = True
+        return job
+
+    def derive(self, **overrides):
+        """Job turunan (mis. per bulan di mode batch): config di-override, folder kerja & cache sama"""
+        job = EtlJob({**self.config, **overrides}, work_dir=self.work_dir, job_id=self.job_id, cache=self.cache)
+        job.profiler = self.profiler
+        return job
+
+    @property
+    def output_target(self):
+        """Tujuan save: BytesIO job (output di memory) atau path OUTPUT_FILE"""
+        return self.output if self.output is not None else self.config["OUTPUT_FILE"]
+
+    def path(self, filename):
+        """Path file di folder kerja job"""
+        return os.path.join(self.work_dir or ".", filename)
+
+    def report(self, stage=None, sheet=None, rows=None, total=None):
+        """Catat progress: stage yang sedang jalan dan/atau baris yang sudah ditulis per sheet"""
+        if stage is not None:
+            self.progress["stage"] = stage
+        if sheet is not None:
+            self.progress["sheets"][sheet] = {"rows": rows, "total": total}
+        if self.on_progress:
+            self.on_progress(self)
+
+    def cleanup(self):
+        """Hapus temp file input hasil spill (input kecil di memory tidak perlu dibersihkan)
+        
+        Folder kerja dari create() ikut dihapus kalau sudah kosong; state / output yang ditulis ke sana dibiarkan.
+        """
+        for path in self.temp_files:
+            if os.path.exists(path):
+                os.remove(path)
+        self.temp_files = []
+        if self.owns_work_dir and os.path.isdir(self.work_dir):
+            try:
+                os.rmdir(self.work_dir)
+            except OSError:
+                pass
+
+    def run(self, stage_cache=None):
+        """Pipeline lengkap (prefetch → extract → transform → load), return OUTPUT_FILE (path / BytesIO)
+        
+        Args:
+            stage_cache: StageResultCache opsional → extract+transform dilewati kalau Lampiran & Rekap sama
+        """
+        key = final = None
+        if stage_cache is not None and all(input_exists(self.config[k]) for k in ("INPUT_FILE", "FILE_REKAP")):
+            key = stage_cache.key_for(self)
+            final = stage_cache.get(key)
+        if final is None:
+            self.report(stage="prefetch")
+            with self.profiler.stage("prefetch"):
+                prefetch_inputs(job=self)
+            self.report(stage="extract")
+            with self.profiler.stage("extract") as stage:
+                m1, m2, raw, kode_nama_map = extract_data(job=self)
+                stage["rows_out"] = len(raw)
+            self.report(stage="transform")
+            with self.profiler.stage("transform", rows_in=len(raw)) as stage:
+                final = transform_data(m1, m2, raw, kode_nama_map, job=self)
+                stage["rows_out"] = len(final)
+            if key is not None:
+                stage_cache.put(key, final)
+        else:
+            print(f"♻️  [1-2/3] EXTRACT & TRANSFORM: dari cache stage ({len(final)} rows), langsung ke LOAD")
+        self.report(stage="load")
+        with self.profiler.stage("load", rows_in=len(final)):
+            load_data(final, job=self)
+        self.report(stage="selesai")
+        self.write_profile()
+        return self.output_target
+
+    def write_profile(self):
+        """Tulis report JSON profiler ke PROFILE_REPORT (kalau di-set) + ringkasan di terminal"""
+        path = self.config.get("PROFILE_REPORT")
+        if not path:
+            return
+        self.profiler.print_summary()
+        self.profiler.save(path, job_id=self.job_id, bulan_lalu=self.config["BULAN_LALU"],
+                           bulan_ini=self.config["BULAN_INI"])
+        print(f"📊 Report profiling disimpan: {path}")
+
+def default_job():
+    """Job dari CONFIG global + cache global (pemanggilan lama tanpa argumen job tetap jalan)"""
+    return EtlJob(cache=get_frame_cache())
+
+# ==============================================================================
+# ROW CLEANSING ENGINE (VECTORIZED)
+# ==============================================================================
+# Pattern di-compile SEKALI; semua rule jalan column-wise (tanpa apply per row)
+GRAND_TOTAL_PATTERN = re.compile(r'grand total', re.IGNORECASE)
+
+# Customer Name pivot summary: exact match (lebih ketat) + keyword yang pasti summary row
+SUMMARY_NAME_EXACT = ['digital platform', 'pln group', 'publik', 'retail']
+SUMMARY_NAME_KEYWORDS = ['sum of', 'persentase', 'percentage', 'row labels', 'column labels', 'subtotal', 'total amount']
+SUMMARY_NAME_PATTERN = re.compile('|'.join(re.escape(k) for k in SUMMARY_NAME_KEYWORDS))
+
+def _text_columns(df):
+    """Kolom yang bisa berisi teks (numeric column tidak mungkin mengandung 'grand total')"""
+    return [c for c in df.columns if df[c].dtype == object or pd.api.types.is_string_dtype(df[c].dtype)]
+
+def _mask_grand_total(df):
+    # DEFENSE LAYER 2: 'grand total' di kolom manapun (handle file Oktober yang broken)
+    mask = np.zeros(len(df), dtype=bool)
+    for c in _text_columns(df):
+        mask |= df[c].astype(str).str.contains(GRAND_TOTAL_PATTERN, na=False).to_numpy(dtype=bool)
+    return mask
+
+def _clean_customer_number(df):
+    # Sama dengan str(x).strip().replace('.0', '').replace('.', '')
+    return (df['Customer Number'].astype(str).str.strip()
+            .str.replace('.0', '', regex=False).str.replace('.', '', regex=False))
+
+def _mask_customer_number_not_digit(df):
+    # Customer Number harus angka murni (bukan text kayak "Digital Platform")
+    return ~_clean_customer_number(df).str.isdigit().fillna(False).to_numpy(dtype=bool)
+
+def _mask_customer_number_too_short(df):
+    # Panjang minimal 8 digit (customer number biasanya 8-10 digit)
+    return (_clean_customer_number(df).str.len() < 8).fillna(False).to_numpy(dtype=bool)
+
+def _customer_name(df):
+    if 'Customer Name' not in df.columns:
+        return pd.Series([''] * len(df), index=df.index)
+    return df['Customer Name'].astype(str).str.lower().str.strip()
+
+def _mask_summary_name_exact(df):
+    return _customer_name(df).isin(SUMMARY_NAME_EXACT).to_numpy(dtype=bool)
+
+def _mask_summary_name_keyword(df):
+    return _customer_name(df).str.contains(SUMMARY_NAME_PATTERN, na=False).to_numpy(dtype=bool)
+
+# Urutan rule = urutan evaluasi; row yang di-drop dihitung di rule PERTAMA yang kena
+ROW_CLEANSING_RULES = [
+    ("grand_total", "rows dengan 'Grand Total' (total/subtotal rows)", _mask_grand_total),
+    ("customer_number_not_digit", "rows Customer Number bukan angka", _mask_customer_number_not_digit),
+    ("customer_number_too_short", "rows Customer Number < 8 digit", _mask_customer_number_too_short),
+    ("summary_name_exact", "rows pivot summary (Digital Platform, PLN Group, Publik, Retail)", _mask_summary_name_exact),
+    ("summary_name_keyword", "rows pivot summary (Sum of, Subtotal, Row Labels, dll)", _mask_summary_name_keyword),
+]
+
+def cleanse_customer_rows(df_raw, rules=None):
+    """Filter row non-customer secara vectorized dan laporkan jumlah drop per rule
+    
+    Args:
+        df_raw: DataFrame Konsol (sudah punya kolom 'Customer Number')
+        rules: list (nama, deskripsi, fungsi mask) — default ROW_CLEANSING_RULES
+    
+    Returns:
+        tuple: (DataFrame yang lolos semua rule, dict {nama_rule: jumlah_drop})
+    """
+    rules = ROW_CLEANSING_RULES if rules is None else rules
+    keep = np.ones(len(df_raw), dtype=bool)
+    drop_report = {}
+    for name, _, mask_fn in rules:
+        dropped = mask_fn(df_raw) & keep
+        drop_report[name] = int(dropped.sum())
+        keep &= ~dropped
+    return df_raw[keep].copy(), drop_report
+
+# ==============================================================================
+# PRODUCT CATALOG (COMPILED INDEX)
+# ==============================================================================
+PRODUCT_NAME_COLS = ['Product Portofolio Segmen 1', 'Product Portofolio Segmen 2', 'Product Portofolio Segmen 3', 'SEGMEN']
+PORTFOLIO_COLS = ['ICON+ Product', 'Business Portofolio Segment 0', 'Kode 0', 'Product Portofolio Segmen 1', 'Kode 1', 'Product Portofolio Segmen 2', 'Kode 2', 'Product Portofolio Segmen 3', 'Kode 3', 'SEGMEN']
+
+class ProductCatalog(Mapping):
+    """Index produk dari file Rekap: nama produk (super_clean) → kode, kode → detail portofolio
+
+    Di-build SEKALI secara vectorized, disimpan di CACHE_DIR (portofolio Parquet + nama → kode JSON)
+    dan di-load ulang selama hash isi file Rekap tidak berubah. Berperilaku seperti dict nama → kode (pengganti prod_to_kode lama).
+    """
+    VERSION = 2  # naikkan kalau logika build berubah (cache lama otomatis tidak dipakai)
+
+    def __init__(self, name_to_kode, portfolio):
+        self.name_to_kode = name_to_kode
+        self.portfolio = portfolio.reset_index(drop=True)
+        # kode (Join_Key) → posisi integer di array portofolio
+        self.kode_index = pd.Index(self.portfolio['Join_Key'])
+        self.kode_pos = {k: i for i, k in enumerate(self.kode_index)}
+        self.portfolio_arrays = {c: self.portfolio[c].to_numpy(dtype=object) for c in self.portfolio.columns if c != 'Join_Key'}
+
+    # --- Mapping interface (nama → kode) ---
+    def __getitem__(self, name):
+        return self.name_to_kode[name]
+
+    def __iter__(self):
+        return iter(self.name_to_kode)
+
+    def __len__(self):
+        return len(self.name_to_kode)
+
+    # --- Lookup ---
+    def kode_for_name(self, name):
+        """Nama produk (mentah) → kode, None kalau tidak ada"""
+        return self.name_to_kode.get(super_clean(name))
+
+    def portfolio_for_kode(self, kode):
+        """Kode produk → dict detail portofolio, None kalau tidak ada di ALL PRODUCT PDF"""
+        pos = self.kode_pos.get(super_clean(kode))
+        if pos is None:
+            return None
+        return {c: arr[pos] for c, arr in self.portfolio_arrays.items()}
+
+    def kodes_for_names(self, names):
+        """Batch: Series nama produk → Series kode (NaN kalau tidak ada)"""
+        return super_clean_series(names).map(self.name_to_kode)
+
+    def portfolio_positions(self, kodes):
+        """Batch: Series kode → array posisi integer (-1 kalau tidak ada)"""
+        return self.kode_index.get_indexer(super_clean_series(pd.Series(kodes)))
+
+    def portfolio_frame(self, kodes):
+        """Batch: Series kode → DataFrame kolom portofolio (baris tidak ketemu = NaN)"""
+        pos = self.portfolio_positions(kodes)
+        missing = pos < 0
+        data = {}
+        for c, arr in self.portfolio_arrays.items():
+            col = arr.take(np.where(missing, 0, pos)) if len(arr) else np.full(len(pos), np.nan, dtype=object)
+            col[missing] = np.nan
+            data[c] = col
+        return pd.DataFrame(data, index=getattr(kodes, 'index', None))
+
+    # --- Cache ---
+    def to_cache(self, cache, key):
+        """Simpan ke cache disk: portofolio sebagai frame, nama → kode sebagai JSON (tanpa pickle)"""
+        cache.put(f"{key}-portfolio", self.portfolio, remember=False)
+        cache.put_meta(f"{key}-names", self.name_to_kode, remember=False)
+
+    @classmethod
+    def from_cache(cls, cache, key):
+        """Catalog dari cache disk, None kalau salah satu bagian miss"""
+        name_to_kode = cache.get_meta(f"{key}-names", remember=False)
+        if name_to_kode is None:
+            return None
+        portfolio = cache.get(f"{key}-portfolio")
+        return cls(name_to_kode, portfolio) if portfolio is not None else None
+
+    # --- Build ---
+    @classmethod
+    def build(cls, df_pdf, df_sap=None):
+        """Build catalog dari sheet ALL PRODUCT PDF (+ fallback sheet SAP), tanpa iterrows"""
+        validate_required_columns(df_pdf, ['ICON+ Product'], context="ALL PRODUCT PDF")
+
+        # Mencari nama produk di semua level segmen
+        # Urutan sama dengan loop lama: per row, per kolom segmen → entry terakhir menang
+        kode_icon = as_str_series(df_pdf['ICON+ Product']).str.strip().str.replace('.0', '', regex=False)
+        valid_kode = (kode_icon != '') & (kode_icon != 'nan')
+        name_cols = [c for c in PRODUCT_NAME_COLS if c in df_pdf.columns]
+        pairs = []
+        for col_order, col in enumerate(name_cols):
+            nama_raw = as_str_series(df_pdf[col]).str.strip()
+            valid = valid_kode & (nama_raw != '') & (nama_raw != 'nan')
+            pairs.append(pd.DataFrame({
+                'row': np.arange(len(df_pdf))[valid.to_numpy()],
+                'col': col_order,
+                'nama': super_clean_series(nama_raw[valid]).to_numpy(),
+                'kode': kode_icon[valid].to_numpy(),
+            }))
+        name_to_kode = {}
+        if pairs:
+            df_pairs = pd.concat(pairs).sort_values(['row', 'col'], kind='stable')
+            df_pairs = df_pairs.drop_duplicates(subset=['nama'], keep='last')
+            name_to_kode = dict(zip(df_pairs['nama'], df_pairs['kode']))
+
+        # Fallback ke tab SAP jika ada yang belum tercover (entry pertama menang)
+        try:
+            if df_sap is not None:
+                validate_required_columns(df_sap, ['Nama Produk', 'Kode di SAP'], context="SAP Sheet")
+                nama_sap = as_str_series(df_sap['Nama Produk']).str.strip()
+                kode_sap = as_str_series(df_sap['Kode di SAP']).str.strip().str.replace('.0', '', regex=False)
+                df_sap_pairs = pd.DataFrame({'nama': super_clean_series(nama_sap).to_numpy(), 'kode': kode_sap.to_numpy()})
+                df_sap_pairs = df_sap_pairs[(nama_sap != 'nan').to_numpy() & ~df_sap_pairs['nama'].isin(name_to_kode).to_numpy()]
+                df_sap_pairs = df_sap_pairs.drop_duplicates(subset=['nama'], keep='first')
+                name_to_kode.update(zip(df_sap_pairs['nama'], df_sap_pairs['kode']))
+        except Exception as e:
+            print(f"⚠️  Warning: Gagal load SAP sheet (optional): {e}")
+
+        # Detail Portofolio untuk tab Realisasi
+        df_portfolio = df_pdf[[c for c in PORTFOLIO_COLS if c in df_pdf.columns]].copy()
+        df_portfolio['Join_Key'] = super_clean_series(df_portfolio['ICON+ Product'])
+        df_portfolio = df_portfolio.drop_duplicates(subset=['Join_Key'])
+        return cls(name_to_kode, df_portfolio)
+
+    @classmethod
+    def _cache_key(cls, cache, path):
+        return cache.make_key(cache.file_digest(path), kind="product_catalog", version=cls.VERSION)
+
+    @classmethod
+    def load_or_build(cls, path, cache=None, engine=None):
+        """Load catalog dari cache (hash Rekap sama) atau build dari workbook Rekap lalu simpan"""
+        cache = cache or get_frame_cache()
+        key = cls._cache_key(cache, path) if cache.active else None
+        catalog = (cache.get_object(key) or cls.from_cache(cache, key)) if key else None
+        if isinstance(catalog, cls):
+            print(f"   > ProductCatalog di-load dari cache/prefetch ({len(catalog)} nama produk)")
+            return catalog
+
+        # Rekap dibuka SEKALI: ALL PRODUCT PDF + SAP dibaca dari handle yang sama (atau dari cache)
+        with CachedWorkbook(path, cache, engine) as book_rekap:
+            if "ALL PRODUCT PDF" not in book_rekap.sheet_names:
+                raise ValueError(f"❌ Sheet 'ALL PRODUCT PDF' tidak ditemukan di {path}. Sheet tersedia: {book_rekap.sheet_names}")
+            df_pdf = book_rekap.read_frame("ALL PRODUCT PDF", header=2)
+
+            sap_sheet = next((s for s in book_rekap.sheet_names if "sap" in s.lower()), None)
+            df_sap = None
+            if sap_sheet:
+                try:
+                    df_sap = book_rekap.read_frame(sap_sheet, header=1)
+                except Exception as e:
+                    print(f"⚠️  Warning: Gagal load SAP sheet (optional): {e}")
+
+        df_pdf.columns = [str(c).strip() for c in df_pdf.columns]
+        catalog = cls.build(df_pdf, df_sap)
+        if key:
+            catalog.to_cache(cache, key)
+            cache.put_object(key, catalog)
+        return catalog
+
+# ==============================================================================
+# PREFETCH INPUT (PARSE PARALEL DI PROCESS POOL)
+# ==============================================================================
+# Config key file → fungsi baca yang SAMA dengan yang dipanggil stage (hasilnya lewat cache memory)
+PREFETCH_TASKS = {
+    "FILE_REKAP": lambda path, cache, engine: ProductCatalog.load_or_build(path, cache, engine),
+    "INPUT_FILE": lambda path, cache, engine: read_konsol_sheet(path, cache, engine),
+    "FILE_PELANGGAN": lambda path, cache, engine: read_raw_export(path, cache, engine),
+    "FILE_OPT": lambda path, cache, engine: read_raw_export(path, cache, engine),
+}
+
+def _prefetch_worker(config_key, path, cache_settings, engine):
+    """Jalan di proses worker: parse satu file, return entry cache yang dihasilkan {key: frame/objek}
+    
+    Yang di-pickle ke worker hanya file yang diparse (path / InputBuffer) + setting cache & engine,
+    bukan seluruh config job (input upload lain tidak ikut disalin ke setiap proses).
+    """
+    cache = ParsedFrameCache(*cache_settings)
+    cache.record = True
+    PREFETCH_TASKS[config_key](path, cache, engine)
+    return cache.memory
+
+def _template_workbook_key(cache, path):
+    return cache.make_key(cache.file_digest(path), kind="template_workbook")
+
+def load_template_workbook(path, cache=None):
+    """Workbook template untuk diedit: hasil prefetch kalau ada (dipakai SEKALI), selain itu load_workbook"""
+    cache = cache or get_frame_cache()
+    wb = cache.memory.pop(_template_workbook_key(cache, path), None) if cache.memory else None
+    return wb if wb is not None else load_workbook(open_input(path))
+
+def prefetch_inputs(max_workers=None, input_files=None, job=None):
+    """Parse Rekap, Lampiran, Pelanggan & OPT paralel di process pool + load template di proses utama
+    
+    Hasil parsing disimpan di layer memory cache job (job.cache.memory) dan diambil oleh
+    extract_data / update_sheet_* / load_data lewat jalur baca biasa, jadi wall-clock ≈ parse
+    file paling lambat, bukan jumlah semuanya. Workbook template tidak di-pickle antar proses
+    (sama mahalnya dengan parse ulang), jadi di-load di proses utama selama worker jalan.
+    Gagal prefetch tidak fatal: stage akan membaca file sendiri seperti biasa.
+    
+    Args:
+        input_files: list file Lampiran (mode batch: semua bulan sekaligus), default [INPUT_FILE]
+    """
+    job = job or default_job()
+    cfg = job.config
+    workers = cfg.get("PREFETCH_WORKERS", 4) if max_workers is None else max_workers
+    cache = job.cache
+    cache.memory = {k: v for k, v in cache.memory.items() if cache._is_pinned(k)}
+    tasks = [(key, cfg[key]) for key in PREFETCH_TASKS if key != "INPUT_FILE"]
+    tasks += [("INPUT_FILE", path) for path in (input_files or [cfg["INPUT_FILE"]])]
+    tasks = [(key, path) for key, path in tasks if input_exists(path)]
+    # Parse CPU-bound: lebih dari jumlah core tidak mempercepat, 1 core → overhead proses saja
+    workers = min(workers, len(tasks), os.cpu_count() or 1)
+    if workers < 2:
+        return
+    
+    print(f"⚡ [0/3] PREFETCH: Parse {len(tasks)} workbook input paralel ({workers} proses)...")
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            cache_settings = (cache.cache_dir, cache.max_bytes / 1024 / 1024, cache.enabled)
+            futures = {pool.submit(_prefetch_worker, key, path, cache_settings, cfg.get("EXCEL_ENGINE")): path
+                       for key, path in tasks}
+            if input_exists(cfg["TEMPLATE_FILE"]):
+                template_wb = load_workbook(open_input(cfg["TEMPLATE_FILE"]))
+                cache.memory[_template_workbook_key(cache, cfg["TEMPLATE_FILE"])] = template_wb
+            for future in as_completed(futures):
+                try:
+                    cache.memory.update(future.result())
+                except Exception as e:
+                    print(f"   ⚠️  Warning: Prefetch {futures[future]} gagal, dibaca ulang di stage: {e}")
     except Exception as e:
-        print(f"⚠️  Warning: Gagal load SAP sheet (optional): {e}")
-
-    # Detail Portofolio untuk tab Realisasi
-    portfolio_cols = ['ICON+ Product', 'Business Portofolio Segment 0', 'Kode 0', 'Product Portofolio Segmen 1', 'Kode 1', 'Product Portofolio Segmen 2', 'Kode 2', 'Product Portofolio Segmen 3', 'Kode 3', 'SEGMEN']
-    df_portfolio = df_pdf[[c for c in portfolio_cols if c in df_pdf.columns]].copy()
-    df_portfolio['Join_Key'] = df_portfolio['ICON+ Product'].apply(super_clean)
-    df_portfolio = df_portfolio.drop_duplicates(subset=['Join_Key'])
-
-    # Baca Raw Konsol
-    xls_raw = pd.ExcelFile(CONFIG["INPUT_FILE"])
-    target_sheet = next((s for s in xls_raw.sheet_names if "Konsol" in s), None)
-    
-    if not target_sheet:
-        raise ValueError(f"❌ Sheet 'Konsol' tidak ditemukan di {CONFIG['INPUT_FILE']}. Sheet tersedia: {xls_raw.sheet_names}")
-    
-    # Cari header row: cari row yang ada "Customer No" atau "Customer Name"
-    # Handle 2 struktur: November (ada Row Labels) vs Desember (tanpa Row Labels)
-    df_tmp = pd.read_excel(xls_raw, sheet_name=target_sheet, header=None, nrows=20)
-    h_row = 0
-    has_row_labels = False
-    for i, r in df_tmp.iterrows():
-        row_str = r.astype(str).str.lower().tolist()
-        if any(k in row_str for k in ["customer no", "customer name", "customer number"]):
-            h_row = i
-            # Check apakah ada "Row Labels" di kolom pertama
-            if "row labels" in str(r.iloc[0]).lower():
-                has_row_labels = True
-            break
+        print(f"   ⚠️  Warning: Process pool tidak bisa dipakai, baca berurutan: {e}")
+        return
+    print(f"   > Prefetch selesai dalam {time.perf_counter() - t0:.1f}s ({len(cache.memory)} entry siap)")
+
+# ==============================================================================
+# FASE 1: EXTRACT (GLOBAL SEARCH)
+# ==============================================================================
+def find_konsol_header_row(df_tmp):
+    """Cari header row: cari row yang ada "Customer No" atau "Customer Name"
+    
+    Handle 2 struktur: November (ada Row Labels) vs Desember (tanpa Row Labels)
+    
+    Returns:
+        tuple: (h_row, has_row_labels)
+    """
+    h_row = SheetHeaderIndex.from_frame(df_tmp).find_row({"customer no", "customer name", "customer number"})
+    if h_row is None:
+        return 0, False
+    # Check apakah ada "Row Labels" di kolom pertama
+    has_row_labels = "row labels" in str(df_tmp.iat[h_row, 0]).lower()
+    return h_row, has_row_labels
+
+def read_konsol_sheet(path, cache=None, engine=None):
+    """Baca sheet '*Konsol*' dari file Lampiran: probe 20 row pertama untuk header, lanjut ke data
+    
+    Returns:
+        tuple: (df_probe, (h_row, has_row_labels), df_raw)
+    """
+    with CachedWorkbook(path, cache, engine) as book_raw:
+        target_sheet = next((s for s in book_raw.sheet_names if "Konsol" in s), None)
+        
+        if not target_sheet:
+            raise ValueError(f"❌ Sheet 'Konsol' tidak ditemukan di {path}. Sheet tersedia: {book_raw.sheet_names}")
+        
+        return book_raw.read_frame_with_probe(target_sheet, find_konsol_header_row)
+
+def extract_data(job=None):
+    job = job or default_job()
+    cfg = job.config
+    print(f"🚀 [1/3] EXTRACT: Mapping Master Data...")
+    
+    # Validasi file exists
+    if not input_exists(cfg["FILE_REKAP"]):
+        raise FileNotFoundError(f"❌ File Rekap tidak ditemukan: {cfg['FILE_REKAP']}")
+    if not input_exists(cfg["INPUT_FILE"]):
+        raise FileNotFoundError(f"❌ File Input tidak ditemukan: {cfg['INPUT_FILE']}")
+    
+    # Mapping nama produk → kode + detail portofolio (ProductCatalog, di-cache per hash file Rekap)
+    prod_to_kode = ProductCatalog.load_or_build(cfg["FILE_REKAP"], job.cache, cfg.get("EXCEL_ENGINE"))
+    df_portfolio = prod_to_kode.portfolio
+
+    # Baca Raw Konsol (SEKALI buka, SEKALI stream): probe header dari 20 row pertama, lanjut ke data
+    df_tmp, (h_row, has_row_labels), df_raw = read_konsol_sheet(cfg["INPUT_FILE"], job.cache, cfg.get("EXCEL_ENGINE"))
     
     # BACA NAMA PRODUK dari row sebelum header (h_row - 1)
     # Row h_row-1 = nama produk lengkap, Row h_row = kode produk
@@ -244,8 +1702,6 @@ def extract_data():
     
     print(f"   > Mapped {len(kode_to_nama_produk)} kode → nama produk (contoh: {list(kode_to_nama_produk.items())[:3]})")
     
-    df_raw = pd.read_excel(xls_raw, sheet_name=target_sheet, header=h_row)
-    
     # FIX: Rename kolom "Customer No" → "Customer Number" (ignore "Row Labels")
     rename_map = {}
     
@@ -280,53 +1736,19 @@ def extract_data():
     if before_drop > after_drop:
         print(f"   > Dropped {before_drop - after_drop} rows tanpa Customer Number (subtotal/header/merged cells)")
     
-    # DEFENSE LAYER 2: Filter Grand Total di SEMUA kolom (handle file Oktober yang broken)
-    # Cek semua kolom (Row Labels, Customer Number, Customer Name, dll) untuk string "grand total"
-    before_total_filter = len(df_raw)
-    mask_grand_total = df_raw.apply(lambda row: row.astype(str).str.lower().str.contains('grand total', na=False).any(), axis=1)
-    df_raw = df_raw[~mask_grand_total].copy()
-    after_total_filter = len(df_raw)
-    
-    if before_total_filter > after_total_filter:
-        print(f"   > Dropped {before_total_filter - after_total_filter} rows dengan 'Grand Total' (total/subtotal rows)")
-    
-    # DEFENSE LAYER 3: Filter pivot table summary rows (Digital Platform, PLN Group, Publik, Retail, dll)
-    # Detect keywords yang menandakan ini bukan customer data
-    # Check di Customer Name (bukan di semua kolom) untuk lebih presisi
-    before_summary_filter = len(df_raw)
-    
-    # Filter berdasarkan Customer Number yang valid (harus angka murni, bukan text)
-    # Dan Customer Name yang bukan summary row
-    def is_valid_customer_row(row):
-        cust_no = str(row['Customer Number']).strip().replace('.0', '').replace('.', '')
-        cust_name = str(row.get('Customer Name', '')).lower().strip() if 'Customer Name' in row.index else ''
-        
-        # Check Customer Number: harus angka murni (bukan text kayak "Digital Platform")
-        # Relaxed check: asal digit aja, tidak perlu cek prefix 20000
-        if not cust_no.isdigit():
-            return False
-        
-        # Check panjang minimal (customer number biasanya 8-10 digit)
-        if len(cust_no) < 8:
-            return False
-        
-        # Check Customer Name: filter ONLY exact summary rows (lebih ketat)
-        # Gunakan exact match atau keyword yang sangat specific
-        if cust_name in ['digital platform', 'pln group', 'publik', 'retail']:
-            return False
-        
-        # Keyword yang pasti summary row (lebih aman)
-        if any(keyword in cust_name for keyword in ['sum of', 'persentase', 'percentage', 
-                                                     'row labels', 'column labels', 'subtotal', 'total amount']):
-            return False
-        
-        return True
+    # DEFENSE LAYER 2 & 3: Filter Grand Total + pivot summary rows (Digital Platform, PLN Group, dll)
+    # Semua rule vectorized (lihat ROW_CLEANSING_RULES), drop count dilaporkan per rule
+    df_raw, drop_report = cleanse_customer_rows(df_raw)
     
-    df_raw = df_raw[df_raw.apply(is_valid_customer_row, axis=1)].copy()
-    after_summary_filter = len(df_raw)
+    if drop_report["grand_total"]:
+        print(f"   > Dropped {drop_report['grand_total']} rows dengan 'Grand Total' (total/subtotal rows)")
     
-    if before_summary_filter > after_summary_filter:
-        print(f"   > Dropped {before_summary_filter - after_summary_filter} rows pivot summary (Digital Platform, PLN Group, Publik, Retail, dll)")
+    summary_dropped = sum(n for rule, n in drop_report.items() if rule != "grand_total")
+    if summary_dropped:
+        print(f"   > Dropped {summary_dropped} rows pivot summary (Digital Platform, PLN Group, Publik, Retail, dll)")
+        for name, desc, _ in ROW_CLEANSING_RULES[1:]:
+            if drop_report.get(name):
+                print(f"     - {name}: {drop_report[name]} {desc}")
     
     # DEBUG: Print jumlah data yang tersisa
     print(f"   > Final data count: {len(df_raw)} rows (customer data yang valid)")
@@ -336,7 +1758,39 @@ def extract_data():
 # ==============================================================================
 # FASE 2: TRANSFORM
 # ==============================================================================
-def transform_data(prod_to_kode, df_portfolio, df_raw, kode_to_nama_produk):
+def sparse_unpivot(df_raw, id_cols, prod_cols):
+    """Unpivot customer × produk TANPA materialisasi cell 0 (Konsol >90% kosong)
+    
+    Blok produk dikonversi ke matrix NumPy, koordinat nonzero diambil langsung, lalu frame
+    panjang dibentuk dari koordinat itu dengan kolom customer categorical (string tidak diulang).
+    Hasil (urutan row, Produk_Raw, Value) sama dengan pd.melt + filter Value != 0.
+    
+    Returns:
+        DataFrame: id_cols + 'Produk_Raw' + 'Value'
+    """
+    n_rows = len(df_raw)
+    numeric = [pd.to_numeric(df_raw[c], errors='coerce') for c in prod_cols]
+    dtype = np.result_type(*[s.dtype for s in numeric]) if numeric else np.float64
+    
+    # Fortran order: nonzero di-scan per kolom produk (urutan sama dengan pd.melt)
+    matrix = np.empty((n_rows, len(prod_cols)), dtype=dtype, order='F')
+    for j, s in enumerate(numeric):
+        matrix[:, j] = s.fillna(0).to_numpy(dtype=dtype)
+    col_idx, row_idx = np.nonzero(matrix.T)
+    
+    data = {}
+    for c in id_cols:
+        codes, uniques = pd.factorize(df_raw[c])
+        data[c] = pd.Categorical.from_codes(codes[row_idx], categories=uniques)
+    data['Produk_Raw'] = np.asarray(prod_cols, dtype=object)[col_idx] if len(prod_cols) else np.empty(0, dtype=object)
+    data['Value'] = matrix[row_idx, col_idx]
+    
+    # Index = posisi row di hasil melt (col * n_rows + row), konsisten dengan path melt
+    return pd.DataFrame(data, index=col_idx * n_rows + row_idx)
+
+def transform_data(prod_to_kode, df_portfolio, df_raw, kode_to_nama_produk, job=None):
+    job = job or default_job()
+    cfg = job.config
     print("⚙️ [2/3] TRANSFORM: Unpivoting & Matching...")
     
     # Validasi input tidak kosong
@@ -365,9 +1819,12 @@ def transform_data(prod_to_kode, df_portfolio, df_raw, kode_to_nama_produk):
     print(f"   > Customer Columns: {id_cols}")
     print(f"   > Product Columns: {len(prod_cols)} produk (contoh: {prod_cols[:3]}...)")
     
-    df_melt = pd.melt(df_raw, id_vars=id_cols, value_vars=prod_cols, var_name='Produk_Raw', value_name='Value')
-    df_melt['Value'] = pd.to_numeric(df_melt['Value'], errors='coerce').fillna(0)
-    df_melt = df_melt[df_melt['Value'] != 0].copy()
+    if cfg.get("UNPIVOT_MODE", "sparse") == "sparse":
+        df_melt = sparse_unpivot(df_raw, id_cols, prod_cols)
+    else:
+        df_melt = pd.melt(df_raw, id_vars=id_cols, value_vars=prod_cols, var_name='Produk_Raw', value_name='Value')
+        df_melt['Value'] = pd.to_numeric(df_melt['Value'], errors='coerce').fillna(0)
+        df_melt = df_melt[df_melt['Value'] != 0].copy()
     
     # Mapping produk: cek apakah Produk_Raw sudah kode (angka) atau nama (text)
     def get_kode_produk(prod_raw):
@@ -385,15 +1842,9 @@ def transform_data(prod_to_kode, df_portfolio, df_raw, kode_to_nama_produk):
         # Kalau bukan angka, cari di mapping nama → kode
         return prod_to_kode.get(super_clean(prod_raw), None)
     
-    df_melt['Kode Produk'] = df_melt['Produk_Raw'].apply(get_kode_produk)
-    df_melt['Join_Key'] = df_melt['Kode Produk'].apply(super_clean)
-    
     # Map kode produk ke nama lengkap (dari row nama produk di Konsol)
     # Kalau kode produk adalah angka (121, 122), cari nama lengkapnya
-    def get_nama_produk_lengkap(row):
-        prod_raw = row['Produk_Raw']
-        kode = row['Kode Produk']
-        
+    def get_nama_produk_lengkap(prod_raw, kode):
         # Kalau Produk_Raw sudah nama (string panjang), pakai itu
         if isinstance(prod_raw, str) and len(prod_raw) > 10:
             return prod_raw
@@ -405,11 +1856,22 @@ def transform_data(prod_to_kode, df_portfolio, df_raw, kode_to_nama_produk):
         # Fallback: pakai Produk_Raw apa adanya
         return str(prod_raw)
     
-    df_melt['Nama Produk Lengkap'] = df_melt.apply(get_nama_produk_lengkap, axis=1)
+    # Resolusi SEKALI per Produk_Raw unik (±100 kolom produk), lalu broadcast ke semua row via kode kategori
+    # → biaya transform ikut jumlah kolom produk, bukan jumlah row hasil melt
+    produk_unique = pd.Index(df_melt['Produk_Raw'].unique())
+    kode_unique = [get_kode_produk(p) for p in produk_unique]
+    resolved = pd.DataFrame({
+        'Kode Produk': pd.Series(kode_unique, dtype=object),
+        'Join_Key': [super_clean(k) for k in kode_unique],
+        'Nama Produk Lengkap': [get_nama_produk_lengkap(p, k) for p, k in zip(produk_unique, kode_unique)],
+    })
+    codes = produk_unique.get_indexer(df_melt['Produk_Raw'])
+    for col in resolved.columns:
+        df_melt[col] = resolved[col].take(codes).to_numpy()
     
-    # DEBUG: Cek berapa produk yang tidak ada di portfolio
-    unique_kode = df_melt['Kode Produk'].unique()
-    portfolio_keys = df_portfolio['Join_Key'].unique()
+    # DEBUG: Cek berapa produk yang tidak ada di portfolio (set lookup, bukan `in` ke numpy array)
+    unique_kode = pd.unique(np.asarray(kode_unique, dtype=object))
+    portfolio_keys = set(df_portfolio['Join_Key'])
     missing_kode = [k for k in unique_kode if super_clean(k) not in portfolio_keys]
     if missing_kode:
         print(f"   ⚠️  WARNING: {len(missing_kode)} kode produk tidak ditemukan di ALL PRODUCT PDF:")
@@ -440,332 +1902,966 @@ def transform_data(prod_to_kode, df_portfolio, df_raw, kode_to_nama_produk):
 
 
 # ==============================================================================
-# FASE 3: LOAD (DINAMIS S-R LOGIC)
+# STREAMING SHEET WRITER (XML LANGSUNG, TANPA OBJECT CELL)
 # ==============================================================================
-def load_data(df_final):
-    print("💾 [3/3] LOAD: Update Dashboard dengan Logika Dinamis S-R...")
+class StreamedSheetRows:
+    """Baris data sheet yang ditulis langsung sebagai XML saat save (memori konstan)
+    
+    Dipakai untuk sheet data besar (Realisasi, Data Pelanggan, Data OPT): openpyxl hanya
+    menyimpan row header, baris data di-generate per chunk dari DataFrame dan disisipkan
+    ke part XML sheet. Tipe ditulis sama seperti openpyxl (angka, bool, teks, formula '=...',
+    error code, tanggal/waktu + number format); None/NaN/"" dilewati (cell kosong).
     
-    # 1. AMBIL SALDO OKTOBER (LALU) SEBAGAI ANGKA
-    wb_master = load_workbook(CONFIG["TEMPLATE_FILE"], data_only=True, keep_vba=False)
-    ws_dash_m = wb_master["Dashboard"]
+    Args:
+        columns: index kolom Excel (1-based) per kolom df, default 1..n berurutan
+        formulas: {index kolom: formula hasil compile_row_formula()} yang diulang tiap baris
+    
+    cached_values {index kolom formula: [(atribut t, xml <v>) per baris]} diisi FormulaEvaluator,
+    kolom tanpa entry ditulis tanpa cached value.
+    """
+    def __init__(self, df, start_row=2, chunk_rows=2000, columns=None, formulas=None):
+        self.df = df
+        self.start_row = start_row
+        self.chunk_rows = chunk_rows
+        self.columns = list(columns) if columns is not None else list(range(1, len(df.columns) + 1))
+        self.formulas = dict(formulas or {})
+        self.cached_values = {}
+        self.rows_written = 0
+        self.ws = None
+        self._temporal_styles = {}
+
+    @property
+    def last_row(self):
+        return self.start_row + len(self.df) - 1
+
+    @property
+    def max_column(self):
+        return max(self.columns + list(self.formulas), default=1)
+
+    def bind(self, ws):
+        """Worksheet tujuan (untuk style number format tanggal), dipanggil save_workbook_streaming"""
+        self.ws = ws
+
+    def _temporal_xml(self, ref, value):
+        """Tanggal/waktu → serial Excel + style number format default openpyxl"""
+        style_id = self._temporal_styles.get(type(value))
+        if style_id is None:
+            # Cell dummy (tidak masuk storage cell sheet) hanya untuk mendaftarkan style ke workbook
+            style_id = self._temporal_styles[type(value)] = Cell(self.ws, value=value).style_id
+        return f'<c r="{ref}" s="{style_id}" t="n"><v>{"%.16g" % to_excel(value, self.ws.parent.epoch)}</v></c>'
+
+    def _cell_xml(self, ref, value):
+        if value is None:
+            return ""
+        t = type(value)
+        if t is str or isinstance(value, str):
+            if value == "":
+                return ""
+            if next(ILLEGAL_CHARACTERS_RE.finditer(value), None):
+                raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+            value = value[:32767]
+            if len(value) > 1 and value.startswith("="):
+                return f'<c r="{ref}"><f>{xml_escape(value[1:])}</f><v /></c>'
+            if value in ERROR_CODES:
+                return f'<c r="{ref}" t="e"><v>{value}</v></c>'
+            space = ' xml:space="preserve"' if value != value.strip() else ''
+            return f'<c r="{ref}" t="inlineStr"><is><t{space}>{xml_escape(value)}</t></is></c>'
+        if t is bool or isinstance(value, np.bool_):
+            return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float, np.integer, np.floating)):
+            if value != value or value in (float('inf'), float('-inf')):
+                return ""  # NaN / inf → cell kosong
+            return f'<c r="{ref}" t="n"><v>{"%.16g" % value}</v></c>'
+        if pd.isna(value):
+            return ""
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)) and self.ws is not None:
+            return self._temporal_xml(ref, value)
+        value = str(value)
+        return f'<c r="{ref}" t="inlineStr"><is><t>{xml_escape(value)}</t></is></c>'
+
+    def iter_xml(self):
+        """Generator potongan XML <row> per chunk"""
+        letters = [get_column_letter(c) for c in self.columns]
+        formula_cols = sorted(self.formulas)
+        # Fragmen XML formula di-escape sekali per kolom, per baris tinggal format nomor row
+        formula_xml = [f'<c r="{get_column_letter(c)}{{row}}"{{t}}><f>{xml_escape(self.formulas[c][1:])}</f>{{v}}</c>'
+                       for c in formula_cols]
+        no_cache = ("", "<v />")
+        cached = [self.cached_values.get(c) for c in formula_cols]
+        # Cell dalam <row> wajib urut kolom: urutan gabungan nilai + formula dihitung sekali
+        order = sorted(range(len(self.columns) + len(formula_cols)), key=(self.columns + formula_cols).__getitem__)
+        cell_xml = self._cell_xml
+        buf = []
+        for i, row in enumerate(self.df.itertuples(index=False, name=None)):
+            r_idx = self.start_row + i
+            cells = [cell_xml(f"{letter}{r_idx}", val) for letter, val in zip(letters, row)]
+            if formula_xml:
+                for frag, values in zip(formula_xml, cached):
+                    t, v = values[i] if values is not None else no_cache
+                    cells.append(frag.format(row=r_idx, t=t, v=v))
+                cells = [cells[i] for i in order]
+            buf.append(f'<row r="{r_idx}">{"".join(cells)}</row>')
+            if len(buf) >= self.chunk_rows:
+                self.rows_written += len(buf)
+                yield "".join(buf)
+                buf = []
+        if buf:
+            self.rows_written += len(buf)
+            yield "".join(buf)
+
+    def splice(self, header_xml, out, progress=None):
+        """Tulis XML sheet final ke `out`: part dari openpyxl (row header saja) + baris stream
+        
+        progress: callback opsional progress(rows_written) setiap satu chunk selesai ditulis
+        """
+        if '</sheetData>' in header_xml:
+            prefix, suffix = header_xml.split('</sheetData>', 1)
+            suffix = '</sheetData>' + suffix
+        else:
+            prefix, suffix = re.split(r'<sheetData\s*/>', header_xml, maxsplit=1)
+            prefix += '<sheetData>'
+            suffix = '</sheetData>' + suffix
+        if len(self.df):
+            # Perluas <dimension> openpyxl (area header) sampai baris & kolom terakhir hasil stream
+            m = re.search(r'<dimension ref="([A-Z]+\d+)(?::([A-Z]+)(\d+))?"\s*/>', prefix)
+            first, max_col, max_row = "A1", self.max_column, self.last_row
+            if m:
+                first = m.group(1)
+                if m.group(2):
+                    max_col = max(max_col, column_index_from_string(m.group(2)))
+                    max_row = max(max_row, int(m.group(3)))
+            prefix = re.sub(r'<dimension ref="[^"]*"\s*/>', f'<dimension ref="{first}:{get_column_letter(max_col)}{max_row}" />', prefix, count=1)
+        out.write(prefix.encode('utf-8'))
+        for chunk in self.iter_xml():
+            out.write(chunk.encode('utf-8'))
+            if progress:
+                progress(self.rows_written)
+        out.write(suffix.encode('utf-8'))
+
+class _StreamingArchive:
+    """Proxy ZipFile untuk ExcelWriter openpyxl: part sheet yang terdaftar diganti hasil stream
     
-    # Cari indeks kolom Oktober (Bulan Lalu)
-    col_lalu_idx = next((c.column for c in ws_dash_m[CONFIG["DASHBOARD_HEADER_ROW"]] 
-                        if CONFIG["BULAN_LALU"].lower() in str(c.value).lower() and "kumulatif" in str(c.value).lower()), None)
+    cached_values {sheet: {coordinate: nilai}} (hasil FormulaEvaluator) disisipkan ke <v> cell rumus.
+    """
+    def __init__(self, archive, workbook, streamed_sheets, progress=None, cached_values=None):
+        self._archive = archive
+        self._workbook = workbook
+        self._streamed = streamed_sheets
+        self._progress = progress
+        self._cached = cached_values or {}
+
+    def write(self, filename, arcname=None, *args, **kwargs):
+        ws = next((ws for ws in self._workbook.worksheets
+                   if (ws.title in self._streamed or ws.title in self._cached) and ws.path[1:] == arcname), None)
+        if ws is None:
+            return self._archive.write(filename, arcname, *args, **kwargs)
+        with open(filename, 'r', encoding='utf-8') as f:
+            header_xml = f.read()
+        if ws.title in self._cached:
+            header_xml = inject_cached_values(header_xml, self._cached[ws.title])
+        if ws.title not in self._streamed:
+            return self._archive.writestr(arcname, header_xml)
+        stream = self._streamed[ws.title]
+        progress = None
+        if self._progress:
+            progress = lambda rows: self._progress(sheet=ws.title, rows=rows, total=len(stream.df))
+        with self._archive.open(arcname, 'w', force_zip64=True) as out:
+            stream.splice(header_xml, out, progress)
+
+    def __getattr__(self, name):
+        return getattr(self._archive, name)
+
+def save_workbook_streaming(wb, filename, streamed_sheets, progress=None, cached_values=None):
+    """Pengganti wb.save(): sama persis, kecuali sheet di streamed_sheets {title: StreamedSheetRows}
     
-    master_lalu_vals = {r: ws_dash_m.cell(r, col_lalu_idx).value or 0 
-                        for r in range(CONFIG["DASHBOARD_DATA_START"], ws_dash_m.max_row + 1)} if col_lalu_idx else {}
-    wb_master.close()
+    filename boleh file-like (BytesIO): isinya ditimpa, posisi dikembalikan ke awal setelah save.
+    progress: callback opsional progress(sheet=, rows=, total=) per chunk baris stream (lihat EtlJob.report)
+    cached_values: {sheet: {coordinate: nilai}} hasil FormulaEvaluator.evaluate_workbook()
+    """
+    from zipfile import ZipFile, ZIP_DEFLATED
+    from openpyxl.writer.excel import ExcelWriter
+
+    for title, stream in streamed_sheets.items():
+        ws = wb[title]
+        stream.bind(ws)
+        # Row di area stream harus kosong di openpyxl (termasuk row_dimensions → <row> kosong duplikat)
+        for row_idx in [r for r in ws.row_dimensions if r >= stream.start_row]:
+            del ws.row_dimensions[row_idx]
+        if ws.max_row >= stream.start_row and any(r >= stream.start_row for r, _ in sheet_cells(ws)):
+            raise ValueError(f"❌ Sheet '{title}' masih punya cell di row >= {stream.start_row}, tidak bisa di-stream")
+
+    if hasattr(filename, "write"):
+        filename.seek(0)
+        filename.truncate()
+    archive = ZipFile(filename, 'w', ZIP_DEFLATED, allowZip64=True)
+    wb.properties.modified = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+    ExcelWriter(wb, _StreamingArchive(archive, wb, streamed_sheets, progress, cached_values)).save()
+    if hasattr(filename, "write"):
+        filename.seek(0)
+
+# ==============================================================================
+# TEMPLATE XML READER (CACHED VALUE TANPA LOAD WORKBOOK)
+# ==============================================================================
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
 
-    # 2. PROSES FILE OUTPUT
-    shutil.copyfile(CONFIG["TEMPLATE_FILE"], CONFIG["OUTPUT_FILE"])
-    wb = load_workbook(CONFIG["OUTPUT_FILE"])
+class TemplateXmlReader:
+    """Baca cached value cell langsung dari XML sheet di package .xlsx (setara data_only=True)
     
-    # Update Tab Realisasi (Rename & Overwrite)
-    new_sheet = f"Realisasi {CONFIG['BULAN_INI']}"
-    old_sheet = f"Realisasi {CONFIG['BULAN_LALU']}"
-    if old_sheet in wb.sheetnames:
-        ws_real = wb[old_sheet]; ws_real.title = new_sheet
+    Hanya part sheet yang diminta (+ sharedStrings seperlunya) yang di-parse, jadi sheet besar
+    lain di template (Data Pelanggan, Data OPT) tidak ikut dibangun jadi object openpyxl.
+    
+    Usage:
+        with TemplateXmlReader(path) as tpl:
+            cells = tpl.read_cells("Dashboard", min_row=2)
+    """
+    def __init__(self, path):
+        from zipfile import ZipFile
+        self.path = path
+        self.zip = ZipFile(open_input(path))
+        self._sheet_paths = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.zip.close()
+
+    def _parse(self, part):
+        import xml.etree.ElementTree as ET
+        with self.zip.open(part) as f:
+            return ET.parse(f).getroot()
+
+    @property
+    def sheet_paths(self):
+        """Nama sheet → path part XML (dari workbook.xml + workbook.xml.rels)"""
+        if self._sheet_paths is None:
+            import posixpath
+            rels = {r.get("Id"): r.get("Target") for r in self._parse("xl/_rels/workbook.xml.rels").iter(f"{_NS_PKG_REL}Relationship")}
+            self._sheet_paths = {}
+            for sheet in self._parse("xl/workbook.xml").iter(f"{_NS_MAIN}sheet"):
+                target = rels.get(sheet.get(f"{_NS_REL}id"), "")
+                path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+                self._sheet_paths[sheet.get("name")] = path
+        return self._sheet_paths
+
+    @property
+    def sheet_names(self):
+        return list(self.sheet_paths)
+
+    def _shared_strings(self, needed):
+        """Ambil HANYA index sharedStrings yang dibutuhkan (stream, berhenti setelah index terbesar)"""
+        import xml.etree.ElementTree as ET
+        if not needed or "xl/sharedStrings.xml" not in self.zip.namelist():
+            return {}
+        result = {}
+        last_needed = max(needed)
+        idx = 0
+        with self.zip.open("xl/sharedStrings.xml") as f:
+            for event, el in ET.iterparse(f, events=("end",)):
+                if el.tag != f"{_NS_MAIN}si":
+                    continue
+                if idx in needed:
+                    # Teks = semua <t> langsung + <t> di rich-text run (<r>), phonetic (<rPh>) diabaikan
+                    parts = []
+                    for child in el:
+                        if child.tag == f"{_NS_MAIN}t":
+                            parts.append(child.text or "")
+                        elif child.tag == f"{_NS_MAIN}r":
+                            parts.extend(t.text or "" for t in child.iter(f"{_NS_MAIN}t"))
+                    result[idx] = "".join(parts)
+                el.clear()
+                idx += 1
+                if idx > last_needed:
+                    break
+        return result
+
+    @staticmethod
+    def _cast_number(value):
+        # Sama dengan openpyxl: ada '.', 'E' atau 'e' → float, selain itu int
+        if "." in value or "E" in value or "e" in value:
+            return float(value)
+        return int(value)
+
+    def read_cells(self, sheet_name, min_row=1, max_row=None, columns=None):
+        """Cached value cell sheet: dict {(row, col): value}
+        
+        Args:
+            sheet_name: nama sheet
+            min_row / max_row: batas row (1-based, inklusif)
+            columns: set index kolom (1-based) yang diambil, None = semua
+        """
+        import xml.etree.ElementTree as ET
+        from openpyxl.utils.cell import coordinate_to_tuple
+
+        if sheet_name not in self.sheet_paths:
+            raise ValueError(f"❌ Sheet '{sheet_name}' tidak ditemukan di {self.path}. Sheet tersedia: {self.sheet_names}")
+
+        raw = {}
+        row_idx = 0
+        with self.zip.open(self.sheet_paths[sheet_name]) as f:
+            for event, el in ET.iterparse(f, events=("start", "end")):
+                if el.tag == f"{_NS_MAIN}row":
+                    if event == "start":
+                        row_idx = int(el.get("r", row_idx + 1))
+                        col_idx = 0
+                    else:
+                        el.clear()
+                        if max_row is not None and row_idx >= max_row:
+                            break
+                    continue
+                if event != "end" or el.tag != f"{_NS_MAIN}c":
+                    continue
+                ref = el.get("r")
+                col_idx = coordinate_to_tuple(ref)[1] if ref else col_idx + 1
+                if row_idx < min_row or (columns is not None and col_idx not in columns):
+                    continue
+                cell_type = el.get("t", "n")
+                v = el.find(f"{_NS_MAIN}v")
+                if cell_type == "inlineStr":
+                    is_el = el.find(f"{_NS_MAIN}is")
+                    value = "".join(t.text or "" for t in is_el.iter(f"{_NS_MAIN}t")) if is_el is not None else None
+                elif v is None or v.text is None:
+                    value = None
+                elif cell_type == "s":
+                    value = ("sst", int(v.text))
+                elif cell_type == "b":
+                    value = bool(int(v.text))
+                elif cell_type == "n":
+                    value = self._cast_number(v.text)
+                else:  # str, e (error), d (ISO date)
+                    value = v.text
+                raw[(row_idx, col_idx)] = value
+
+        needed = {v[1] for v in raw.values() if isinstance(v, tuple)}
+        strings = self._shared_strings(needed)
+        return {k: (strings.get(v[1]) if isinstance(v, tuple) else v) for k, v in raw.items()}
+
+def read_master_lalu_vals(template_path, job=None):
+    """Saldo kumulatif bulan lalu per row Dashboard (cached value), tanpa load seluruh template
+    
+    Returns:
+        dict: {row: nilai} untuk row >= DASHBOARD_DATA_START (kosong kalau kolom tidak ketemu)
+    """
+    cfg = (job or default_job()).config
+    header_row = cfg["DASHBOARD_HEADER_ROW"]
+    with TemplateXmlReader(template_path) as tpl:
+        headers = SheetHeaderIndex.from_cells(tpl.read_cells("Dashboard", min_row=header_row, max_row=header_row))
+        # Cari indeks kolom Bulan Lalu (Kumulatif)
+        col_lalu_idx = next(iter(headers.columns_with(cfg["BULAN_LALU"].lower(), "kumulatif")), None)
+        if not col_lalu_idx:
+            return {}
+        cells = tpl.read_cells("Dashboard", min_row=cfg["DASHBOARD_DATA_START"], columns={col_lalu_idx})
+    return {r: val or 0 for (r, _), val in sorted(cells.items())}
+
+# ==============================================================================
+# FASE 3: LOAD (DINAMIS S-R LOGIC)
+# ==============================================================================
+def load_data(df_final, previous=None, job=None):
+    """Tulis Realisasi, Dashboard, Summary, Data Pelanggan & OPT ke OUTPUT_FILE
+    
+    Args:
+        previous: MonthState bulan sebelumnya (mode batch) → workbook & saldo Dashboard diambil
+                  dari memory, bukan dari TEMPLATE_FILE
+    
+    Returns:
+        MonthState bulan ini (template untuk bulan berikutnya di mode batch)
+    """
+    job = job or default_job()
+    cfg = job.config
+    print("💾 [3/3] LOAD: Update Dashboard dengan Logika Dinamis S-R...")
+    
+    if previous is not None:
+        # Mode batch: output bulan lalu masih di memory, saldo kumulatif sudah dihitung (tanpa recalc Excel)
+        master_lalu_vals = previous.kumulatif_vals
+        lalu_source = "batch"
+        wb = previous.reuse_workbook()
     else:
-        ws_real = wb.create_sheet(new_sheet)
+        # 1. PROSES FILE OUTPUT (template di-load SEKALI untuk diedit, disimpan ke OUTPUT_FILE)
+        with job.profiler.stage("template") as stage:
+            wb = load_template_workbook(cfg["TEMPLATE_FILE"], job.cache)
+
+            # 2. AMBIL SALDO OKTOBER (LALU) SEBAGAI ANGKA
+            # Sumber utama = cached value XML sheet Dashboard template yang di-upload. History Parquet (opt-in)
+            # hanya dipakai kalau template tidak punya cached value; kalau beda dengan template cukup diperingatkan
+            master_lalu_vals = read_master_lalu_vals(cfg["TEMPLATE_FILE"], job)
+            lalu_source = "template"
+            history_vals = history_lalu_vals(wb["Dashboard"], job)
+            if history_vals is not None:
+                if not any(master_lalu_vals.values()):
+                    master_lalu_vals, lalu_source = history_vals, "history (template tanpa cached value)"
+                else:
+                    beda = [r for r, v in history_vals.items() if abs(float(v or 0) - float(master_lalu_vals.get(r) or 0)) > 0.5]
+                    if beda:
+                        print(f"   ⚠️  Warning: Saldo {cfg['BULAN_LALU']} di history beda dengan template di {len(beda)} row "
+                              f"(contoh row {beda[:5]}), template yang dipakai")
+            print(f"   > Saldo {cfg['BULAN_LALU']} diambil dari {lalu_source}")
+            stage["rows_out"] = len(master_lalu_vals)
+    
+    with job.profiler.stage("realisasi", rows_in=len(df_final)) as stage:
+        # Update Tab Realisasi (Rename & Overwrite)
+        new_sheet = f"Realisasi {cfg['BULAN_INI']}"
+        old_sheet = f"Realisasi {cfg['BULAN_LALU']}"
+        if old_sheet in wb.sheetnames:
+            ws_real = wb[old_sheet]; ws_real.title = new_sheet
+        else:
+            ws_real = wb.create_sheet(new_sheet)
     
-    if ws_real.max_row > 1: ws_real.delete_rows(2, ws_real.max_row)
+        truncate_sheet_rows(ws_real, 2)
     
-    # === SORT df_final by 61 kode produk sebelum tulis ke Realisasi ===
-    print(f"   > Sorting Realisasi data by 61 kode produk...")
-    df_final_sorted = custom_sort_by_kode_produk(df_final.copy(), 'Kode Produk')
+        # === SORT df_final by 61 kode produk sebelum tulis ke Realisasi ===
+        print(f"   > Sorting Realisasi data by 61 kode produk...")
+        df_final_sorted = custom_sort_by_kode_produk(df_final.copy(), 'Kode Produk')
     
-    for c, name in enumerate(df_final_sorted.columns, 1): ws_real.cell(1, c).value = name
-    for r_idx, row in enumerate(dataframe_to_rows(df_final_sorted, index=False, header=False), 2):
-        for c_idx, val in enumerate(row, 1): ws_real.cell(r_idx, c_idx).value = val
+        # Header via openpyxl (style template tetap), baris data di-stream langsung ke XML saat save
+        for c, name in enumerate(df_final_sorted.columns, 1): ws_real.cell(1, c).value = name
+        streamed_sheets = {new_sheet: StreamedSheetRows(df_final_sorted, start_row=2)}
     
-    print(f"     ✅ Realisasi {CONFIG['BULAN_INI']} updated: {len(df_final_sorted)} rows (sorted by 61 kode)")
+        print(f"     ✅ Realisasi {cfg['BULAN_INI']} updated: {len(df_final_sorted)} rows (sorted by 61 kode, streaming write)")
+        stage["rows_out"] = len(df_final_sorted)
 
     # 3. UPDATE DASHBOARD (LOGIKA DINAMIS S-R)
     ws_dash = wb["Dashboard"]
-    target_month = CONFIG["BULAN_INI"].lower()
-    
-    # Mapping bulan ke index (untuk hitung pembagi prognosa)
-    BULAN_MAP = {"januari": 1, "februari": 2, "maret": 3, "april": 4, "mei": 5, "juni": 6,
-                 "juli": 7, "agustus": 8, "september": 9, "oktober": 10, "november": 11, "desember": 12}
-    bulan_index = BULAN_MAP.get(target_month, 1)
-    
-    # === HARDCODE KOLOM DASHBOARD (TEMPLATE-SPECIFIC BUSINESS LOGIC) ===
-    # NOTE: Kolom ini di-hardcode karena merupakan struktur template yang sudah FIX
-    # dan memiliki logika bisnis spesifik (S-R calculation, prognosa)
-    # Jika template berubah struktur, update konstanta di bawah:
-    COL_SA_JAN = 23    # W - SA Januari
-    COL_SA_DES = 34    # AH - SA Desember (Prognosa Bulanan)
-    COL_KUM_JAN = 10   # J - Kumulatif Januari
-    COL_KUM_DES = 21   # U - Kumulatif Desember (Prognosa Kumulatif)
-    COL_SISA = 22      # V - Sisa Perhitungan CO NR
-    
-    # === MAPPING KOLOM DATA PELANGGAN (untuk SUMIF Prognosa) ===
-    KOLOM_CARRY_OVER_START = 51   # AY = Januari Carry Over
-    KOLOM_NEW_REVENUE_START = 63  # BK = Januari New Revenue
-    
-    # Konversi ke letter
-    LET_SA_JAN = get_column_letter(COL_SA_JAN)    # W
-    LET_SA_DES = get_column_letter(COL_SA_DES)    # AH
-    LET_KUM_DES = get_column_letter(COL_KUM_DES)  # U
-    LET_SISA = get_column_letter(COL_SISA)        # V
-    
-    # Cari kolom bulan lalu untuk ambil nilai
-    col_lalu_idx = next((c.column for c in ws_dash[CONFIG["DASHBOARD_HEADER_ROW"]] 
-                        if CONFIG["BULAN_LALU"].lower() in str(c.value).lower() and "kumulatif" in str(c.value).lower()), None)
-    
-    # Cari semua kolom yang ada nama bulan ini (untuk update data)
-    cols_found = [c.column for c in ws_dash[CONFIG["DASHBOARD_HEADER_ROW"]] if target_month in str(c.value).lower()]
-    
-    if cols_found and col_lalu_idx:
-        col_kum = cols_found[0]  # Kumulatif (Misal Kolom S)
-        col_sa = cols_found[1] if len(cols_found) > 1 else col_kum + 1 # SA (Bulan Berjalan)
+    with job.profiler.stage("dashboard_formulas", rows_in=ws_dash.max_row - cfg["DASHBOARD_DATA_START"] + 1) as stage:
+        target_month = cfg["BULAN_INI"].lower()
+    
+        # Mapping bulan ke index (untuk hitung pembagi prognosa)
+        BULAN_MAP = {"januari": 1, "februari": 2, "maret": 3, "april": 4, "mei": 5, "juni": 6,
+                     "juli": 7, "agustus": 8, "september": 9, "oktober": 10, "november": 11, "desember": 12}
+        bulan_index = BULAN_MAP.get(target_month, 1)
+    
+        # === HARDCODE KOLOM DASHBOARD (TEMPLATE-SPECIFIC BUSINESS LOGIC) ===
+        # NOTE: Kolom ini di-hardcode karena merupakan struktur template yang sudah FIX
+        # dan memiliki logika bisnis spesifik (S-R calculation, prognosa)
+        # Jika template berubah struktur, update konstanta di bawah:
+        COL_SA_JAN = 23    # W - SA Januari
+        COL_SA_DES = 34    # AH - SA Desember (Prognosa Bulanan)
+        COL_KUM_JAN = 10   # J - Kumulatif Januari
+        COL_KUM_DES = 21   # U - Kumulatif Desember (Prognosa Kumulatif)
+        COL_SISA = 22      # V - Sisa Perhitungan CO NR
+    
+        # === MAPPING KOLOM DATA PELANGGAN (untuk SUMIF Prognosa) ===
+        KOLOM_CARRY_OVER_START = 51   # AY = Januari Carry Over
+        KOLOM_NEW_REVENUE_START = 63  # BK = Januari New Revenue
+    
+        # Konversi ke letter
+        LET_SA_JAN = get_column_letter(COL_SA_JAN)    # W
+        LET_SA_DES = get_column_letter(COL_SA_DES)    # AH
+        LET_KUM_DES = get_column_letter(COL_KUM_DES)  # U
+        LET_SISA = get_column_letter(COL_SISA)        # V
+    
+        # Header Dashboard di-index sekali: kolom bulan lalu (ambil nilai) + semua kolom bulan ini (update data)
+        dash_headers = SheetHeaderIndex.from_worksheet(ws_dash, rows=[cfg["DASHBOARD_HEADER_ROW"]])
+        col_lalu_idx = next(iter(dash_headers.columns_with(cfg["BULAN_LALU"].lower(), "kumulatif")), None)
+        cols_found = dash_headers.columns_with(target_month)
+    
+        if cols_found and col_lalu_idx:
+            col_kum = cols_found[0]  # Kumulatif (Misal Kolom S)
+            col_sa = cols_found[1] if len(cols_found) > 1 else col_kum + 1 # SA (Bulan Berjalan)
         
-        let_kum = get_column_letter(col_kum)
-        let_sa = get_column_letter(col_sa)
-        let_lalu = get_column_letter(col_lalu_idx)
+            let_kum = get_column_letter(col_kum)
+            let_sa = get_column_letter(col_sa)
+            let_lalu = get_column_letter(col_lalu_idx)
         
-        # HARDCODE GRAND TOTAL ROW = 64 (template stabil)
-        grand_total_row = 64
-        print(f"   > Grand Total row: {grand_total_row} (hardcoded)")
+            # HARDCODE GRAND TOTAL ROW = 64 (template stabil)
+            grand_total_row = 64
+            print(f"   > Grand Total row: {grand_total_row} (hardcoded)")
 
-        print(f"   > Logika Dinamis: SA {let_sa} = {let_kum} - {let_lalu}")
-        print(f"   > Prognosa: AH (Desember) = Rata-rata W (Jan) s/d {let_sa} / {bulan_index}")
-        print(f"   > Sisa Perhitungan V = {'AH' if bulan_index == 11 else f'SUM kolom prognosa sisa'}")
+            print(f"   > Logika Dinamis: SA {let_sa} = {let_kum} - {let_lalu}")
+            print(f"   > Prognosa: AH (Desember) = Rata-rata W (Jan) s/d {let_sa} / {bulan_index}")
+            print(f"   > Sisa Perhitungan V = {'AH' if bulan_index == 11 else f'SUM kolom prognosa sisa'}")
 
-        for r in range(CONFIG["DASHBOARD_DATA_START"], ws_dash.max_row + 1):
-            cell_A = ws_dash.cell(r, 1).value
-            if not cell_A: continue
+            for r in range(cfg["DASHBOARD_DATA_START"], ws_dash.max_row + 1):
+                cell_A = ws_dash.cell(r, 1).value
+                if not cell_A: continue
             
-            # DETEKSI: Apakah ini FIRST DATA ROW atau GRAND TOTAL ROW
-            is_first_row = (r == CONFIG["DASHBOARD_DATA_START"])
-            # Grand Total detection: check exact row number (sudah di-detect sebelumnya)
-            is_grand_total = (r == grand_total_row)
+                # DETEKSI: Apakah ini FIRST DATA ROW atau GRAND TOTAL ROW
+                is_first_row = (r == cfg["DASHBOARD_DATA_START"])
+                # Grand Total detection: check exact row number (sudah di-detect sebelumnya)
+                is_grand_total = (r == grand_total_row)
             
-            # FORCE CLEAR kolom yang akan di-update
-            ws_dash.cell(r, col_kum).value = None
-            ws_dash.cell(r, col_sa).value = None
+                # FORCE CLEAR kolom yang akan di-update
+                ws_dash.cell(r, col_kum).value = None
+                ws_dash.cell(r, col_sa).value = None
             
-            # Clear prognosa & sisa
-            if is_first_row:
-                # First row: Clear semua kolom prognosa (AH, U, V)
-                ws_dash.cell(r, COL_SA_DES).value = None   # AH - Prognosa Bulanan
-                ws_dash.cell(r, COL_KUM_DES).value = None  # U - Prognosa Kumulatif
-                ws_dash.cell(r, COL_SISA).value = None     # V - Sisa Perhitungan
-            else:
-                # Row lain: Clear kolom Sisa Perhitungan saja (prognosa biarkan template)
-                ws_dash.cell(r, COL_SISA).value = None
+                # Clear prognosa & sisa
+                if is_first_row:
+                    # First row: Clear semua kolom prognosa (AH, U, V)
+                    ws_dash.cell(r, COL_SA_DES).value = None   # AH - Prognosa Bulanan
+                    ws_dash.cell(r, COL_KUM_DES).value = None  # U - Prognosa Kumulatif
+                    ws_dash.cell(r, COL_SISA).value = None     # V - Sisa Perhitungan
+                else:
+                    # Row lain: Clear kolom Sisa Perhitungan saja (prognosa biarkan template)
+                    ws_dash.cell(r, COL_SISA).value = None
                 
-                # KHUSUS DESEMBER: Clear SEMUA kolom prognosa (tidak ada prognosa lagi)
-                if bulan_index == 12:
-                    # Clear prognosa bulan berikutnya (tidak ada karena sudah Des)
-                    # Loop dari bulan setelah bulan ini (Des+1 = tidak ada) s/d Des (12)
-                    for prog_month_idx in range(bulan_index + 1, 13):  # Tidak akan loop (13, 13)
-                        col_prog_sa = COL_SA_JAN + prog_month_idx - 1
-                        ws_dash.cell(r, col_prog_sa).value = None
+                    # KHUSUS DESEMBER: Clear SEMUA kolom prognosa (tidak ada prognosa lagi)
+                    if bulan_index == 12:
+                        # Clear prognosa bulan berikutnya (tidak ada karena sudah Des)
+                        # Loop dari bulan setelah bulan ini (Des+1 = tidak ada) s/d Des (12)
+                        for prog_month_idx in range(bulan_index + 1, 13):  # Tidak akan loop (13, 13)
+                            col_prog_sa = COL_SA_JAN + prog_month_idx - 1
+                            ws_dash.cell(r, col_prog_sa).value = None
             
-            # Tempel Nilai Bulan Lalu (Hard Value)
-            ws_dash.cell(r, col_lalu_idx).value = master_lalu_vals.get(r, 0)
+                # Tempel Nilai Bulan Lalu (Hard Value)
+                ws_dash.cell(r, col_lalu_idx).value = master_lalu_vals.get(r, 0)
             
-            # ========== CASE KHUSUS: JANUARI ==========
-            if bulan_index == 1:
-                # JANUARI: Tidak ada bulan lalu, semua prognosa = copy Januari
+                # ========== CASE KHUSUS: JANUARI ==========
+                if bulan_index == 1:
+                    # JANUARI: Tidak ada bulan lalu, semua prognosa = copy Januari
                 
-                if "total" in str(cell_A).lower():
-                    # Grand Total: SUM semua kolom
-                    ws_dash.cell(r, col_kum).value = f"=SUM({let_kum}{CONFIG['DASHBOARD_DATA_START']}:{let_kum}{r-1})"
-                    ws_dash.cell(r, col_sa).value = f"=SUM({let_sa}{CONFIG['DASHBOARD_DATA_START']}:{let_sa}{r-1})"
+                    if "total" in str(cell_A).lower():
+                        # Grand Total: SUM semua kolom
+                        ws_dash.cell(r, col_kum).value = f"=SUM({let_kum}{cfg['DASHBOARD_DATA_START']}:{let_kum}{r-1})"
+                        ws_dash.cell(r, col_sa).value = f"=SUM({let_sa}{cfg['DASHBOARD_DATA_START']}:{let_sa}{r-1})"
                     
-                    # Prognosa Feb-Des: SUM vertikal
-                    for m_idx in range(2, 13):  # Feb=2, Mar=3, ..., Des=12
-                        col_prog_sa = COL_SA_JAN + m_idx - 1
-                        col_prog_kum = COL_KUM_JAN + m_idx - 1
-                        let_prog_sa_temp = get_column_letter(col_prog_sa)
-                        let_prog_kum_temp = get_column_letter(col_prog_kum)
-                        ws_dash.cell(r, col_prog_sa).value = f"=SUM({let_prog_sa_temp}{CONFIG['DASHBOARD_DATA_START']}:{let_prog_sa_temp}{r-1})"
-                        ws_dash.cell(r, col_prog_kum).value = f"=SUM({let_prog_kum_temp}{CONFIG['DASHBOARD_DATA_START']}:{let_prog_kum_temp}{r-1})"
+                        # Prognosa Feb-Des: SUM vertikal
+                        for m_idx in range(2, 13):  # Feb=2, Mar=3, ..., Des=12
+                            col_prog_sa = COL_SA_JAN + m_idx - 1
+                            col_prog_kum = COL_KUM_JAN + m_idx - 1
+                            let_prog_sa_temp = get_column_letter(col_prog_sa)
+                            let_prog_kum_temp = get_column_letter(col_prog_kum)
+                            ws_dash.cell(r, col_prog_sa).value = f"=SUM({let_prog_sa_temp}{cfg['DASHBOARD_DATA_START']}:{let_prog_sa_temp}{r-1})"
+                            ws_dash.cell(r, col_prog_kum).value = f"=SUM({let_prog_kum_temp}{cfg['DASHBOARD_DATA_START']}:{let_prog_kum_temp}{r-1})"
                     
-                    ws_dash.cell(r, COL_SISA).value = f"=SUM({LET_SISA}{CONFIG['DASHBOARD_DATA_START']}:{LET_SISA}{r-1})"
+                        ws_dash.cell(r, COL_SISA).value = f"=SUM({LET_SISA}{cfg['DASHBOARD_DATA_START']}:{LET_SISA}{r-1})"
                 
-                else:
-                    # Data Row
-                    # 1. Kumulatif Januari = SUMIF
-                    formula_sumif = f"SUMIF('{new_sheet}'!$C:$C, A{r}, '{new_sheet}'!$E:$E)"
-                    ws_dash.cell(r, col_kum).value = f"={formula_sumif}"
+                    else:
+                        # Data Row
+                        # 1. Kumulatif Januari = SUMIF
+                        formula_sumif = f"SUMIF('{new_sheet}'!$C:$C, A{r}, '{new_sheet}'!$E:$E)"
+                        ws_dash.cell(r, col_kum).value = f"={formula_sumif}"
                     
-                    # 2. SA Januari = Kumulatif Januari (tidak ada bulan lalu)
-                    ws_dash.cell(r, col_sa).value = f"={let_kum}{r}"
+                        # 2. SA Januari = Kumulatif Januari (tidak ada bulan lalu)
+                        ws_dash.cell(r, col_sa).value = f"={let_kum}{r}"
                     
-                    if is_first_row:
-                        # === FIRST ROW: Prognosa = Copy nilai Januari ===
-                        # Loop Feb-Des (kolom AB s/d AH untuk SA, K s/d U untuk Kumulatif)
-                        for m_idx in range(2, 13):  # Feb=2, ..., Des=12
-                            col_prog_sa = COL_SA_JAN + m_idx - 1      # AB, AC, AD, ..., AH
-                            col_prog_kum = COL_KUM_JAN + m_idx - 1    # K, L, M, ..., U
+                        if is_first_row:
+                            # === FIRST ROW: Prognosa = Copy nilai Januari ===
+                            # Loop Feb-Des (kolom AB s/d AH untuk SA, K s/d U untuk Kumulatif)
+                            for m_idx in range(2, 13):  # Feb=2, ..., Des=12
+                                col_prog_sa = COL_SA_JAN + m_idx - 1      # AB, AC, AD, ..., AH
+                                col_prog_kum = COL_KUM_JAN + m_idx - 1    # K, L, M, ..., U
                             
-                            # SA Prognosa = Copy SA Januari
-                            ws_dash.cell(r, col_prog_sa).value = f"={LET_SA_JAN}{r}"
+                                # SA Prognosa = Copy SA Januari
+                                ws_dash.cell(r, col_prog_sa).value = f"={LET_SA_JAN}{r}"
                             
-                            # Kumulatif Prognosa = Kumulatif sebelumnya + SA Prognosa
-                            if m_idx == 2:  # Februari
-                                ws_dash.cell(r, col_prog_kum).value = f"={let_kum}{r}+{get_column_letter(col_prog_sa)}{r}"
-                            else:
-                                col_prev_kum = col_prog_kum - 1
-                                ws_dash.cell(r, col_prog_kum).value = f"={get_column_letter(col_prev_kum)}{r}+{get_column_letter(col_prog_sa)}{r}"
+                                # Kumulatif Prognosa = Kumulatif sebelumnya + SA Prognosa
+                                if m_idx == 2:  # Februari
+                                    ws_dash.cell(r, col_prog_kum).value = f"={let_kum}{r}+{get_column_letter(col_prog_sa)}{r}"
+                                else:
+                                    col_prev_kum = col_prog_kum - 1
+                                    ws_dash.cell(r, col_prog_kum).value = f"={get_column_letter(col_prev_kum)}{r}+{get_column_letter(col_prog_sa)}{r}"
                     
-                    # Sisa Perhitungan: SUM Feb-Des (11 bulan)
-                    col_feb_sa = COL_SA_JAN + 1  # AB = SA Februari
-                    let_feb_sa = get_column_letter(col_feb_sa)
-                    ws_dash.cell(r, COL_SISA).value = f"=SUM({let_feb_sa}{r}:{LET_SA_DES}{r})"
+                        # Sisa Perhitungan: SUM Feb-Des (11 bulan)
+                        col_feb_sa = COL_SA_JAN + 1  # AB = SA Februari
+                        let_feb_sa = get_column_letter(col_feb_sa)
+                        ws_dash.cell(r, COL_SISA).value = f"=SUM({let_feb_sa}{r}:{LET_SA_DES}{r})"
             
-            # ========== CASE NORMAL: FEB-DES ==========
-            elif is_grand_total:
-                # GRAND TOTAL ROW: SUM vertikal semua data row (BUKAN SUMIF!)
-                ws_dash.cell(r, col_kum).value = f"=SUM({let_kum}{CONFIG['DASHBOARD_DATA_START']}:{let_kum}{r-1})"
-                ws_dash.cell(r, col_sa).value = f"=SUM({let_sa}{CONFIG['DASHBOARD_DATA_START']}:{let_sa}{r-1})"
+                # ========== CASE NORMAL: FEB-DES ==========
+                elif is_grand_total:
+                    # GRAND TOTAL ROW: SUM vertikal semua data row (BUKAN SUMIF!)
+                    ws_dash.cell(r, col_kum).value = f"=SUM({let_kum}{cfg['DASHBOARD_DATA_START']}:{let_kum}{r-1})"
+                    ws_dash.cell(r, col_sa).value = f"=SUM({let_sa}{cfg['DASHBOARD_DATA_START']}:{let_sa}{r-1})"
                 
-                # Prognosa Grand Total (SUM vertikal) - HARDCODE
-                if bulan_index < 12:
-                    ws_dash.cell(r, COL_SA_DES).value = f"=SUM({LET_SA_DES}{CONFIG['DASHBOARD_DATA_START']}:{LET_SA_DES}{r-1})"
-                    ws_dash.cell(r, COL_KUM_DES).value = f"=SUM({LET_KUM_DES}{CONFIG['DASHBOARD_DATA_START']}:{LET_KUM_DES}{r-1})"
-                    ws_dash.cell(r, COL_SISA).value = f"=SUM({LET_SISA}{CONFIG['DASHBOARD_DATA_START']}:{LET_SISA}{r-1})"
-                elif bulan_index == 12:
-                    # Desember: Grand Total juga SUM vertikal
-                    ws_dash.cell(r, COL_SA_DES).value = f"=SUM({LET_SA_DES}{CONFIG['DASHBOARD_DATA_START']}:{LET_SA_DES}{r-1})"
-                    ws_dash.cell(r, COL_KUM_DES).value = f"=SUM({LET_KUM_DES}{CONFIG['DASHBOARD_DATA_START']}:{LET_KUM_DES}{r-1})"
-                    ws_dash.cell(r, COL_SISA).value = f"=SUM({LET_SISA}{CONFIG['DASHBOARD_DATA_START']}:{LET_SISA}{r-1})"
-            else:
-                # Formula Kumulatif: HANYA SUMIF (tidak pakai tambahan)
-                formula_sumif = f"SUMIF('{new_sheet}'!$C:$C, A{r}, '{new_sheet}'!$E:$E)"
-                ws_dash.cell(r, col_kum).value = f"={formula_sumif}"
+                    # Prognosa Grand Total (SUM vertikal) - HARDCODE
+                    if bulan_index < 12:
+                        ws_dash.cell(r, COL_SA_DES).value = f"=SUM({LET_SA_DES}{cfg['DASHBOARD_DATA_START']}:{LET_SA_DES}{r-1})"
+                        ws_dash.cell(r, COL_KUM_DES).value = f"=SUM({LET_KUM_DES}{cfg['DASHBOARD_DATA_START']}:{LET_KUM_DES}{r-1})"
+                        ws_dash.cell(r, COL_SISA).value = f"=SUM({LET_SISA}{cfg['DASHBOARD_DATA_START']}:{LET_SISA}{r-1})"
+                    elif bulan_index == 12:
+                        # Desember: Grand Total juga SUM vertikal
+                        ws_dash.cell(r, COL_SA_DES).value = f"=SUM({LET_SA_DES}{cfg['DASHBOARD_DATA_START']}:{LET_SA_DES}{r-1})"
+                        ws_dash.cell(r, COL_KUM_DES).value = f"=SUM({LET_KUM_DES}{cfg['DASHBOARD_DATA_START']}:{LET_KUM_DES}{r-1})"
+                        ws_dash.cell(r, COL_SISA).value = f"=SUM({LET_SISA}{cfg['DASHBOARD_DATA_START']}:{LET_SISA}{r-1})"
+                else:
+                    # Formula Kumulatif: HANYA SUMIF (tidak pakai tambahan)
+                    formula_sumif = f"SUMIF('{new_sheet}'!$C:$C, A{r}, '{new_sheet}'!$E:$E)"
+                    ws_dash.cell(r, col_kum).value = f"={formula_sumif}"
                 
-                # Formula SA Dinamis: Kumulatif Sekarang - Kumulatif Lalu
-                ws_dash.cell(r, col_sa).value = f"={let_kum}{r} - {let_lalu}{r}"
+                    # Formula SA Dinamis: Kumulatif Sekarang - Kumulatif Lalu
+                    ws_dash.cell(r, col_sa).value = f"={let_kum}{r} - {let_lalu}{r}"
                 
-                # PROGNOSA & SISA PERHITUNGAN
-                # KHUSUS: Kalau bulan upload = Desember, maka kolom U/AH (Prognosa Desember) jadi REALISASI (SUMIF)
-                # Kalau bulan upload < Desember, kolom U/AH tetap PROGNOSA (rata-rata atau SUMIF Data Pelanggan)
+                    # PROGNOSA & SISA PERHITUNGAN
+                    # KHUSUS: Kalau bulan upload = Desember, maka kolom U/AH (Prognosa Desember) jadi REALISASI (SUMIF)
+                    # Kalau bulan upload < Desember, kolom U/AH tetap PROGNOSA (rata-rata atau SUMIF Data Pelanggan)
                 
-                if bulan_index == 12:
-                    # DESEMBER: Kolom U/AH adalah REALISASI (bukan prognosa lagi)
-                    # SEMUA ROW: SUMIF dari Realisasi Desember
+                    if bulan_index == 12:
+                        # DESEMBER: Kolom U/AH adalah REALISASI (bukan prognosa lagi)
+                        # SEMUA ROW: SUMIF dari Realisasi Desember
                     
-                    # Kolom U (Kumulatif Desember) = SUMIF Realisasi Desember
-                    formula_sumif_des = f"SUMIF('{new_sheet}'!$C:$C, A{r}, '{new_sheet}'!$E:$E)"
-                    ws_dash.cell(r, COL_KUM_DES).value = f"={formula_sumif_des}"
+                        # Kolom U (Kumulatif Desember) = SUMIF Realisasi Desember
+                        formula_sumif_des = f"SUMIF('{new_sheet}'!$C:$C, A{r}, '{new_sheet}'!$E:$E)"
+                        ws_dash.cell(r, COL_KUM_DES).value = f"={formula_sumif_des}"
                     
-                    # Kolom AH (SA Desember) = Kumulatif Des - Kumulatif Nov
-                    ws_dash.cell(r, COL_SA_DES).value = f"={LET_KUM_DES}{r}-{let_lalu}{r}"
+                        # Kolom AH (SA Desember) = Kumulatif Des - Kumulatif Nov
+                        ws_dash.cell(r, COL_SA_DES).value = f"={LET_KUM_DES}{r}-{let_lalu}{r}"
                     
-                    # Sisa Perhitungan = 0 (tidak ada bulan tersisa)
-                    ws_dash.cell(r, COL_SISA).value = 0
-                elif bulan_index < 12:
-                    sisa_bulan = 12 - bulan_index
+                        # Sisa Perhitungan = 0 (tidak ada bulan tersisa)
+                        ws_dash.cell(r, COL_SISA).value = 0
+                    elif bulan_index < 12:
+                        sisa_bulan = 12 - bulan_index
                     
-                    if is_first_row:
-                        # === FIRST ROW: Rata-rata untuk prognosa (baseline) ===
-                        # 1. Prognosa BULANAN Desember (AH) = Rata-rata SA Jan s/d Bulan Ini
-                        ws_dash.cell(r, COL_SA_DES).value = f"=SUM({LET_SA_JAN}{r}:{let_sa}{r})/{bulan_index}"
+                        if is_first_row:
+                            # === FIRST ROW: Rata-rata untuk prognosa (baseline) ===
+                            # 1. Prognosa BULANAN Desember (AH) = Rata-rata SA Jan s/d Bulan Ini
+                            ws_dash.cell(r, COL_SA_DES).value = f"=SUM({LET_SA_JAN}{r}:{let_sa}{r})/{bulan_index}"
                         
-                        # 2. Prognosa KUMULATIF Desember (U) = Kumulatif Bulan Ini + Prognosa Bulanan
-                        ws_dash.cell(r, COL_KUM_DES).value = f"={let_kum}{r}+{LET_SA_DES}{r}"
+                            # 2. Prognosa KUMULATIF Desember (U) = Kumulatif Bulan Ini + Prognosa Bulanan
+                            ws_dash.cell(r, COL_KUM_DES).value = f"={let_kum}{r}+{LET_SA_DES}{r}"
                         
-                        # 3. Loop Prognosa bulan-bulan setelah bulan upload (Nov+1 s/d Des-1)
-                        # Upload Oktober → Loop Nov (bulan_index+1=11) s/d Nov (Des-1=11) → HANYA November
-                        # Upload September → Loop Okt (10) s/d Nov (11) → Oktober & November
-                        for prog_month_idx in range(bulan_index + 1, 12):  # 11 s/d 11 (November saja)
-                            # Kolom SA Prognosa bulan ini (misal AB=Feb, AC=Mar, ..., AG=Nov)
-                            col_prog_sa = COL_SA_JAN + prog_month_idx - 1
-                            # Kolom Kumulatif Prognosa bulan ini (misal K=Feb, L=Mar, ..., T=Nov)
-                            col_prog_kum = COL_KUM_JAN + prog_month_idx - 1
+                            # 3. Loop Prognosa bulan-bulan setelah bulan upload (Nov+1 s/d Des-1)
+                            # Upload Oktober → Loop Nov (bulan_index+1=11) s/d Nov (Des-1=11) → HANYA November
+                            # Upload September → Loop Okt (10) s/d Nov (11) → Oktober & November
+                            for prog_month_idx in range(bulan_index + 1, 12):  # 11 s/d 11 (November saja)
+                                # Kolom SA Prognosa bulan ini (misal AB=Feb, AC=Mar, ..., AG=Nov)
+                                col_prog_sa = COL_SA_JAN + prog_month_idx - 1
+                                # Kolom Kumulatif Prognosa bulan ini (misal K=Feb, L=Mar, ..., T=Nov)
+                                col_prog_kum = COL_KUM_JAN + prog_month_idx - 1
                             
-                            # SA Prognosa = Copy dari Prognosa Desember (AH) - rata-rata yang sama
-                            ws_dash.cell(r, col_prog_sa).value = f"={LET_SA_DES}{r}"
+                                # SA Prognosa = Copy dari Prognosa Desember (AH) - rata-rata yang sama
+                                ws_dash.cell(r, col_prog_sa).value = f"={LET_SA_DES}{r}"
                             
-                            # Kumulatif Prognosa = Kumulatif bulan sebelumnya + SA Prognosa bulan ini
-                            col_prev_kum = col_prog_kum - 1
-                            let_prev_kum = get_column_letter(col_prev_kum)
-                            let_prog_sa = get_column_letter(col_prog_sa)
-                            ws_dash.cell(r, col_prog_kum).value = f"={let_prev_kum}{r}+{let_prog_sa}{r}"
+                                # Kumulatif Prognosa = Kumulatif bulan sebelumnya + SA Prognosa bulan ini
+                                col_prev_kum = col_prog_kum - 1
+                                let_prev_kum = get_column_letter(col_prev_kum)
+                                let_prog_sa = get_column_letter(col_prog_sa)
+                                ws_dash.cell(r, col_prog_kum).value = f"={let_prev_kum}{r}+{let_prog_sa}{r}"
                     
-                    else:
-                        # === ROW 4-60: SUMIF dari Data Pelanggan ===
-                        # Loop untuk semua bulan prognosa (bulan_index+1 s/d 12)
-                        # Upload Oktober (bulan_index=10) → Loop Nov(11) & Des(12)
-                        for prog_month_idx in range(bulan_index + 1, 13):  # 11, 12 (November, Desember)
-                            # Hitung kolom Carry Over & New Revenue di Data Pelanggan
-                            col_co = KOLOM_CARRY_OVER_START + (prog_month_idx - 1)  # AY+10=BI (Nov), AY+11=BJ (Des)
-                            col_nr = KOLOM_NEW_REVENUE_START + (prog_month_idx - 1) # BK+10=BU (Nov), BK+11=BV (Des)
+                        else:
+                            # === ROW 4-60: SUMIF dari Data Pelanggan ===
+                            # Loop untuk semua bulan prognosa (bulan_index+1 s/d 12)
+                            # Upload Oktober (bulan_index=10) → Loop Nov(11) & Des(12)
+                            for prog_month_idx in range(bulan_index + 1, 13):  # 11, 12 (November, Desember)
+                                # Hitung kolom Carry Over & New Revenue di Data Pelanggan
+                                col_co = KOLOM_CARRY_OVER_START + (prog_month_idx - 1)  # AY+10=BI (Nov), AY+11=BJ (Des)
+                                col_nr = KOLOM_NEW_REVENUE_START + (prog_month_idx - 1) # BK+10=BU (Nov), BK+11=BV (Des)
                             
-                            let_co = get_column_letter(col_co)
-                            let_nr = get_column_letter(col_nr)
+                                let_co = get_column_letter(col_co)
+                                let_nr = get_column_letter(col_nr)
                             
-                            # Kolom SA Prognosa di Dashboard
-                            col_prog_sa = COL_SA_JAN + prog_month_idx - 1
-                            # Kolom Kumulatif Prognosa di Dashboard
-                            col_prog_kum = COL_KUM_JAN + prog_month_idx - 1
+                                # Kolom SA Prognosa di Dashboard
+                                col_prog_sa = COL_SA_JAN + prog_month_idx - 1
+                                # Kolom Kumulatif Prognosa di Dashboard
+                                col_prog_kum = COL_KUM_JAN + prog_month_idx - 1
                             
-                            # Formula SUMIF: Carry Over + New Revenue
-                            formula_prog = f"=SUMIF('Data Pelanggan'!$AO:$AO, Dashboard!A{r}, 'Data Pelanggan'!${let_co}:${let_co})" \
-                                          f"+SUMIF('Data Pelanggan'!$AO:$AO, Dashboard!A{r}, 'Data Pelanggan'!${let_nr}:${let_nr})"
+                                # Formula SUMIF: Carry Over + New Revenue
+                                formula_prog = f"=SUMIF('Data Pelanggan'!$AO:$AO, Dashboard!A{r}, 'Data Pelanggan'!${let_co}:${let_co})" \
+                                              f"+SUMIF('Data Pelanggan'!$AO:$AO, Dashboard!A{r}, 'Data Pelanggan'!${let_nr}:${let_nr})"
                             
-                            ws_dash.cell(r, col_prog_sa).value = formula_prog
+                                ws_dash.cell(r, col_prog_sa).value = formula_prog
                             
-                            # Kumulatif Prognosa = Kumulatif bulan sebelumnya + SA Prognosa bulan ini
-                            col_prev_kum = col_prog_kum - 1
-                            let_prev_kum = get_column_letter(col_prev_kum)
-                            let_prog_sa = get_column_letter(col_prog_sa)
-                            ws_dash.cell(r, col_prog_kum).value = f"={let_prev_kum}{r}+{let_prog_sa}{r}"
+                                # Kumulatif Prognosa = Kumulatif bulan sebelumnya + SA Prognosa bulan ini
+                                col_prev_kum = col_prog_kum - 1
+                                let_prev_kum = get_column_letter(col_prev_kum)
+                                let_prog_sa = get_column_letter(col_prog_sa)
+                                ws_dash.cell(r, col_prog_kum).value = f"={let_prev_kum}{r}+{let_prog_sa}{r}"
+
+                    
+                        # 3. Sisa Perhitungan (V) - SEMUA ROW
+                        if sisa_bulan == 1:
+                            # Sisa 1 bulan (Nov → Des aja)
+                            ws_dash.cell(r, COL_SISA).value = f"={LET_SA_DES}{r}"
+                        else:
+                            # Sisa > 1 bulan: SUM dari prognosa berikutnya s/d Desember
+                            # Hardcode: AH=Desember, mundur sesuai sisa_bulan
+                            start_col = COL_SA_DES - sisa_bulan + 1
+                            let_start = get_column_letter(start_col)
+                            ws_dash.cell(r, COL_SISA).value = f"=SUM({let_start}{r}:{LET_SA_DES}{r})"
+
+    # ========== UPDATE TAB SUMMARY (DINAMIS) ==========
+    col_kum_bulan_ini = COL_KUM_JAN + bulan_index - 1  # Kumulatif bulan ini untuk Summary
+    col_sa_bulan_ini = COL_SA_JAN + bulan_index - 1    # Stand Alone bulan ini untuk Summary
+    
+    # Grand Total row sudah di-set sebelumnya (hardcoded = 64)
+    
+    if "Summary" in wb.sheetnames:
+        ws_summary = wb["Summary"]
+        
+        # Kolom Kumulatif & Stand Alone bulan ini
+        let_kum_summary = get_column_letter(col_kum_bulan_ini)
+        let_sa_summary = get_column_letter(col_sa_bulan_ini)
+        
+        # Update header C2 saja (B2 biarkan dari template - "Target Desember" tanpa rumus)
+        ws_summary.cell(2, 3).value = f"Realisasi {cfg['BULAN_INI']}"
+        
+        # Update data row 3 (bukan row 9 yang itu label)
+        # B3: Target Desember - BIARKAN dari template (tidak ada rumus, angka statis)
+        # C3: Realisasi bulan ini → Dashboard kolom KUMULATIF bulan ini Grand Total
+        ws_summary.cell(3, 3).value = f"=Dashboard!{let_kum_summary}{grand_total_row}"
+        print(f"   > Summary C3 (Realisasi {cfg['BULAN_INI']}): =Dashboard!{let_kum_summary}{grand_total_row}")
+    
+    # ========== UPDATE SHEET DATA PELANGGAN & OPT ==========
+    for sheet_name, update_sheet in (("Data Pelanggan", update_sheet_pelanggan), ("Data OPT", update_sheet_opt)):
+        with job.profiler.stage(f"update_sheet {sheet_name}") as stage:
+            stream = update_sheet(wb, bulan_index, job)
+            stage["rows_out"] = len(stream.df) if stream is not None else 0
+        if stream is not None:
+            streamed_sheets[sheet_name] = stream
+    
+    # ========== UPDATE RUMUS SUMIF DINAMIS DI DASHBOARD ==========
+    with job.profiler.stage("update_dashboard_sumif_formulas"):
+        update_dashboard_sumif_formulas(wb, sheet_data_rows(wb, streamed_sheets))
+    
+    # ========== MODE VALUES: SUMIF → ANGKA (GROUPBY PANDAS) ==========
+    if cfg.get("OUTPUT_MODE", "formula") == "values":
+        with job.profiler.stage("dashboard_values") as stage:
+            stage["rows_out"] = apply_values_mode(wb, streamed_sheets, audit=cfg.get("AUDIT_SHEET", True))
+    
+    # ========== CACHED VALUE RUMUS (TERBACA data_only=True TANPA BUKA EXCEL) ==========
+    cached_values = {}
+    if cfg.get("CACHED_VALUES", True):
+        with job.profiler.stage("formula_values") as stage:
+            cached_values = FormulaEvaluator(wb, streamed_sheets).evaluate_workbook()
+            stage["rows_out"] = sum(len(values) for values in cached_values.values())
+    
+    job.report(stage="save")
+    with job.profiler.stage("save") as stage:
+        save_workbook_streaming(wb, job.output_target, streamed_sheets, progress=job.report, cached_values=cached_values)
+        stage["rows_out"] = sum(stream.rows_written for stream in streamed_sheets.values())
+    print(f"✅ BERHASIL! Dashboard + Summary + Data Pelanggan + OPT dinamis untuk {cfg['BULAN_INI'].upper()}!")
+    
+    kumulatif_vals = compute_kumulatif_vals(ws_dash, cols_found[0], df_final_sorted, job) if cols_found else {}
+    
+    # ========== HISTORY BULANAN (SALDO BULAN DEPAN & QUERY YTD TANPA XLSX) ==========
+    if cfg.get("HISTORY_DIR"):
+        with job.profiler.stage("history") as stage:
+            save_month_history(ws_dash, df_final_sorted, kumulatif_vals, master_lalu_vals, lalu_source, job)
+            stage["rows_out"] = len(kumulatif_vals)
+    return MonthState(cfg["BULAN_INI"], wb, kumulatif_vals, streamed_sheets)
+
+# ==============================================================================
+# BULK WRITER DATA PELANGGAN / OPT
+# ==============================================================================
+# String yang dianggap kosong (tanggal invalid dari export sistem) → cell dibiarkan kosong, cegah #VALUE!
+INVALID_CELL_STRINGS = ['--/--/--', '--', '---', 'nan', 'NaT', 'None']
+
+def compile_row_formula(formula, template_row=4):
+    """Formula row template → format string dengan placeholder {row}
+    
+    Contoh: '=SUM(AY4:BJ4)+$A$4' → '=SUM(AY{row}:BJ{row})+$A$4'. Dikompilasi SEKALI per kolom,
+    per baris cukup .format(row=...) (sebelumnya re.sub per cell). Referensi absolut ($A$4) tetap.
+    """
+    escaped = formula.replace('{', '{{').replace('}', '}}')
+    return re.sub(r'([A-Z]+)' + str(template_row) + r'\b', r'\g<1>{row}', escaped)
+
+def prepare_bulk_rows(ws, df_raw, raw_to_template, start_row=4):
+    """Siapkan penulisan massal df_raw ke sheet mulai start_row (dipakai Data Pelanggan & OPT)
+    
+    1. Formula row template (start_row) dikompilasi sekali per kolom, hanya untuk kolom yang tidak diisi raw
+    2. Nilai invalid (NaN, INVALID_CELL_STRINGS) dibersihkan per kolom secara vectorized
+    3. Data lama dibuang (truncate_sheet_rows); baris baru ditulis sebagai XML saat save (lihat save_workbook_streaming)
+    
+    Returns:
+        StreamedSheetRows untuk didaftarkan ke streamed_sheets
+    """
+    template_formulas = {}
+    for col in range(1, ws.max_column + 1):
+        val = ws.cell(start_row, col).value
+        if val and isinstance(val, str) and val.startswith('='):
+            template_formulas[col] = compile_row_formula(val, start_row)
+    
+    # Data raw prioritas tertinggi: kolom yang ter-mapping tidak diisi formula template
+    mapped_cols = set(raw_to_template.values())
+    formulas = {col: f for col, f in template_formulas.items() if col not in mapped_cols}
+    
+    # Bersihkan nilai per kolom; beberapa kolom raw ke kolom template yang sama → nilai valid terakhir menang
+    values = {}
+    for raw_col, template_col_idx in raw_to_template.items():
+        s = df_raw[raw_col].reset_index(drop=True)
+        valid = s.notna()
+        if pd.api.types.is_string_dtype(s.dtype):  # kolom angka/tanggal tidak mungkin berisi string invalid
+            valid &= ~as_str_series(s).str.strip().isin(INVALID_CELL_STRINGS)
+        s = s.astype(object).where(valid, None)
+        if template_col_idx in values:
+            s = s.where(valid, values[template_col_idx])
+        values[template_col_idx] = s
+    
+    truncate_sheet_rows(ws, start_row)
+    
+    columns = sorted(values)
+    df_out = pd.DataFrame({i: values[col] for i, col in enumerate(columns)}, index=pd.RangeIndex(len(df_raw)))
+    return StreamedSheetRows(df_out, start_row=start_row, columns=columns, formulas=formulas)
 
-                    
-                    # 3. Sisa Perhitungan (V) - SEMUA ROW
-                    if sisa_bulan == 1:
-                        # Sisa 1 bulan (Nov → Des aja)
-                        ws_dash.cell(r, COL_SISA).value = f"={LET_SA_DES}{r}"
-                    else:
-                        # Sisa > 1 bulan: SUM dari prognosa berikutnya s/d Desember
-                        # Hardcode: AH=Desember, mundur sesuai sisa_bulan
-                        start_col = COL_SA_DES - sisa_bulan + 1
-                        let_start = get_column_letter(start_col)
-                        ws_dash.cell(r, COL_SISA).value = f"=SUM({let_start}{r}:{LET_SA_DES}{r})"
+def read_raw_export(path, cache=None, engine=None):
+    """Sheet pertama file export sistem (Data Pelanggan / OPT), header di row 1"""
+    with CachedWorkbook(path, cache, engine) as book:
+        return book.read_frame(book.sheet_names[0], header=0)
 
-    # ========== UPDATE TAB SUMMARY (DINAMIS) ==========
-    col_kum_bulan_ini = COL_KUM_JAN + bulan_index - 1  # Kumulatif bulan ini untuk Summary
-    col_sa_bulan_ini = COL_SA_JAN + bulan_index - 1    # Stand Alone bulan ini untuk Summary
+# ==============================================================================
+# SCHEMA MAPPING REGISTRY (KOLOM RAW EXPORT → KOLOM TEMPLATE)
+# ==============================================================================
+class SchemaMappingRegistry:
+    """Mapping kolom raw export → kolom template, disimpan per fingerprint header (file JSON)
     
-    # Grand Total row sudah di-set sebelumnya (hardcoded = 64)
+    Schema export sistem & template jarang berubah: mapping dihitung sekali per kombinasi
+    fingerprint header raw + fingerprint header template (row 3 + SPECIAL_COLUMN_MAPPINGS),
+    run berikutnya cukup lookup. Entry diurutkan menurut run terakhir yang memakainya; schema yang
+    beda dari run sebelumnya (baru maupun kembali ke schema lama) dilaporkan sebagai drift
+    (kolom baru / hilang / rename / header template berubah). Baca-ubah-tulis file dilakukan di
+    bawah file_lock, jadi job paralel (JobQueue / run_jobs) tidak saling menimpa entry.
     
-    if "Summary" in wb.sheetnames:
-        ws_summary = wb["Summary"]
-        
-        # Kolom Kumulatif & Stand Alone bulan ini
-        let_kum_summary = get_column_letter(col_kum_bulan_ini)
-        let_sa_summary = get_column_letter(col_sa_bulan_ini)
+    Usage:
+        registry = SchemaMappingRegistry(".etl_schema_mappings.json")
+        raw_to_template, drift = registry.resolve("Data OPT", df_raw.columns, header_index, special)
+    """
+    MAX_ENTRIES = 20  # per sheet, entry paling lama dibuang
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Warning: Registry mapping rusak, dibuat ulang ({self.path}): {e}")
+            return {}
+
+    def save(self):
+        if not self.path:
+            return
+        def writer(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=1)
+        write_atomic(self.path, writer)
+
+    @staticmethod
+    def fingerprint(*parts):
+        payload = json.dumps(parts, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def compute(raw_columns, header_index, special, row=3):
+        """Mapping {kolom raw: kolom template}: clean_header sama, lalu override SPECIAL_COLUMN_MAPPINGS"""
+        raw_to_template = {}
+        for raw_col in raw_columns:
+            template_col_idx = header_index.find(raw_col, row=row)
+            if template_col_idx is not None:
+                raw_to_template[raw_col] = template_col_idx
+        for raw_col, template_name in special.items():
+            if raw_col in raw_columns:
+                template_col_idx = header_index.find(template_name, row=row)
+                if template_col_idx is not None:
+                    raw_to_template[raw_col] = template_col_idx
+        return raw_to_template
+
+    @staticmethod
+    def drift(previous, raw_columns, template_headers, raw_to_template, special):
+        """Beda schema dibanding entry registry sebelumnya (list kosong = tidak berubah)"""
+        old_raw, new_raw = previous["raw"], [str(c) for c in raw_columns]
+        added = [c for c in new_raw if c not in old_raw]
+        missing = [c for c in old_raw if c not in new_raw]
+        # Rename: kolom hilang yang mirip (clean_header, ratio >= 0.8) dengan kolom baru
+        renamed = []
+        for old in list(missing):
+            candidates = {clean_header(c): c for c in added}
+            match = difflib.get_close_matches(clean_header(old), list(candidates), n=1, cutoff=0.8)
+            if match:
+                renamed.append((old, candidates[match[0]]))
+                missing.remove(old)
+                added.remove(candidates[match[0]])
+        old_tpl = {text: col for col, text in previous["template"]}
+        new_tpl = {text: col for col, text in template_headers}
+        old_cols = {col for _, col in previous["mapping"]}
+        return {
+            "raw_added": added,
+            "raw_missing": missing,
+            "raw_renamed": renamed,
+            "template_added": [t for t in new_tpl if t not in old_tpl],
+            "template_removed": [t for t in old_tpl if t not in new_tpl],
+            "template_moved": [(t, old_tpl[t], col) for t, col in new_tpl.items() if t in old_tpl and old_tpl[t] != col],
+            "raw_unmapped": [c for c in added + [new for _, new in renamed] if c not in map(str, raw_to_template)],
+            "template_lost": [text for col, text in template_headers if col in old_cols - set(raw_to_template.values())],
+            "special_changed": previous.get("special") != {str(k): v for k, v in special.items()},
+        }
+
+    def resolve(self, sheet, raw_columns, header_index, special=None, row=3):
+        """Mapping dari registry (hit) atau hitung + simpan (miss); entry yang dipakai jadi paling baru
         
-        # Update header C2 saja (B2 biarkan dari template - "Target Desember" tanpa rumus)
-        ws_summary.cell(2, 3).value = f"Realisasi {CONFIG['BULAN_INI']}"
+        Returns:
+            tuple: (raw_to_template, drift) — drift None kalau schema sama dengan run sebelumnya
+                   atau belum ada entry sebelumnya
+        """
+        if not self.path:
+            return self._resolve(sheet, list(raw_columns), header_index, special or {}, row)
+        with file_lock(self.path):
+            self.data = self._load()  # baca ulang di dalam lock: entry job lain tidak hilang
+            return self._resolve(sheet, list(raw_columns), header_index, special or {}, row)
+
+    def _resolve(self, sheet, raw_columns, header_index, special, row):
+        template_headers = header_index.row(row)
+        key = f"{self.fingerprint(raw_columns)}-{self.fingerprint(template_headers, sorted(special.items()))}"
+        entries = self.data.setdefault(sheet, {})
+        previous_key = next(reversed(entries)) if entries else None
+        if previous_key == key:
+            return {raw_columns[pos]: col for pos, col in entries[key]["mapping"]}, None
         
-        # Update data row 3 (bukan row 9 yang itu label)
-        # B3: Target Desember - BIARKAN dari template (tidak ada rumus, angka statis)
-        # C3: Realisasi bulan ini → Dashboard kolom KUMULATIF bulan ini Grand Total
-        ws_summary.cell(3, 3).value = f"=Dashboard!{let_kum_summary}{grand_total_row}"
-        print(f"   > Summary C3 (Realisasi {CONFIG['BULAN_INI']}): =Dashboard!{let_kum_summary}{grand_total_row}")
-    
-    # ========== UPDATE SHEET DATA PELANGGAN & OPT ==========
-    update_sheet_pelanggan(wb, bulan_index)
-    update_sheet_opt(wb, bulan_index)
-    
-    # ========== UPDATE RUMUS SUMIF DINAMIS DI DASHBOARD ==========
-    update_dashboard_sumif_formulas(wb)
-    
-    wb.save(CONFIG["OUTPUT_FILE"])
-    print(f"✅ BERHASIL! Dashboard + Summary + Data Pelanggan + OPT dinamis untuk {CONFIG['BULAN_INI'].upper()}!")
+        if key in entries:
+            # Kembali ke schema lama: mapping dipakai ulang, drift tetap dibanding run sebelumnya
+            entry = entries.pop(key)
+            raw_to_template = {raw_columns[pos]: col for pos, col in entry["mapping"]}
+        else:
+            raw_to_template = self.compute(raw_columns, header_index, special, row)
+            # Posisi kolom raw (bukan nama) supaya label non-string tetap utuh; urutan dict dijaga
+            position = {c: i for i, c in enumerate(raw_columns)}
+            entry = {
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "raw": [str(c) for c in raw_columns],
+                "template": template_headers,
+                "special": {str(k): v for k, v in special.items()},
+                "mapping": [[position[c], col] for c, col in raw_to_template.items()],
+            }
+        previous = entries.get(previous_key)
+        drift = self.drift(previous, raw_columns, template_headers, raw_to_template, special) if previous else None
+        entry["last_used"] = datetime.datetime.now().isoformat(timespec="seconds")
+        entries[key] = entry  # urutan dict = urutan pemakaian, terakhir = run sebelumnya untuk drift
+        while len(entries) > self.MAX_ENTRIES:
+            del entries[next(iter(entries))]
+        self.save()
+        return raw_to_template, drift
+
+def report_schema_drift(sheet, drift):
+    """Print laporan drift schema (hasil SchemaMappingRegistry.resolve)"""
+    labels = [("raw_added", "Kolom raw baru"), ("raw_missing", "Kolom raw hilang"), ("raw_renamed", "Kolom raw rename"),
+              ("template_added", "Header template baru"), ("template_removed", "Header template hilang"),
+              ("template_moved", "Header template pindah kolom"), ("raw_unmapped", "Kolom raw baru TIDAK ter-mapping"),
+              ("template_lost", "Kolom template kehilangan data")]
+    lines = [(label, drift[key]) for key, label in labels if drift[key]]
+    if drift["special_changed"]:
+        lines.append(("SPECIAL_COLUMN_MAPPINGS", "berubah"))
+    print(f"     ⚠️  Schema '{sheet}' berubah dibanding mapping terakhir di registry:")
+    for label, items in lines:
+        if isinstance(items, list):
+            items = ", ".join(" → ".join(map(str, i)) if isinstance(i, tuple) else str(i) for i in items)
+        print(f"        - {label}: {items}")
+
+def map_raw_to_template(sheet, df_raw, header_index, job):
+    """Mapping kolom raw → kolom template sheet (registry per fingerprint, drift dilaporkan)"""
+    cfg = job.config
+    special = cfg.get("SPECIAL_COLUMN_MAPPINGS", {}).get(sheet, {})
+    registry = SchemaMappingRegistry(cfg.get("SCHEMA_REGISTRY"))
+    raw_to_template, drift = registry.resolve(sheet, df_raw.columns, header_index, special)
+    if drift:
+        report_schema_drift(sheet, drift)
+    return raw_to_template
 
 # ==============================================================================
 # UPDATE SHEET DATA PELANGGAN
 # ==============================================================================
-def update_sheet_pelanggan(wb, bulan_index):
-    """Update sheet Data Pelanggan dengan mapping kolom anti-typo dan formula dinamis"""
+def update_sheet_pelanggan(wb, bulan_index, job=None):
+    """Update sheet Data Pelanggan dengan mapping kolom anti-typo dan formula dinamis
+    
+    Returns:
+        StreamedSheetRows baris data (ditulis saat save_workbook_streaming), None kalau sheet/file tidak ada
+    """
+    job = job or default_job()
+    cfg = job.config
     print(f"   > Updating sheet 'Data Pelanggan'...")
     
     if "Data Pelanggan" not in wb.sheetnames:
@@ -774,40 +2870,22 @@ def update_sheet_pelanggan(wb, bulan_index):
     
     ws = wb["Data Pelanggan"]
     
-    # Baca header template dari Row 3
-    template_headers = []
-    for col in range(1, 100):  # Scan sampai kolom 100
-        val = ws.cell(3, col).value
-        if val:
-            template_headers.append((col, str(val).strip()))
+    # Index header template SEKALI: row 1-5 (label Bulan Berjalan) + row 3 (header kolom), sampai kolom 100
+    header_index = SheetHeaderIndex.from_worksheet(ws, rows=range(1, 6), max_col=99)
     
     # Baca data baru dari file raw
     try:
-        df_raw = pd.read_excel(CONFIG["FILE_PELANGGAN"], header=0)
+        df_raw = read_raw_export(cfg["FILE_PELANGGAN"], job.cache, cfg.get("EXCEL_ENGINE"))
     except FileNotFoundError:
-        print(f"     ⚠️ File tidak ditemukan: {CONFIG['FILE_PELANGGAN']}")
+        print(f"     ⚠️ File tidak ditemukan: {cfg['FILE_PELANGGAN']}")
         return
     except Exception as e:
         print(f"     ❌ Error membaca file Pelanggan: {e}")
         return
+    job.profiler.annotate(rows_in=len(df_raw))
     
-    # Mapping kolom raw ke template (anti-typo)
-    raw_to_template = {}
-    for raw_col in df_raw.columns:
-        raw_clean = clean_header(raw_col)
-        for template_col_idx, template_col_name in template_headers:
-            template_clean = clean_header(template_col_name)
-            if raw_clean == template_clean:
-                raw_to_template[raw_col] = template_col_idx
-                break
-    
-    # === SPECIAL MAPPINGS (kolom yang beda nama antara template vs raw) ===
-    # Nama Pelanggan (template) ← namaPerusahaan (raw)
-    if 'namaPerusahaan' in df_raw.columns:
-        for idx, (col_idx, col_name) in enumerate(template_headers):
-            if clean_header(col_name) == clean_header('Nama Pelanggan'):
-                raw_to_template['namaPerusahaan'] = col_idx
-                break
+    # Mapping kolom raw ke template (anti-typo + SPECIAL_COLUMN_MAPPINGS), dari registry kalau schema sama
+    raw_to_template = map_raw_to_template("Data Pelanggan", df_raw, header_index, job)
     
     # DEBUG: Print mapping untuk cek
     print(f"     DEBUG: {len(raw_to_template)} kolom ter-mapping dari {len(df_raw.columns)} kolom raw")
@@ -825,21 +2903,11 @@ def update_sheet_pelanggan(wb, bulan_index):
     else:
         print(f"     ⚠️  Warning: Kolom 'kodeMasterProduk' tidak ditemukan, skip sorting")
     
-    # === UPDATE BULAN BERJALAN (DINAMIS: scan row 1-5) ===
+    # === UPDATE BULAN BERJALAN (DINAMIS: label di row 1-5, dari header_index) ===
     # Cari label "Bulan Berjalan" di row manapun (1-5), tulis nilai di kolom sebelahnya di row yang sama
-    col_label = None
-    row_label = None
-    for row_idx in range(1, 6):  # Scan row 1-5
-        for col_idx in range(1, 100):
-            cell_val = ws.cell(row_idx, col_idx).value
-            if cell_val and "bulan berjalan" in str(cell_val).lower():
-                col_label = col_idx
-                row_label = row_idx
-                break
-        if col_label:
-            break
-    
-    if col_label and row_label:
+    found = header_index.find_text("bulan berjalan")
+    if found:
+        row_label, col_label = found
         # Tulis nilai di kolom sebelah kanan (col_label + 1) di row yang sama
         col_value = col_label + 1
         ws.cell(row_label, col_value).value = bulan_index
@@ -849,43 +2917,8 @@ def update_sheet_pelanggan(wb, bulan_index):
         print("     ⚠️  Warning: Kolom 'Bulan Berjalan' tidak ditemukan, gunakan fallback row 2, col 48")
         ws.cell(2, 48).value = bulan_index
     
-    # === COPY TEMPLATE ROW 4 FORMULAS ===
-    # Simpan formula dari row 4 template untuk di-copy ke row baru
-    import re
-    template_formulas = {}
-    for col in range(1, ws.max_column + 1):
-        cell = ws.cell(4, col)
-        if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-            template_formulas[col] = cell.value
-    
-    # === HAPUS DATA LAMA (dari row 4 ke bawah) ===
-    if ws.max_row > 3:
-        ws.delete_rows(4, ws.max_row - 3)
-    
-    # === TULIS DATA BARU (dari row 4) ===
-    for row_idx, row_data in df_raw.iterrows():
-        excel_row = row_idx + 4  # Start dari row 4
-        
-        # 1. TULIS DATA RAW DULU (prioritas tertinggi)
-        for raw_col, template_col_idx in raw_to_template.items():
-            val = row_data[raw_col]
-            if pd.notna(val):
-                # Clean invalid date strings (--/--/--, --, dll) untuk mencegah #VALUE!
-                str_val = str(val).strip()
-                if str_val in ['--/--/--', '--', '---', 'nan', 'NaT', 'None']:
-                    # Skip: biarkan cell kosong
-                    continue
-                ws.cell(excel_row, template_col_idx).value = val
-        
-        # 2. Copy formulas dari template HANYA untuk kolom yang TIDAK ada di raw data
-        for col_idx, formula_template in template_formulas.items():
-            # Skip kalau kolom ini sudah ada data raw
-            if col_idx in raw_to_template.values():
-                continue
-            
-            # Replace cell references: A4->A5, Z4->Z5, AQ4->AQ5, dll
-            formula_new = re.sub(r'([A-Z]+)4\b', r'\g<1>' + str(excel_row), formula_template)
-            ws.cell(excel_row, col_idx).value = formula_new
+    # === TULIS DATA BARU (dari row 4): formula template row 4 + data raw, stream saat save ===
+    stream = prepare_bulk_rows(ws, df_raw, raw_to_template, start_row=4)
     
     # === UPDATE SUBTOTAL FORMULAS IN ROW 1 (DYNAMIC: cari kolom dengan formula SUBTOTAL) ===
     last_data_row = len(df_raw) + 3  # Row terakhir data
@@ -897,12 +2930,19 @@ def update_sheet_pelanggan(wb, bulan_index):
             ws.cell(1, col_idx).value = f"=SUBTOTAL(9,{col_letter}4:{col_letter}{last_data_row})"
     
     print(f"     ✅ Data Pelanggan updated: {len(df_raw)} baris")
+    return stream
 
 # ==============================================================================
 # UPDATE SHEET DATA OPT
 # ==============================================================================
-def update_sheet_opt(wb, bulan_index):
-    """Update sheet Data OPT dengan mapping kolom anti-typo dan formula dinamis"""
+def update_sheet_opt(wb, bulan_index, job=None):
+    """Update sheet Data OPT dengan mapping kolom anti-typo dan formula dinamis
+    
+    Returns:
+        StreamedSheetRows baris data (ditulis saat save_workbook_streaming), None kalau sheet/file tidak ada
+    """
+    job = job or default_job()
+    cfg = job.config
     print(f"   > Updating sheet 'Data OPT'...")
     
     if "Data OPT" not in wb.sheetnames:
@@ -911,40 +2951,22 @@ def update_sheet_opt(wb, bulan_index):
     
     ws = wb["Data OPT"]
     
-    # Baca header template dari Row 3
-    template_headers = []
-    for col in range(1, 150):  # Scan sampai kolom 150
-        val = ws.cell(3, col).value
-        if val:
-            template_headers.append((col, str(val).strip()))
+    # Index header template SEKALI: row 1-5 (label Bulan Berjalan) + row 3 (header kolom), sampai kolom 150
+    header_index = SheetHeaderIndex.from_worksheet(ws, rows=range(1, 6), max_col=149)
     
     # Baca data baru dari file raw
     try:
-        df_raw = pd.read_excel(CONFIG["FILE_OPT"], header=0)
+        df_raw = read_raw_export(cfg["FILE_OPT"], job.cache, cfg.get("EXCEL_ENGINE"))
     except FileNotFoundError:
-        print(f"     ⚠️ File tidak ditemukan: {CONFIG['FILE_OPT']}")
+        print(f"     ⚠️ File tidak ditemukan: {cfg['FILE_OPT']}")
         return
     except Exception as e:
         print(f"     ❌ Error membaca file OPT: {e}")
         return
+    job.profiler.annotate(rows_in=len(df_raw))
     
-    # Mapping kolom raw ke template (anti-typo)
-    raw_to_template = {}
-    for raw_col in df_raw.columns:
-        raw_clean = clean_header(raw_col)
-        for template_col_idx, template_col_name in template_headers:
-            template_clean = clean_header(template_col_name)
-            if raw_clean == template_clean:
-                raw_to_template[raw_col] = template_col_idx
-                break
-    
-    # === SPECIAL MAPPINGS (kolom yang beda nama antara template vs raw) ===
-    # hargaInstallasi (template 2L) ← hargaInstalasi (raw 1L)
-    if 'hargaInstalasi' in df_raw.columns:
-        for idx, (col_idx, col_name) in enumerate(template_headers):
-            if clean_header(col_name) == clean_header('hargaInstallasi'):
-                raw_to_template['hargaInstalasi'] = col_idx
-                break
+    # Mapping kolom raw ke template (anti-typo + SPECIAL_COLUMN_MAPPINGS), dari registry kalau schema sama
+    raw_to_template = map_raw_to_template("Data OPT", df_raw, header_index, job)
     
     # === SORT BY kodeMasterProduk (CUSTOM ORDER dari mentor) ===
     kode_produk_col = None
@@ -956,21 +2978,11 @@ def update_sheet_opt(wb, bulan_index):
     if kode_produk_col:
         df_raw = custom_sort_by_kode_produk(df_raw, kode_produk_col)
     
-    # === UPDATE BULAN BERJALAN (DINAMIS: scan row 1-5) ===
+    # === UPDATE BULAN BERJALAN (DINAMIS: label di row 1-5, dari header_index) ===
     # Cari label "Bulan Berjalan" di row manapun (1-5), tulis nilai di kolom sebelahnya di row yang sama
-    col_label = None
-    row_label = None
-    for row_idx in range(1, 6):  # Scan row 1-5
-        for col_idx in range(1, 150):
-            cell_val = ws.cell(row_idx, col_idx).value
-            if cell_val and "bulan berjalan" in str(cell_val).lower():
-                col_label = col_idx
-                row_label = row_idx
-                break
-        if col_label:
-            break
-    
-    if col_label and row_label:
+    found = header_index.find_text("bulan berjalan")
+    if found:
+        row_label, col_label = found
         # Tulis nilai di kolom sebelah kanan (col_label + 1) di row yang sama
         col_value = col_label + 1
         ws.cell(row_label, col_value).value = bulan_index
@@ -980,43 +2992,8 @@ def update_sheet_opt(wb, bulan_index):
         print("     ⚠️  Warning: Kolom 'Bulan Berjalan' tidak ditemukan, gunakan fallback row 2, col 84")
         ws.cell(2, 84).value = bulan_index
     
-    # === COPY TEMPLATE ROW 4 FORMULAS ===
-    # Simpan formula dari row 4 template untuk di-copy ke row baru
-    import re
-    template_formulas = {}
-    for col in range(1, ws.max_column + 1):
-        cell = ws.cell(4, col)
-        if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-            template_formulas[col] = cell.value
-    
-    # === HAPUS DATA LAMA (dari row 4 ke bawah) ===
-    if ws.max_row > 3:
-        ws.delete_rows(4, ws.max_row - 3)
-    
-    # === TULIS DATA BARU (dari row 4) ===
-    for row_idx, row_data in df_raw.iterrows():
-        excel_row = row_idx + 4  # Start dari row 4
-        
-        # 1. TULIS DATA RAW DULU (prioritas tertinggi)
-        for raw_col, template_col_idx in raw_to_template.items():
-            val = row_data[raw_col]
-            if pd.notna(val):
-                # Clean invalid date strings (--/--/--, --, dll) untuk mencegah #VALUE!
-                str_val = str(val).strip()
-                if str_val in ['--/--/--', '--', '---', 'nan', 'NaT', 'None']:
-                    # Skip: biarkan cell kosong
-                    continue
-                ws.cell(excel_row, template_col_idx).value = val
-        
-        # 2. Copy formulas dari template HANYA untuk kolom yang TIDAK ada di raw data
-        for col_idx, formula_template in template_formulas.items():
-            # Skip kalau kolom ini sudah ada data raw
-            if col_idx in raw_to_template.values():
-                continue
-            
-            # Replace cell references: A4->A5, J4->J5, CC4->CC5, BZ4->BZ5, dll
-            formula_new = re.sub(r'([A-Z]+)4\b', r'\g<1>' + str(excel_row), formula_template)
-            ws.cell(excel_row, col_idx).value = formula_new
+    # === TULIS DATA BARU (dari row 4): formula template row 4 + data raw, stream saat save ===
+    stream = prepare_bulk_rows(ws, df_raw, raw_to_template, start_row=4)
     
     # === UPDATE SUBTOTAL FORMULAS IN ROW 1 (DYNAMIC: cari kolom dengan formula SUBTOTAL) ===
     last_data_row = len(df_raw) + 3  # Row terakhir data
@@ -1028,50 +3005,1168 @@ def update_sheet_opt(wb, bulan_index):
             ws.cell(1, col_idx).value = f"=SUBTOTAL(9,{col_letter}4:{col_letter}{last_data_row})"
     
     print(f"     ✅ Data OPT updated: {len(df_raw)} baris")
+    return stream
 
 # ==============================================================================
 # UPDATE RUMUS SUMIF DINAMIS DI DASHBOARD
 # ==============================================================================
-def update_dashboard_sumif_formulas(wb):
-    """Update rumus SUMIF di Dashboard agar range dinamis (ubah statis range jadi full column)"""
-    print(f"   > Updating Dashboard SUMIF formulas (dynamic ranges)...")
+_PATTERN_SHEET_RANGE = re.compile(r"(?:'([^']+)'|([A-Za-z_][\w.]*))?(!?)\$([A-Z]+)(?:\$(\d+))?:\$([A-Z]+)(?:\$\d+)?(?![\w$])")
+
+def sheet_data_rows(wb, streamed_sheets):
+    """Rentang baris data per sheet {nama: (row pertama, row terakhir)} untuk batas range rumus
     
-    import re
+    Sheet yang di-stream pakai jumlah baris yang akan ditulis, sheet lain pakai max_row openpyxl.
+    """
+    rows = {ws.title: (1, ws.max_row) for ws in wb.worksheets}
+    for name, stream in streamed_sheets.items():
+        rows[name] = (stream.start_row, max(stream.last_row, stream.start_row))
+    return rows
+
+def update_dashboard_sumif_formulas(wb, data_rows=None):
+    """Update rumus SUMIF di Dashboard agar range mengikuti jumlah baris data yang benar-benar ditulis
+    
+    Range absolut / kolom penuh ('Data Pelanggan'!$AO$4:$AO$12429, 'Realisasi X'!$C:$C) → $AO$4:$AO$<row terakhir>,
+    jadi recalc Excel sebanding ukuran data, bukan 1.048.576 row per referensi. Range tanpa nama sheet
+    mengacu ke Dashboard sendiri.
+    
+    Args:
+        data_rows: hasil sheet_data_rows(); default dihitung dari max_row tiap sheet
+    """
+    print(f"   > Updating Dashboard SUMIF formulas (range sesuai jumlah data)...")
     ws_dash = wb["Dashboard"]
+    data_rows = data_rows or sheet_data_rows(wb, {})
     
-    # Pattern untuk detect & replace range statis jadi dinamis
-    # Contoh: $M$4:$M$12429 → $M:$M
-    pattern_range = re.compile(r'\$([A-Z]+)\$\d+:\$([A-Z]+)\$\d+')
+    def bounded(match):
+        quoted, bare, bang, col_start, row_start, col_end = match.groups()
+        sheet = quoted or bare
+        if sheet and not bang:
+            return match.group(0)  # bukan referensi sheet (mis. nama fungsi)
+        first, last = data_rows.get(sheet or ws_dash.title, (None, None))
+        if last is None:
+            return match.group(0)  # sheet tidak dikenal: biarkan range template
+        first = int(row_start) if row_start else first
+        prefix = f"'{quoted}'!" if quoted else f"{bare}!" if bare else ""
+        return f"{prefix}${col_start}${first}:${col_end}${max(last, first)}"
     
-    # Scan semua cell di Dashboard
+    updated = 0
     for row in ws_dash.iter_rows(min_row=3, max_row=ws_dash.max_row):
         for cell in row:
             # Skip merged cells
-            if hasattr(cell, '__class__') and cell.__class__.__name__ == 'MergedCell':
+            if isinstance(cell, MergedCell):
                 continue
-            
-            # Cek apakah cell punya formula
-            if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-                original_formula = cell.value
-                
-                # Replace semua range statis jadi full column
-                # $M$4:$M$12429 → $M:$M
-                updated_formula = pattern_range.sub(r'$\1:$\2', original_formula)
-                
-                # Tulis balik kalau ada perubahan
-                if updated_formula != original_formula:
-                    try:
-                        cell.value = updated_formula
-                    except:
-                        pass  # Skip jika error (merged cell, dll)
+            if isinstance(cell.value, str) and cell.value.startswith('='):
+                formula = _PATTERN_SHEET_RANGE.sub(bounded, cell.value)
+                if formula != cell.value:
+                    cell.value = formula
+                    updated += 1
+    
+    print(f"     ✅ Dashboard formulas updated: {updated} cell, range dibatasi ke baris data")
+
+# ==============================================================================
+# MODE VALUES (SUMIF DASHBOARD DIHITUNG DI PANDAS)
+# ==============================================================================
+AUDIT_SHEET_NAME = "Audit Rumus"
+
+# SUMIF(range kriteria, cell kriteria, range jumlah) dengan range kolom penuh / terbatas di sheet lain
+_SUMIF_TERM = (r"SUMIF\(\s*'?([^'!]+)'?!\$?([A-Z]+)\$?\d*:\$?[A-Z]+\$?\d*\s*,"
+               r"\s*(?:'?[^'!,]+'?!)?\$?([A-Z]+)\$?(\d+)\s*,"
+               r"\s*'?([^'!]+)'?!\$?([A-Z]+)\$?\d*:\$?[A-Z]+\$?\d*\s*\)")
+_PATTERN_SUMIF_TERM = re.compile(_SUMIF_TERM, re.IGNORECASE)
+_PATTERN_SUMIF_FORMULA = re.compile(rf"^=\s*{_SUMIF_TERM}(\s*\+\s*{_SUMIF_TERM})*\s*$", re.IGNORECASE)
+_PATTERN_ROW_REF = re.compile(r"^=\$?([A-Z]+)\{row\}$")
+
+class SheetColumns:
+    """Kolom sheet output sebagai Series (untuk agregasi pandas), tanpa baca ulang workbook
+    
+    Sumber: cell openpyxl (row header / sheet biasa) + baris StreamedSheetRows kalau sheet di-stream.
+    Kolom formula stream yang hanya referensi kolom lain di row yang sama (mis. '=F{row}') diikuti
+    ke kolom sumbernya; formula lain tidak bisa dihitung → None (SUMIF dibiarkan sebagai rumus).
+    """
+    def __init__(self, ws, stream=None):
+        self.ws = ws
+        self.stream = stream
+        self._cache = {}
+
+    def column(self, letter):
+        if letter not in self._cache:
+            self._cache[letter] = self._build(column_index_from_string(letter))
+        return self._cache[letter]
+
+    def _build(self, col):
+        # Series index 0 = row 1, supaya kolom kriteria & kolom jumlah sejajar per row
+        start_row = self.stream.start_row if self.stream is not None else self.ws.max_row + 1
+        head = [None] * (start_row - 1)
+        for (r, c), cell in sheet_cells(self.ws).items():
+            if c == col and r < start_row:
+                head[r - 1] = cell.value
+        is_formula = [isinstance(v, str) and v.startswith("=") for v in head]
+        if self.stream is None and any(is_formula):
+            return None  # sheet biasa dengan rumus di kolom ini: nilainya belum ada
+        # Row header sheet stream: rumus (mis. SUBTOTAL di row 1) tidak dihitung
+        head = pd.Series([None if f else v for v, f in zip(head, is_formula)], dtype=object)
+        if self.stream is None:
+            return head
+        body = self._body(col, set())
+        return None if body is None else pd.concat([head, body], ignore_index=True)
+
+    def _body(self, col, seen):
+        stream = self.stream
+        if col in stream.columns:
+            return stream.df.iloc[:, stream.columns.index(col)].astype(object)
+        if col in stream.formulas:
+            m = _PATTERN_ROW_REF.match(stream.formulas[col])
+            target = column_index_from_string(m.group(1)) if m else None
+            if target is None or target in seen:
+                return None
+            return self._body(target, seen | {col})
+        return pd.Series([None] * len(stream.df), dtype=object)
+
+class SumifAggregator:
+    """Hasil SUMIF per (sheet, kolom kriteria, kolom jumlah): SATU groupby per pasangan kolom, dipakai ulang semua cell"""
+    def __init__(self, wb, streamed_sheets):
+        self.wb = wb
+        self.streamed_sheets = streamed_sheets
+        self._sheets = {}
+        self._sums = {}
+
+    def _columns(self, sheet):
+        if sheet not in self._sheets:
+            self._sheets[sheet] = SheetColumns(self.wb[sheet], self.streamed_sheets.get(sheet)) if sheet in self.wb.sheetnames else None
+        return self._sheets[sheet]
+
+    def sums(self, sheet, crit_col, sum_sheet, sum_col):
+        """{_sumif_key(kriteria): total} atau None kalau kolom tidak bisa dihitung di pandas"""
+        key = (sheet, crit_col, sum_sheet, sum_col)
+        if key not in self._sums:
+            crit_cols, sum_cols = self._columns(sheet), self._columns(sum_sheet)
+            crit = crit_cols.column(crit_col) if crit_cols else None
+            values = sum_cols.column(sum_col) if sum_cols else None
+            if crit is None or values is None:
+                self._sums[key] = None
+            else:
+                self._sums[key] = sumif_totals(crit, values, self.wb.epoch)
+        return self._sums[key]
+
+    def evaluate(self, ws, formula):
+        """Nilai formula '=SUMIF(...)+SUMIF(...)' atau None kalau bentuknya lain / kolom tidak bisa dihitung"""
+        if not _PATTERN_SUMIF_FORMULA.match(formula):
+            return None
+        total = 0
+        for sheet, crit_col, ref_col, ref_row, sum_sheet, sum_col in _PATTERN_SUMIF_TERM.findall(formula):
+            sums = self.sums(sheet.strip(), crit_col.upper(), sum_sheet.strip(), sum_col.upper())
+            if sums is None:
+                return None
+            criteria = ws[f"{ref_col.upper()}{ref_row}"].value
+            total += sums.get(_sumif_key(criteria), 0) if criteria is not None else 0
+        return total
+
+def apply_values_mode(wb, streamed_sheets, audit=True):
+    """Ganti semua rumus SUMIF di Dashboard dengan angka hasil groupby (file output tidak perlu recalc SUMIF)
+    
+    Rumus lain (SUM vertikal, selisih kumulatif, prognosa) tetap rumus: murah dihitung Excel.
+    audit=True → rumus asli + nilai ditulis sebagai teks di sheet 'Audit Rumus'.
+    
+    Returns:
+        jumlah cell SUMIF yang diganti angka
+    """
+    print(f"   > Mode values: hitung SUMIF Dashboard di pandas...")
+    ws_dash = wb["Dashboard"]
+    aggregator = SumifAggregator(wb, streamed_sheets)
+    replaced, skipped = [], 0
+    for row in ws_dash.iter_rows(min_row=1, max_row=ws_dash.max_row):
+        for cell in row:
+            if not (isinstance(cell.value, str) and cell.value.startswith('=') and 'SUMIF' in cell.value.upper()):
+                continue
+            value = aggregator.evaluate(ws_dash, cell.value)
+            if value is None:
+                skipped += 1
+                continue
+            replaced.append((cell.coordinate, cell.value, value))
+            cell.value = value
+    
+    if AUDIT_SHEET_NAME in wb.sheetnames:
+        del wb[AUDIT_SHEET_NAME]  # mode batch: audit bulan lalu ikut workbook yang dipakai ulang
+    if audit and replaced:
+        ws_audit = wb.create_sheet(AUDIT_SHEET_NAME)
+        ws_audit.append(["Cell Dashboard", "Rumus asli", "Nilai"])
+        for coordinate, formula, value in replaced:
+            ws_audit.append([coordinate, None, value])
+            # Simpan sebagai teks (bukan rumus live → tidak ikut recalc)
+            cell = ws_audit.cell(ws_audit.max_row, 2)
+            cell.value = formula
+            cell.data_type = 's'
+    
+    print(f"     ✅ {len(replaced)} SUMIF → angka" + (f", {skipped} dibiarkan rumus (kolom sumber berupa rumus)" if skipped else "")
+          + (f", audit di sheet '{AUDIT_SHEET_NAME}'" if audit and replaced else ""))
+    return len(replaced)
+
+# ==============================================================================
+# EVALUATOR RUMUS (CACHED VALUE DI FILE OUTPUT)
+# ==============================================================================
+# Token rumus yang ditulis project ini: angka, teks, fungsi, referensi cell/range (boleh beda sheet,
+# kolom penuh $C:$C, atau '{row}' di rumus baris stream hasil compile_row_formula) dan operator
+_FORMULA_TOKEN = re.compile(r"""\s*(?:
+      (?P<number>(?:\d+\.?\d*|\.\d+)(?:[Ee][+-]?\d+)?)
+    | (?P<string>"(?:[^"]|"")*")
+    | (?P<func>[A-Z][A-Z0-9.]*)\(
+    | (?:(?:'(?P<quoted>(?:[^']|'')+)'|(?P<sheet>[A-Z_][\w.]*))!)?
+      \$?(?P<col1>[A-Z]{1,3})\$?(?P<row1>\d+|\{row\})?
+      (?::\$?(?P<col2>[A-Z]{1,3})\$?(?P<row2>\d+|\{row\})?)?(?![\w(])
+    | (?P<op>[-+*/(),])
+)""", re.VERBOSE | re.IGNORECASE)
+
+class _FormulaUnsupported(Exception):
+    """Rumus di luar subset evaluator (fungsi lain, error Excel, referensi melingkar) → tanpa cached value"""
+
+_UNSUPPORTED = object()
+
+def _tokenize_formula(text):
+    tokens, pos = [], 0
+    while pos < len(text):
+        m = _FORMULA_TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            if text[pos:].strip():
+                raise _FormulaUnsupported(text[pos:])
+            break
+        pos = m.end()
+        if m.group("number"):
+            tokens.append(("num", float(m.group("number"))))
+        elif m.group("string"):
+            tokens.append(("str", m.group("string")[1:-1].replace('""', '"')))
+        elif m.group("func"):
+            tokens.append(("func", m.group("func").upper()))
+        elif m.group("col1"):
+            rows = [None if r is None else "row" if r == "{row}" else int(r) for r in (m.group("row1"), m.group("row2"))]
+            is_range = m.group("col2") is not None
+            if (not is_range and rows[0] is None) or (is_range and (rows[0] is None) != (rows[1] is None)):
+                raise _FormulaUnsupported(m.group(0))  # nama (defined name / TRUE) atau range setengah
+            sheet = m.group("quoted").replace("''", "'") if m.group("quoted") else m.group("sheet")
+            c1 = column_index_from_string(m.group("col1").upper())
+            c2 = column_index_from_string(m.group("col2").upper()) if is_range else c1
+            tokens.append(("ref", sheet, c1, rows[0], c2, rows[1] if is_range else rows[0], is_range))
+        else:
+            tokens.append(("op", m.group("op")))
+    return tokens
+
+# Rumus template berulang per row ({row}) → cukup beberapa ribu teks unik; LRU supaya tidak tumbuh terus
+FORMULA_CACHE_SIZE = 4096
+
+def parse_formula(text):
+    """Teks rumus (tanpa '=') → AST tuple (immutable, aman dipakai bersama); _FormulaUnsupported kalau di luar subset"""
+    node = _parse_formula_cached(text)
+    if node is None:
+        raise _FormulaUnsupported(text)
+    return node
+
+@functools.lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def _parse_formula_cached(text):
+    """AST rumus, None kalau di luar subset (hasil gagal ikut di-cache, tidak di-parse ulang)"""
+    tokens = _tokenize_formula(text)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else (None, None)
+
+    def take(kind, value=None):
+        nonlocal pos
+        token = peek()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise _FormulaUnsupported(text)
+        pos += 1
+        return token
+
+    def expr():
+        node = term()
+        while peek() in (("op", "+"), ("op", "-")):
+            node = ("op", take("op")[1], node, term())
+        return node
+
+    def term():
+        node = unary()
+        while peek() in (("op", "*"), ("op", "/")):
+            node = ("op", take("op")[1], node, unary())
+        return node
+
+    def unary():
+        if peek() in (("op", "-"), ("op", "+")):
+            sign = take("op")[1]
+            return ("neg", unary()) if sign == "-" else unary()
+        return primary()
+
+    def primary():
+        nonlocal pos
+        token = peek()
+        if token[0] in ("num", "str", "ref"):
+            pos += 1
+            return token
+        if token[0] == "func":
+            pos += 1
+            args = []
+            if peek() != ("op", ")"):
+                args.append(expr())
+                while peek() == ("op", ","):
+                    take("op", ",")
+                    args.append(expr())
+            take("op", ")")
+            return ("call", token[1], tuple(args))
+        take("op", "(")
+        node = expr()
+        take("op", ")")
+        return node
+
+    try:
+        node = expr()
+        if pos != len(tokens):
+            raise _FormulaUnsupported(text)
+    except _FormulaUnsupported:
+        node = None
+    return node
+
+def _is_blank(value):
+    if value is None or value is pd.NA or value is pd.NaT:
+        return True
+    if isinstance(value, str):
+        return value == ""
+    return isinstance(value, float) and value != value
+
+def _cached_value_xml(value):
+    """Nilai hasil rumus → (atribut t, elemen <v>) untuk XML cell"""
+    if isinstance(value, (bool, np.bool_)):
+        return ' t="b"', f"<v>{int(value)}</v>"
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        if value != value or value in (float('inf'), float('-inf')):
+            return "", "<v />"
+        return "", f"<v>{'%.16g' % value}</v>"
+    if isinstance(value, str):
+        return ' t="str"', f"<v>{xml_escape(value)}</v>"
+    return "", "<v />"
+
+_PATTERN_FORMULA_CELL = re.compile(r'<c r="([A-Z]+\d+)"([^>]*)>(<f[^>]*>[^<]*</f>|<f[^>]*/>)<v\s*/></c>')
+
+def inject_cached_values(sheet_xml, values):
+    """Isi <v /> kosong cell rumus di XML sheet openpyxl dengan nilai {coordinate: nilai}"""
+    def fill(m):
+        if m.group(1) not in values:
+            return m.group(0)
+        t, v = _cached_value_xml(values[m.group(1)])
+        return f'<c r="{m.group(1)}"{m.group(2)}{t}>{m.group(3)}{v}</c>'
+    return _PATTERN_FORMULA_CELL.sub(fill, sheet_xml)
+
+class FormulaEvaluator:
+    """Hitung rumus workbook output di Python supaya file tersimpan dengan cached value
+    
+    openpyxl menyimpan rumus tanpa hasil, jadi pembaca data_only=True (saldo bulan lalu, pandas, BI)
+    hanya melihat None sampai file dibuka-simpan di Excel. Subset yang didukung = rumus yang ditulis
+    project ini: SUM, SUMIF, SUBTOTAL(9), + - * / dan referensi cell/range (termasuk kolom penuh).
+    Rumus lain dilewati (tanpa cached value), sama seperti sebelumnya.
+    
+    Data dibaca dari memory: cell openpyxl + DataFrame StreamedSheetRows. Kolom sheet stream jadi Series
+    (index = nomor row), rumus baris stream ('=SUM(AY{row}:BJ{row})') dihitung vektor sekali per kolom,
+    dan SUMIF = satu groupby per pasangan range yang dipakai ulang semua cell.
+    """
+    def __init__(self, wb, streamed_sheets=None):
+        self.wb = wb
+        self.streamed_sheets = streamed_sheets or {}
+        self._values = {}    # (sheet, row, col) → hasil rumus cell openpyxl
+        self._columns = {}   # (sheet, col) → Series body sheet stream
+        self._rows = {}      # sheet → {col: [row, ...]} cell openpyxl per kolom
+        self._sumifs = {}    # (range kriteria, range jumlah) → {_sumif_key: total}
+        self._pending = set()
+
+    def _sheet(self, name):
+        if name not in self.wb.sheetnames:
+            raise _FormulaUnsupported(f"sheet {name}")
+        return self.wb[name]
+
+    def _last_row(self, sheet):
+        stream = self.streamed_sheets.get(sheet)
+        if stream is not None:
+            return max(stream.last_row, stream.start_row - 1)
+        return self._sheet(sheet).max_row
+
+    def _column_rows(self, sheet, col):
+        if sheet not in self._rows:
+            index = {}
+            for r, c in sheet_cells(self._sheet(sheet)):
+                index.setdefault(c, []).append(r)
+            self._rows[sheet] = index
+        return self._rows[sheet].get(col, ())
+
+    def _result(self, value):
+        """Hasil akhir rumus: referensi ke cell kosong = 0, tanggal → serial Excel"""
+        if isinstance(value, pd.Series):
+            return value.map(self._result)
+        if _is_blank(value):
+            return 0.0
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)):
+            return to_excel(value, self.wb.epoch)
+        return value
+
+    def cell(self, sheet, row, col):
+        """Nilai cell (hasil hitung kalau rumus); _FormulaUnsupported kalau rumusnya di luar subset"""
+        stream = self.streamed_sheets.get(sheet)
+        if stream is not None and row >= stream.start_row:
+            if row > stream.last_row:
+                return None
+            value = self._stream_column(sheet, col).get(row)
+            return None if _is_blank(value) else value
+        cell = sheet_cells(self._sheet(sheet)).get((row, col))
+        if cell is None or cell.data_type != 'f':
+            return None if cell is None else cell.value
+        key = (sheet, row, col)
+        if key not in self._values:
+            if key in self._pending or not isinstance(cell.value, str):
+                raise _FormulaUnsupported(f"{sheet}!{cell.coordinate}")  # melingkar / array formula
+            self._pending.add(key)
+            try:
+                self._values[key] = self._result(self._eval(parse_formula(cell.value[1:]), sheet))
+            except _FormulaUnsupported:
+                self._values[key] = _UNSUPPORTED
+            finally:
+                self._pending.discard(key)
+        if self._values[key] is _UNSUPPORTED:
+            raise _FormulaUnsupported(f"{sheet}!{cell.coordinate}")
+        return self._values[key]
+
+    def _stream_column(self, sheet, col):
+        """Body kolom sheet stream sebagai Series (index = nomor row); kolom rumus dihitung vektor"""
+        key = (sheet, col)
+        if key not in self._columns:
+            stream = self.streamed_sheets.get(sheet)
+            if stream is None or key in self._pending:
+                raise _FormulaUnsupported(f"{sheet} kolom {col}")
+            index = pd.RangeIndex(stream.start_row, stream.start_row + len(stream.df))
+            if col in stream.columns:
+                series = stream.df.iloc[:, stream.columns.index(col)].set_axis(index)
+                if not pd.api.types.is_numeric_dtype(series):
+                    series = series.astype(object)
+                    series = series.where(~series.map(_is_blank), None)
+            elif col in stream.formulas:
+                self._pending.add(key)
+                try:
+                    result = self._eval(parse_formula(stream.formulas[col][1:]), sheet)
+                    if not isinstance(result, pd.Series):
+                        result = pd.Series([result] * len(index), index=index, dtype=object)
+                    series = self._result(result)
+                except _FormulaUnsupported:
+                    series = None
+                finally:
+                    self._pending.discard(key)
+            else:
+                series = pd.Series([None] * len(index), index=index, dtype=object)
+            self._columns[key] = series
+        if self._columns[key] is None:
+            raise _FormulaUnsupported(f"{sheet} kolom {col}")
+        return self._columns[key]
+
+    def _range_column(self, sheet, col, first, last, skip_subtotal=False):
+        """Nilai satu kolom range sebagai Series (index = nomor row); first/last None = kolom penuh"""
+        stream = self.streamed_sheets.get(sheet)
+        last_row = self._last_row(sheet)
+        first, last = first or 1, min(last or last_row, last_row)
+        head_last = min(last, stream.start_row - 1) if stream is not None else last
+        cells = sheet_cells(self._sheet(sheet))
+        head = {}
+        for r in self._column_rows(sheet, col):
+            if first <= r <= head_last:
+                if skip_subtotal and cells[(r, col)].data_type == 'f' and 'SUBTOTAL(' in str(cells[(r, col)].value).upper():
+                    continue  # SUBTOTAL mengabaikan SUBTOTAL lain di range-nya
+                head[r] = self.cell(sheet, r, col)
+        head = pd.Series(head, dtype=object)
+        if stream is None or last < stream.start_row:
+            return head
+        body = self._stream_column(sheet, col).loc[max(first, stream.start_row):last]
+        return pd.concat([head.astype(object), body.astype(object)]) if len(head) else body
+
+    def _number(self, value):
+        """Konversi operand aritmetika seperti Excel: kosong = 0, teks angka → angka, teks lain = #VALUE!"""
+        if isinstance(value, pd.Series):
+            if pd.api.types.is_numeric_dtype(value) and not pd.api.types.is_bool_dtype(value):
+                return value.astype(float).fillna(0.0)
+            return value.map(self._number).astype(float)
+        if _is_blank(value):
+            return 0.0
+        if isinstance(value, (bool, np.bool_, int, float, np.integer, np.floating)):
+            return float(value)
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)):
+            return to_excel(value, self.wb.epoch)
+        try:
+            return float(str(value))
+        except ValueError:
+            raise _FormulaUnsupported(f"#VALUE! {value!r}")
+
+    def _numeric_only(self, series):
+        return excel_numeric_only(series, self.wb.epoch)
+
+    def _eval(self, node, sheet):
+        kind = node[0]
+        if kind in ("num", "str"):
+            return node[1]
+        if kind == "ref":
+            _, ref_sheet, col, row, _, _, is_range = node
+            if is_range:
+                raise _FormulaUnsupported("range di luar fungsi")
+            if row == "row":
+                if ref_sheet not in (None, sheet):
+                    raise _FormulaUnsupported("{row} beda sheet")
+                return self._stream_column(sheet, col)
+            return self.cell(ref_sheet or sheet, row, col)
+        if kind == "neg":
+            return -self._number(self._eval(node[1], sheet))
+        if kind == "op":
+            a, b = self._number(self._eval(node[2], sheet)), self._number(self._eval(node[3], sheet))
+            if node[1] == "+":
+                return a + b
+            if node[1] == "-":
+                return a - b
+            if node[1] == "*":
+                return a * b
+            if (b == 0).any() if isinstance(b, pd.Series) else b == 0:
+                raise _FormulaUnsupported("#DIV/0!")
+            return a / b
+        name, args = node[1], node[2]
+        if name == "SUM":
+            return self._sum(args, sheet)
+        if name == "SUBTOTAL":
+            function = self._eval(args[0], sheet) if args else None
+            if isinstance(function, pd.Series) or self._number(function) not in (9, 109):
+                raise _FormulaUnsupported("SUBTOTAL selain 9 (SUM)")
+            return self._sum(args[1:], sheet, skip_subtotal=True)
+        if name == "SUMIF":
+            return self._sumif(args, sheet)
+        raise _FormulaUnsupported(name)
+
+    def _sum(self, args, sheet, skip_subtotal=False):
+        total = 0.0
+        for arg in args:
+            if arg[0] != "ref":
+                total = total + self._number(self._eval(arg, sheet))
+                continue
+            _, ref_sheet, c1, r1, c2, r2, _ = arg
+            target = ref_sheet or sheet
+            if "row" in (r1, r2):
+                # Range satu baris di rumus stream (AY{row}:BJ{row}) → jumlah per baris (vektor)
+                if r1 != r2 or target != sheet:
+                    raise _FormulaUnsupported("range {row}")
+                for c in range(min(c1, c2), max(c1, c2) + 1):
+                    total = total + self._numeric_only(self._stream_column(sheet, c)).fillna(0.0)
+                continue
+            first, last = (min(r1, r2), max(r1, r2)) if r1 is not None else (None, None)
+            for c in range(min(c1, c2), max(c1, c2) + 1):
+                total += self._numeric_only(self._range_column(target, c, first, last, skip_subtotal)).sum()
+        return total
+
+    def _sumif(self, args, sheet):
+        if len(args) not in (2, 3):
+            raise _FormulaUnsupported("SUMIF")
+        crit_range, sum_range = args[0], args[2] if len(args) == 3 else args[0]
+        for node in (crit_range, sum_range):
+            if node[0] != "ref" or node[2] != node[4] or "row" in (node[3], node[5]):
+                raise _FormulaUnsupported("SUMIF range")
+        criteria = self._eval(args[1], sheet)
+        if isinstance(criteria, pd.Series):
+            raise _FormulaUnsupported("SUMIF kriteria {row}")
+        if isinstance(criteria, str) and (criteria.startswith(("<", ">", "=")) or "*" in criteria or "?" in criteria):
+            raise _FormulaUnsupported("SUMIF kriteria operator/wildcard")
+        if criteria is None:
+            return 0.0
+        return self._sumif_index(crit_range, sum_range, sheet).get(_sumif_key(criteria), 0.0)
+
+    def _sumif_index(self, crit_range, sum_range, sheet):
+        """{_sumif_key(kriteria): total} untuk satu pasangan range (SATU groupby, dipakai ulang)"""
+        _, crit_sheet, crit_col, c1, _, c2, _ = crit_range
+        _, sum_sheet, sum_col, s1, _, s2, _ = sum_range
+        crit_sheet, sum_sheet = crit_sheet or sheet, sum_sheet or sheet
+        key = (crit_sheet, crit_col, c1, c2, sum_sheet, sum_col, s1)
+        if key not in self._sumifs:
+            if c1 is None:
+                crit = self._range_column(crit_sheet, crit_col, None, None)
+                values = self._range_column(sum_sheet, sum_col, None, None)
+            else:
+                # Range jumlah mengikuti ukuran range kriteria, mulai dari cell kiri-atasnya (aturan Excel)
+                first, last = min(c1, c2), max(c1, c2)
+                offset = (min(s1, s2) if s1 is not None else first) - first
+                crit = self._range_column(crit_sheet, crit_col, first, last)
+                values = self._range_column(sum_sheet, sum_col, first + offset, last + offset)
+                values.index = values.index - offset
+            self._sumifs[key] = sumif_totals(crit, values, self.wb.epoch)
+        return self._sumifs[key]
+
+    def evaluate_workbook(self):
+        """Hitung semua rumus workbook: cell openpyxl → dict, kolom rumus stream → stream.cached_values
+        
+        Returns:
+            dict: {sheet: {coordinate: nilai}} untuk save_workbook_streaming(cached_values=...)
+        """
+        print(f"   > Hitung cached value rumus (SUM/SUMIF/SUBTOTAL/aritmetika)...")
+        cached, done, skipped = {}, 0, 0
+        for ws in self.wb.worksheets:
+            values = {}
+            for (r, c), cell in list(sheet_cells(ws).items()):
+                if cell.data_type != 'f':
+                    continue
+                try:
+                    values[cell.coordinate] = self.cell(ws.title, r, c)
+                except _FormulaUnsupported:
+                    skipped += 1
+            if values:
+                cached[ws.title] = values
+                done += len(values)
+        for title, stream in self.streamed_sheets.items():
+            stream.cached_values = {}
+            for col in stream.formulas:
+                try:
+                    series = self._stream_column(title, col)
+                except _FormulaUnsupported:
+                    skipped += len(stream.df)
+                    continue
+                stream.cached_values[col] = [_cached_value_xml(v) for v in series]
+                done += len(series)
+        print(f"     ✅ {done} cell rumus punya cached value" + (f", {skipped} dilewati (di luar subset)" if skipped else ""))
+        return cached
+
+# ==============================================================================
+# HISTORY BULANAN (PARQUET APPEND-ONLY, PARTISI TAHUN/BULAN)
+# ==============================================================================
+class HistoryStore:
+    """Riwayat hasil run per bulan di HISTORY_DIR/tahun=YYYY/bulan=MM/
+    
+    Tiap run menulis file baru, tidak pernah menimpa: realisasi-<run>.parquet (df_final),
+    dashboard-<run>.parquet (Kumulatif & Stand Alone per kode Dashboard) dan meta-<run>.json
+    (ditulis terakhir = tanda run lengkap). Pembaca memakai run terakhir per bulan, jadi saldo
+    bulan lalu & query year-to-date cukup baca Parquet kecil tanpa membuka xlsx lama.
+    
+    Usage:
+        store = HistoryStore(".etl_history")
+        df = store.query("dashboard", 2025)   # semua bulan 2025, kolom tambahan tahun & bulan
+    """
+    KINDS = ("realisasi", "dashboard")
+
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, tahun, bulan):
+        return os.path.join(self.root, f"tahun={int(tahun)}", f"bulan={int(bulan):02d}")
+
+    def append(self, tahun, bulan, frames, meta):
+        """Simpan satu run: frames {jenis: DataFrame} + meta (dict JSON). Return run_id"""
+        folder = self._dir(tahun, bulan)
+        os.makedirs(folder, exist_ok=True)
+        run_id = f"{datetime.datetime.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+        for kind, df in frames.items():
+            write_atomic(os.path.join(folder, f"{kind}-{run_id}.parquet"),
+                         lambda tmp: df.to_parquet(tmp, index=False))
+        meta = {**meta, "run_id": run_id, "tahun": int(tahun), "bulan": int(bulan), "files": sorted(frames)}
+        def writer(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=1, default=str)
+        write_atomic(os.path.join(folder, f"meta-{run_id}.json"), writer)
+        return run_id
+
+    def runs(self, tahun, bulan):
+        """run_id lengkap (punya meta) untuk satu bulan, urut lama → baru"""
+        folder = self._dir(tahun, bulan)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(f[len("meta-"):-len(".json")] for f in os.listdir(folder)
+                      if f.startswith("meta-") and f.endswith(".json"))
+
+    def months(self, tahun=None):
+        """[(tahun, bulan), ...] yang punya minimal satu run lengkap"""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for year_dir in os.listdir(self.root):
+            if not year_dir.startswith("tahun=") or (tahun is not None and year_dir != f"tahun={int(tahun)}"):
+                continue
+            for month_dir in os.listdir(os.path.join(self.root, year_dir)):
+                if month_dir.startswith("bulan="):
+                    key = (int(year_dir[6:]), int(month_dir[6:]))
+                    if self.runs(*key):
+                        found.append(key)
+        return sorted(found)
+
+    def meta(self, tahun, bulan, run_id=None):
+        runs = self.runs(tahun, bulan)
+        run_id = run_id or (runs[-1] if runs else None)
+        if run_id is None:
+            return None
+        with open(os.path.join(self._dir(tahun, bulan), f"meta-{run_id}.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def read(self, kind, tahun, bulan, run_id=None):
+        """DataFrame jenis `kind` untuk satu bulan (default run terakhir) atau None kalau belum ada"""
+        meta = self.meta(tahun, bulan, run_id)
+        if meta is None or kind not in meta["files"]:
+            return None
+        return pd.read_parquet(os.path.join(self._dir(tahun, bulan), f"{kind}-{meta['run_id']}.parquet"))
+
+    def query(self, kind, tahun, bulan_sampai=12):
+        """Gabungan run terakhir tiap bulan Januari s/d bulan_sampai (year-to-date), + kolom tahun & bulan"""
+        frames = []
+        for year, month in self.months(tahun):
+            if month <= bulan_sampai:
+                df = self.read(kind, year, month)
+                if df is not None:
+                    frames.append(df.assign(tahun=year, bulan=month))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def report_period(cfg):
+    """((tahun, bulan) BULAN_INI, (tahun, bulan) BULAN_LALU) dari config (TAHUN wajib, tidak ditebak dari jam)"""
+    if not cfg.get("TAHUN"):
+        raise ValueError("❌ TAHUN kosong: history per bulan butuh tahun laporan BULAN_INI (CONFIG['TAHUN'] / --tahun)")
+    tahun = int(cfg["TAHUN"])
+    nama_bulan = [b.lower() for b in NAMA_BULAN]
+    bulan_ini = nama_bulan.index(cfg["BULAN_INI"].lower()) + 1
+    bulan_lalu = nama_bulan.index(cfg["BULAN_LALU"].lower()) + 1
+    # Januari setelah Desember → bulan lalu ada di tahun sebelumnya
+    return (tahun, bulan_ini), (tahun - 1 if bulan_lalu >= bulan_ini else tahun, bulan_lalu)
+
+def history_lalu_vals(ws_dash, job=None):
+    """Saldo kumulatif bulan lalu per row Dashboard dari HistoryStore (dicocokkan per kode kolom A)
+    
+    Returns:
+        dict {row: nilai} (format sama dengan read_master_lalu_vals) atau None kalau history tidak
+        aktif / bulan lalu belum ada. Hanya cadangan: saldo utama tetap dari template
+    """
+    cfg = (job or default_job()).config
+    if not cfg.get("HISTORY_DIR"):
+        return None
+    _, (tahun_lalu, bulan_lalu) = report_period(cfg)
+    try:
+        df = HistoryStore(cfg["HISTORY_DIR"]).read("dashboard", tahun_lalu, bulan_lalu)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"⚠️  Warning: History bulan lalu tidak bisa dibaca, pakai template: {e}")
+        return None
+    if df is None:
+        return None
+    by_kode = dict(zip(df["kode"].map(_sumif_key), df["kumulatif"]))
+    vals = {}
+    for r in range(cfg["DASHBOARD_DATA_START"], ws_dash.max_row + 1):
+        kode = ws_dash.cell(r, 1).value
+        if kode is not None and _sumif_key(kode) in by_kode:
+            vals[r] = by_kode[_sumif_key(kode)]
+    return vals
+
+def save_month_history(ws_dash, df_final, kumulatif_vals, master_lalu_vals, lalu_source, job=None):
+    """Tambah run bulan ini ke HistoryStore: df_final, hasil Dashboard per kode, metadata run"""
+    job = job or default_job()
+    cfg = job.config
+    (tahun, bulan), (tahun_lalu, bulan_lalu) = report_period(cfg)
+    rows = []
+    for r, kumulatif in sorted(kumulatif_vals.items()):
+        kode = ws_dash.cell(r, 1).value
+        if kode is None:
+            continue
+        # Januari: kumulatif mulai dari nol, SA = kumulatif
+        lalu = 0.0 if bulan == 1 else float(master_lalu_vals.get(r, 0) or 0)
+        rows.append({"row": r, "kode": str(kode), "nama": str(ws_dash.cell(r, 2).value or ""),
+                     "grand_total": "total" in str(kode).lower(), "kumulatif": float(kumulatif or 0),
+                     "kumulatif_lalu": lalu, "stand_alone": float(kumulatif or 0) - lalu})
+    df_dash = pd.DataFrame(rows, columns=["row", "kode", "nama", "grand_total", "kumulatif", "kumulatif_lalu", "stand_alone"])
+    inputs = {key: {"file": os.path.basename(str(cfg[key])), "sha256": job.cache.file_digest(cfg[key])}
+              for key in FILE_CONFIG_KEYS if key != "OUTPUT_FILE" and cfg.get(key) is not None and input_exists(cfg[key])}
+    meta = {"job_id": job.job_id, "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "bulan_ini": cfg["BULAN_INI"], "bulan_lalu": cfg["BULAN_LALU"], "periode_lalu": [tahun_lalu, bulan_lalu],
+            "saldo_lalu_dari": lalu_source, "output_mode": cfg.get("OUTPUT_MODE", "formula"),
+            "rows_realisasi": len(df_final), "inputs": inputs,
+            "output_file": cfg["OUTPUT_FILE"] if isinstance(cfg["OUTPUT_FILE"], str) else None}
+    try:
+        run_id = HistoryStore(cfg["HISTORY_DIR"]).append(tahun, bulan, {"realisasi": df_final, "dashboard": df_dash}, meta)
+    except (ImportError, OSError, ValueError, TypeError) as e:
+        # ImportError: pyarrow tidak ter-install; Type/ValueError: kolom tidak bisa jadi Parquet
+        print(f"⚠️  Warning: History bulan ini tidak tersimpan: {e}")
+        return None
+    print(f"   > History: {cfg['HISTORY_DIR']}/tahun={tahun}/bulan={bulan:02d} (run {run_id})")
+    return run_id
+
+# ==============================================================================
+# MODE BATCH MULTI-BULAN (OUTPUT BULAN INI = TEMPLATE BULAN BERIKUTNYA, DI MEMORY)
+# ==============================================================================
+NAMA_BULAN = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli", "Agustus",
+              "September", "Oktober", "November", "Desember"]
+
+def _sumif_key(value):
+    """Normalisasi nilai untuk pencocokan kriteria SUMIF: angka/teks angka → float, teks lain → lowercase"""
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        return text.lower()
+
+def excel_numeric_only(series, epoch=None):
+    """Isi range untuk SUM/SUMIF: hanya angka & tanggal (serial Excel); teks (termasuk teks angka) & boolean → NaN"""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype(float)
+    def number(v):
+        if isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, (bool, np.bool_)):
+            return float(v)
+        if isinstance(v, (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)):
+            return to_excel(v, epoch) if epoch is not None else to_excel(v)
+        return np.nan
+    return series.map(number).astype(float)
+
+def sumif_totals(crit, values, epoch=None):
+    """{_sumif_key(kriteria): total} untuk satu pasangan range SUMIF, aturan cocok Excel di SATU tempat
+    
+    crit & values = Series sejajar per index (nomor row / posisi); values yang tidak ada di index crit
+    diabaikan. Dipakai FormulaEvaluator, SumifAggregator (mode values) & compute_kumulatif_vals (batch).
+    """
+    values = excel_numeric_only(values, epoch).reindex(crit.index)
+    valid = crit.notna() & values.notna()
+    return values[valid].groupby(crit[valid].map(_sumif_key)).sum().to_dict()
+
+def compute_kumulatif_vals(ws_dash, col_kum, df_realisasi, job=None):
+    """Nilai kolom Kumulatif bulan ini di Dashboard, sama seperti hasil hitung Excel
+    
+    Rumus yang ditulis load_data hanya 2 bentuk: SUMIF(Realisasi C, A{r}, Realisasi E) per kode,
+    dan SUM vertikal untuk Grand Total → dihitung dari df Realisasi (groupby kode) tanpa
+    menyimpan lalu membaca ulang workbook. Cell angka biasa dipakai apa adanya.
+    
+    Returns:
+        dict: {row: nilai} (format sama dengan read_master_lalu_vals)
+    """
+    cfg = (job or default_job()).config
+    # SUMIF(Realisasi C, kode, Realisasi E)
+    sums = sumif_totals(df_realisasi.iloc[:, 2], df_realisasi.iloc[:, 4], ws_dash.parent.epoch) if len(df_realisasi) else {}
+    
+    pattern_sumif = re.compile(r'^=SUMIF\([^,]+,\s*\$?([A-Z]+)\$?(\d+)\s*,', re.IGNORECASE)
+    pattern_sum = re.compile(r'^=SUM\(\$?[A-Z]+\$?(\d+):\$?[A-Z]+\$?(\d+)\)$', re.IGNORECASE)
+    vals = {}
+    for r in range(cfg["DASHBOARD_DATA_START"], ws_dash.max_row + 1):
+        v = ws_dash.cell(r, col_kum).value
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            vals[r] = v
+            continue
+        formula = v.replace(' ', '') if isinstance(v, str) else ''
+        m_sumif = pattern_sumif.match(formula)
+        m_sum = pattern_sum.match(formula)
+        if m_sumif:
+            criteria = ws_dash[f"{m_sumif.group(1)}{m_sumif.group(2)}"].value
+            vals[r] = sums.get(_sumif_key(criteria), 0) if criteria is not None else 0
+        elif m_sum:
+            vals[r] = sum(vals.get(i, 0) for i in range(int(m_sum.group(1)), int(m_sum.group(2)) + 1))
+    return vals
+
+class MonthState:
+    """Hasil satu bulan yang diteruskan ke bulan berikutnya di mode batch
+    
+    wb: workbook output di memory (baris data sheet stream tidak ada di object, lihat reuse_workbook)
+    kumulatif_vals: {row Dashboard: Kumulatif bulan ini} → jadi saldo bulan lalu di bulan berikutnya
+    """
+    def __init__(self, bulan, wb, kumulatif_vals, streamed_sheets):
+        self.bulan = bulan
+        self.wb = wb
+        self.kumulatif_vals = kumulatif_vals
+        self.streamed_sheets = streamed_sheets
+
+    def reuse_workbook(self):
+        """Workbook siap dipakai sebagai template: formula row template sheet stream dikembalikan
+        
+        Baris data Data Pelanggan/OPT hanya ada di file (di-stream saat save), jadi formula row 4
+        yang dibaca prepare_bulk_rows ditulis ulang dari hasil compile bulan ini.
+        """
+        for title, stream in self.streamed_sheets.items():
+            if title not in self.wb.sheetnames:
+                continue
+            ws = self.wb[title]
+            for col, formula in stream.formulas.items():
+                ws.cell(stream.start_row, col).value = formula.format(row=stream.start_row)
+        return self.wb
+
+def run_batch(lampiran_files, bulan_mulai="Januari", output_pattern=None, job=None):
+    """Jalankan beberapa bulan berurutan dalam SATU proses (rebuild setahun / backfill)
+    
+    Bulan pertama memakai TEMPLATE_FILE, bulan berikutnya memakai output bulan sebelumnya yang
+    masih di memory (tanpa simpan → baca ulang). Rekap (ProductCatalog), Pelanggan & OPT di-parse
+    sekali dan ditahan di memory; semua Lampiran di-prefetch paralel di awal.
+    
+    Args:
+        lampiran_files: list file Lampiran per bulan, urut mulai bulan_mulai
+        bulan_mulai: nama bulan file pertama (default Januari)
+        output_pattern: nama file output, field {no} {bulan} {BULAN} (default BATCH_OUTPUT_PATTERN)
+        job: EtlJob dasar (config & folder kerja), tiap bulan dijalankan sebagai job.derive(...)
+    
+    Returns:
+        list path file output per bulan
+    """
+    bulan_mulai = bulan_mulai.strip().capitalize()
+    if bulan_mulai not in NAMA_BULAN:
+        raise ValueError(f"❌ Bulan mulai tidak valid: {bulan_mulai}. Pilihan: {NAMA_BULAN}")
+    start = NAMA_BULAN.index(bulan_mulai)
+    if start + len(lampiran_files) > 12:
+        raise ValueError(f"❌ {len(lampiran_files)} file mulai {bulan_mulai} melewati Desember")
+    job = job or default_job()
+    output_pattern = output_pattern or job.config["BATCH_OUTPUT_PATTERN"]
+    
+    cache = job.cache
+    outputs = []
+    try:
+        for key in ("FILE_REKAP", "FILE_PELANGGAN", "FILE_OPT"):
+            if input_exists(job.config[key]):
+                cache.pin(job.config[key])
+        month_jobs = [job.derive(
+            INPUT_FILE=path,
+            BULAN_INI=NAMA_BULAN[start + i],
+            BULAN_LALU=NAMA_BULAN[start + i - 1],  # Januari → Desember (tahun lalu)
+            OUTPUT_FILE=output_pattern.format(no=start + i + 1, bulan=NAMA_BULAN[start + i], BULAN=NAMA_BULAN[start + i].upper()),
+        ) for i, path in enumerate(lampiran_files)]
+        prefetch_inputs(input_files=[m.config["INPUT_FILE"] for m in month_jobs], job=job)
+        
+        previous = None
+        for i, month in enumerate(month_jobs):
+            cfg = month.config
+            print(f"\n📅 BATCH {i + 1}/{len(month_jobs)}: {cfg['BULAN_LALU']} → {cfg['BULAN_INI']} ({cfg['INPUT_FILE']})")
+            with job.profiler.stage(f"bulan {cfg['BULAN_INI']}"):
+                with job.profiler.stage("extract") as stage:
+                    m1, m2, raw, kode_nama_map = extract_data(job=month)
+                    stage["rows_out"] = len(raw)
+                with job.profiler.stage("transform", rows_in=len(raw)) as stage:
+                    final = transform_data(m1, m2, raw, kode_nama_map, job=month)
+                    stage["rows_out"] = len(final)
+                with job.profiler.stage("load", rows_in=len(final)):
+                    previous = load_data(final, previous=previous, job=month)
+            outputs.append(month.output_target)
+    finally:
+        cache.unpin_all()
+    job.write_profile()
+    
+    print(f"\n✅ BATCH SELESAI: {len(outputs)} bulan → {outputs}")
+    return outputs
+
+# ==============================================================================
+# RUNNER PARALEL (BEBERAPA JOB SEKALIGUS)
+# ==============================================================================
+def _run_job_worker(config, work_dir, job_id):
+    """Jalan di proses worker: satu EtlJob penuh, error dikembalikan (tidak mematikan job lain)"""
+    job = EtlJob({**config, "PREFETCH_WORKERS": 0}, work_dir=work_dir, job_id=job_id)
+    try:
+        return {"job_id": job_id, "output": job.run(), "error": None}
+    except Exception as e:
+        return {"job_id": job_id, "output": None, "error": f"{type(e).__name__}: {e}"}
+
+def run_jobs(jobs, max_workers=None):
+    """Jalankan beberapa EtlJob paralel di process pool (satu job = satu proses)
+    
+    Tiap job punya config & folder kerja sendiri, cache disk dipakai bersama (tulis atomik),
+    prefetch per job dimatikan supaya jumlah proses = max_workers.
+    
+    Args:
+        jobs: list EtlJob
+        max_workers: jumlah proses (default jumlah core, maks jumlah job)
+    
+    Returns:
+        list dict {job_id, output, error} urut sesuai jobs
+    """
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if workers < 2:
+        return [_run_job_worker(job.config, job.work_dir, job.job_id) for job in jobs]
+    
+    print(f"🧵 RUN JOBS: {len(jobs)} job paralel ({workers} proses)...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_job_worker, job.config, job.work_dir, job.job_id) for job in jobs]
+        results = [future.result() for future in futures]
+    for result in results:
+        status = f"✅ {result['output']}" if result["error"] is None else f"❌ {result['error']}"
+        print(f"   > Job {result['job_id']}: {status}")
+    return results
+
+# ==============================================================================
+# ANTRIAN JOB BACKGROUND (APP STREAMLIT)
+# ==============================================================================
+class JobQueue:
+    """Jalankan EtlJob di background thread dengan job ID, status bisa di-poll dari UI
+    
+    Antrian adil antar pemilik (sesi / user): job diambil round-robin per pemilik, jadi user yang
+    submit banyak job tidak menahan user lain. Job yang selesai hanya menyimpan status + output
+    (EtlJob, input upload & cache memory dilepas), dibatasi `keep_finished` job dan `keep_bytes`
+    total ukuran output; output dilepas setelah di-download (release_output).
     
-    print(f"     ✅ Dashboard SUMIF formulas updated: statis range → full column dynamic!")
+    Usage:
+        queue = JobQueue()
+        job_id = queue.submit(EtlJob({...}), owner=session_id)
+        queue.status(job_id)   # {"state": "antri"|"jalan"|"selesai"|"gagal", "stage", "sheets", ...}
+        queue.result(job_id)   # OUTPUT_FILE (path / BytesIO) kalau selesai
+    """
+    def __init__(self, workers=None, keep_finished=None, keep_bytes=None):
+        self.keep_finished = CONFIG.get("JOB_HISTORY_MAX", 50) if keep_finished is None else keep_finished
+        self.keep_bytes = CONFIG.get("JOB_HISTORY_MAX_MB", 256) * 1024 * 1024 if keep_bytes is None else keep_bytes
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # owner → list job_id antri (urutan key = giliran round-robin)
+        self._records = OrderedDict()  # job_id → record (urut submit)
+        workers = CONFIG.get("JOB_WORKERS", 1) if workers is None else workers
+        for i in range(max(1, workers)):
+            threading.Thread(target=self._worker, name=f"etl-job-{i}", daemon=True).start()
+
+    def submit(self, job, owner="default", stage_cache=None, label=None):
+        """Masukkan job ke antrian pemilik `owner`, return job_id (label: teks bebas untuk UI, mis. nama file)"""
+        with self._cond:
+            self._records[job.job_id] = {"job": job, "progress": job.progress, "owner": owner, "label": label,
+                                         "state": "antri", "stage_cache": stage_cache,
+                                         "submitted": time.time(), "started": None, "finished": None,
+                                         "output": None, "output_bytes": 0, "error": None}
+            self._queues.setdefault(owner, []).append(job.job_id)
+            self._cond.notify()
+        return job.job_id
+
+    def _take_next(self):
+        """Job berikutnya round-robin: pemilik paling depan, lalu pemilik itu pindah ke belakang"""
+        owner = next(iter(self._queues))
+        queue = self._queues.pop(owner)
+        job_id = queue.pop(0)
+        if queue:
+            self._queues[owner] = queue
+        return job_id
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queues:
+                    self._cond.wait()
+                record = self._records[self._take_next()]
+                record["state"], record["started"] = "jalan", time.time()
+            job = record["job"]
+            try:
+                output = job.run(stage_cache=record["stage_cache"])
+                update = {"state": "selesai", "output": output}
+            except Exception as e:
+                job.report(stage="gagal")
+                update = {"state": "gagal", "error": f"{type(e).__name__}: {e}"}
+            finally:
+                job.cleanup()
+            output = update.get("output")
+            with self._cond:
+                # Lepas EtlJob (config berisi InputBuffer upload, cache memory) → yang tersisa status + output
+                record.update(update, finished=time.time(), job=None, stage_cache=None,
+                              output_bytes=output.getbuffer().nbytes if isinstance(output, io.BytesIO) else 0)
+                self._prune()
+            job = record = update = output = None  # jangan tahan job terakhir selama menunggu antrian
+
+    def _prune(self):
+        """Buang job selesai terlama sampai jumlah <= keep_finished dan total output <= keep_bytes
+        
+        Job yang baru selesai selalu disimpan (output-nya belum sempat di-download).
+        """
+        finished = [job_id for job_id, r in self._records.items() if r["finished"] is not None]
+        total = sum(self._records[job_id]["output_bytes"] for job_id in finished)
+        for i, job_id in enumerate(finished[:-1]):
+            if len(finished) - i <= self.keep_finished and total <= self.keep_bytes:
+                break
+            total -= self._records.pop(job_id)["output_bytes"]
+
+    def release_output(self, job_id):
+        """Lepas output job (sudah di-download); status tetap ada, result() jadi None"""
+        with self._cond:
+            record = self._records.get(job_id)
+            if record and record["finished"] is not None:
+                record.update(output=None, output_bytes=0, released=True)
+
+    def _position(self, job_id):
+        """Posisi di antrian global (1 = berikutnya) sesuai urutan round-robin"""
+        queues = [list(q) for q in self._queues.values()]
+        order = []
+        while any(queues):
+            for q in queues:
+                if q:
+                    order.append(q.pop(0))
+        return order.index(job_id) + 1 if job_id in order else None
+
+    def status(self, job_id):
+        """Snapshot status job (None kalau job_id tidak dikenal / sudah dibuang dari riwayat)"""
+        with self._cond:
+            record = self._records.get(job_id)
+            if record is None:
+                return None
+            progress = record["progress"]
+            end = record["finished"] or time.time()
+            return {"job_id": job_id, "owner": record["owner"], "label": record["label"], "state": record["state"],
+                    "position": self._position(job_id) if record["state"] == "antri" else None,
+                    "stage": progress["stage"],
+                    "sheets": {name: dict(info) for name, info in progress["sheets"].items()},
+                    "released": record.get("released", False),
+                    "elapsed": end - record["started"] if record["started"] else 0.0,
+                    "error": record["error"]}
+
+    def result(self, job_id):
+        """OUTPUT_FILE job yang sudah selesai, None kalau belum selesai / gagal"""
+        with self._cond:
+            record = self._records.get(job_id)
+            return record["output"] if record and record["state"] == "selesai" else None
+
+    def jobs_for(self, owner):
+        """job_id milik `owner` (urut submit)"""
+        with self._cond:
+            return [job_id for job_id, r in self._records.items() if r["owner"] == owner]
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="ETL Dashboard Pendapatan (konfigurasi file di CONFIG)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass cache parsing: selalu baca ulang semua Excel")
+    parser.add_argument("--clear-cache", action="store_true", help="Hapus isi cache parsing lalu keluar")
+    parser.add_argument("--no-prefetch", action="store_true", help="Jangan parse input paralel di awal run")
+    parser.add_argument("--batch", nargs="+", metavar="LAMPIRAN", help="Mode batch: file Lampiran per bulan (urut), template = TEMPLATE_FILE")
+    parser.add_argument("--batch-start", default="Januari", help="Bulan file Lampiran pertama di mode batch (default Januari)")
+    parser.add_argument("--jobs", metavar="FILE.json", help="Jalankan beberapa job paralel: list override CONFIG (JSON)")
+    parser.add_argument("--values", action="store_true", help="Mode values: SUMIF Dashboard ditulis sebagai angka (+ sheet audit rumus)")
+    parser.add_argument("--no-audit", action="store_true", help="Mode values tanpa sheet 'Audit Rumus'")
+    parser.add_argument("--no-cached-values", action="store_true", help="Jangan hitung cached value rumus di Python")
+    parser.add_argument("--history-dir", metavar="DIR", help="Aktifkan history Parquet per bulan di folder ini (wajib --tahun)")
+    parser.add_argument("--tahun", type=int, help="Tahun laporan BULAN_INI (wajib kalau history aktif)")
+    parser.add_argument("--history", type=int, metavar="TAHUN", help="Tampilkan Stand Alone per bulan dari history Parquet lalu keluar")
+    parser.add_argument("--profile-report", metavar="FILE.json", help="Tulis report waktu/CPU/memory/rows per stage (JSON)")
+    parser.add_argument("--profile-memory", action="store_true", help="Peak memory per stage via tracemalloc (lebih lambat)")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"], help="Profil level fungsi untuk seluruh run")
+    parser.add_argument("--profile-out", metavar="FILE", help="File output --profile (default etl_profile.prof / .html)")
+    args = parser.parse_args()
+    
+    if args.clear_cache:
+        removed = get_frame_cache().clear()
+        print(f"🧹 Cache dibersihkan: {removed} file dihapus dari '{CONFIG['CACHE_DIR']}'")
+        raise SystemExit(0)
+    if args.history_dir:
+        CONFIG["HISTORY_DIR"] = args.history_dir
+    if args.history:
+        if not CONFIG["HISTORY_DIR"]:
+            parser.error("--history butuh --history-dir (atau CONFIG['HISTORY_DIR'])")
+        df_hist = HistoryStore(CONFIG["HISTORY_DIR"]).query("dashboard", args.history)
+        if df_hist.empty:
+            print(f"ℹ️  Belum ada history tahun {args.history} di '{CONFIG['HISTORY_DIR']}'")
+        else:
+            df_hist = df_hist[~df_hist["grand_total"]]
+            print(f"📚 Stand Alone per kode tahun {args.history} (year-to-date dari history):")
+            print(df_hist.pivot_table(index="kode", columns="bulan", values="stand_alone", aggfunc="sum", margins=True, margins_name="YTD").to_string())
+        raise SystemExit(0)
+    if args.tahun:
+        CONFIG["TAHUN"] = args.tahun
+    if args.no_cache:
+        CONFIG["USE_CACHE"] = False
+    if args.no_prefetch:
+        CONFIG["PREFETCH_WORKERS"] = 0
+    if args.values:
+        CONFIG["OUTPUT_MODE"] = "values"
+    if args.no_audit:
+        CONFIG["AUDIT_SHEET"] = False
+    if args.no_cached_values:
+        CONFIG["CACHED_VALUES"] = False
+    if args.profile_report:
+        CONFIG["PROFILE_REPORT"] = args.profile_report
+    if args.profile_memory:
+        CONFIG["PROFILE_MEMORY"] = True
+    
     try:
-        m1, m2, raw, kode_nama_map = extract_data()
-        final = transform_data(m1, m2, raw, kode_nama_map)
-        load_data(final)
+        if args.jobs:
+            with open(args.jobs, encoding="utf-8") as f:
+                job_configs = json.load(f)
+            results = run_jobs([EtlJob(config) for config in job_configs])
+            if any(result["error"] for result in results):
+                raise SystemExit(1)
+        elif args.batch:
+            run_with_code_profiler(lambda: run_batch(args.batch, bulan_mulai=args.batch_start, job=default_job()),
+                                   args.profile, args.profile_out)
+        else:
+            run_with_code_profiler(default_job().run, args.profile, args.profile_out)
     except FileNotFoundError as e:
         print(f"\n❌ FILE ERROR: {e}")
         print("💡 Pastikan semua file input ada di folder yang sama dengan script ini.")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Layout flat (main.py di root repo): pastikan modul root bisa di-import dari tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+import benchmark
+import main
+
+
+def make_rows(rows):
+    return pd.DataFrame(rows, columns=["Customer Number", "Customer Name", "Nilai"])
+
+
+@pytest.mark.parametrize("cust_no, cust_name, rule", [
+    (2000000001, "Grand Total", "grand_total"),
+    ("Grand Total", None, "grand_total"),
+    ("Digital Platform", "Digital Platform", "customer_number_not_digit"),
+    ("12A45678", "PT A", "customer_number_not_digit"),
+    (1234567, "PT Pendek", "customer_number_too_short"),
+    (2000000002, " PLN Group ", "summary_name_exact"),
+    (2000000003, "Retail", "summary_name_exact"),
+    (2000000004, "Sum of Revenue", "summary_name_keyword"),
+    (2000000005, "Row Labels", "summary_name_keyword"),
+])
+def test_rule_drops_row(cust_no, cust_name, rule):
+    df = make_rows([(cust_no, cust_name, 1), (2000000099, "PT Valid", 2)])
+    kept, report = main.cleanse_customer_rows(df)
+    assert kept["Customer Name"].tolist() == ["PT Valid"]
+    assert report[rule] == 1
+    assert sum(report.values()) == 1
+
+
+def test_valid_rows_kept():
+    df = make_rows([
+        (2000000001, "PT Retail Nusantara", 1),   # 'retail' hanya exact match
+        ("20000000.02", "PT Titik", 2),            # titik & '.0' dibuang sebelum cek digit
+        (12345678.0, "PT Float", 3),
+    ])
+    kept, report = main.cleanse_customer_rows(df)
+    assert len(kept) == 3
+    assert set(report.values()) == {0}
+
+
+def test_drop_counted_at_first_matching_rule():
+    # Kena grand_total, customer_number_not_digit & summary_name_keyword → dihitung di rule pertama saja
+    df = make_rows([("Grand Total", "Sum of Value", 1), ("abc", "Subtotal", 2)])
+    kept, report = main.cleanse_customer_rows(df)
+    assert kept.empty
+    assert report == {"grand_total": 1, "customer_number_not_digit": 1, "customer_number_too_short": 0,
+                      "summary_name_exact": 0, "summary_name_keyword": 0}
+
+
+def test_rule_order_and_names():
+    assert [name for name, _, _ in main.ROW_CLEANSING_RULES] == [
+        "grand_total", "customer_number_not_digit", "customer_number_too_short",
+        "summary_name_exact", "summary_name_keyword"]
+
+
+def test_without_customer_name_column():
+    df = pd.DataFrame({"Customer Number": [2000000001, 12], "Nilai": [1, 2]})
+    kept, report = main.cleanse_customer_rows(df)
+    assert kept["Customer Number"].tolist() == [2000000001]
+    assert report["customer_number_too_short"] == 1
+
+
+def test_matches_legacy_row_wise_filter():
+    df = benchmark.make_konsol_frame(2000, n_products=5, seed=3)
+    kept, report = main.cleanse_customer_rows(df)
+    legacy = benchmark.legacy_cleanse_customer_rows(df)
+    pd.testing.assert_frame_equal(kept, legacy)
+    assert sum(report.values()) == len(df) - len(legacy)
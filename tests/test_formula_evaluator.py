@@ -0,0 +1,116 @@
+import io
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+
+import main
+
+# Dashboard!A{row}: (rumus, hasil Excel)
+DASHBOARD = [
+    ("=SUM(Data!B2:B6)", 18.5),                                 # teks di range diabaikan
+    ("=SUMIF(Data!A:A,\"A\",Data!B:B)", 11.0),                  # kolom penuh
+    ("=SUMIF(Data!$A$2:$A$6,\"B\",Data!$B$2)", 5.0),            # range jumlah ikut ukuran range kriteria
+    ("=SUBTOTAL(9,Data!B2:B7)", 18.5),                          # SUBTOTAL lain (B7) di range dilewati
+    ("=SUM(Data!B2:B7)", 37.0),                                 # SUM tetap menjumlah hasil SUBTOTAL
+    ("=(A1-A3)*2/4", 6.75),
+    ("=-A1+3", -15.5),
+    ("=SUMIF(Data!A2:A6,\"X\",Data!B2:B6)", 0.0),
+    ("=SUMIF(Data!A2:A6,C1,Data!B2:B6)", 11.0),                 # kriteria dari cell, case-insensitive
+    ("=SUMIF(Stream!A:A,\"A\",Stream!D:D)", 34.0),              # kolom rumus sheet stream
+    ("=SUBTOTAL(9,Stream!D2:D5)+A10", 114.0),
+    ("=SUM(Data!E2:E6)", 0.0),                                  # kolom kosong
+]
+UNSUPPORTED = ["=AVERAGE(Data!B2:B6)", "=A1/0", "=SUMIF(Data!A2:A6,\">1\",Data!B2:B6)", "=A16+1"]  # A16 = melingkar
+
+
+def make_workbook():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append(["Kode", "Nilai"])
+    for row in [("A", 10), ("B", 5), ("A", "teks"), ("C", 2.5), ("A", 1)]:
+        ws.append(row)
+    ws["B7"] = "=SUBTOTAL(9,B2:B6)"
+
+    dash = wb.create_sheet("Dashboard")
+    for r, (formula, _) in enumerate(DASHBOARD, 1):
+        dash.cell(r, 1).value = formula
+    for r, formula in enumerate(UNSUPPORTED, len(DASHBOARD) + 1):
+        dash.cell(r, 1).value = formula
+    dash["C1"] = "a"
+
+    stream_ws = wb.create_sheet("Stream")
+    stream_ws.append(["Kode", "X", "Y", "Total"])
+    df = pd.DataFrame({"Kode": ["A", "B", "A", "C"], "X": [1, 2, 3, 4], "Y": [10.0, None, 20.0, 40.0]})
+    stream = main.StreamedSheetRows(df, start_row=2, columns=[1, 2, 3], formulas={4: "=SUM(B{row}:C{row})*1"})
+    return wb, {"Stream": stream}
+
+
+@pytest.fixture
+def evaluated():
+    wb, streamed = make_workbook()
+    cached = main.FormulaEvaluator(wb, streamed).evaluate_workbook()
+    return wb, streamed, cached
+
+
+@pytest.mark.parametrize("row, expected", [(r, v) for r, (_, v) in enumerate(DASHBOARD, 1)])
+def test_known_values(evaluated, row, expected):
+    _, _, cached = evaluated
+    assert cached["Dashboard"][f"A{row}"] == pytest.approx(expected)
+
+
+def test_subtotal_on_plain_sheet(evaluated):
+    _, _, cached = evaluated
+    assert cached["Data"]["B7"] == pytest.approx(18.5)
+
+
+def test_unsupported_formulas_have_no_cached_value(evaluated):
+    _, _, cached = evaluated
+    for r in range(len(DASHBOARD) + 1, len(DASHBOARD) + len(UNSUPPORTED) + 1):
+        assert f"A{r}" not in cached["Dashboard"]
+
+
+def test_stream_formula_column_computed_per_row(evaluated):
+    _, streamed, _ = evaluated
+    stream = streamed["Stream"]
+    assert [v for _, v in stream.cached_values[4]] == ["<v>11</v>", "<v>2</v>", "<v>23</v>", "<v>44</v>"]
+
+
+def test_cached_values_readable_with_data_only(evaluated):
+    wb, streamed, cached = evaluated
+    out = io.BytesIO()
+    main.save_workbook_streaming(wb, out, streamed, cached_values=cached)
+    values = load_workbook(out, data_only=True)
+    dash = values["Dashboard"]
+    for r, (_, expected) in enumerate(DASHBOARD, 1):
+        assert dash.cell(r, 1).value == pytest.approx(expected)
+    assert dash.cell(len(DASHBOARD) + 1, 1).value is None
+    assert [values["Stream"].cell(r, 4).value for r in range(2, 6)] == [11, 2, 23, 44]
+    # Rumus tetap tersimpan (bukan diganti nilai)
+    assert load_workbook(out)["Dashboard"]["A1"].value == DASHBOARD[0][0]
+
+
+def test_parse_formula_cache_is_bounded_and_shared():
+    main._parse_formula_cached.cache_clear()
+    first = main.parse_formula("SUM(A1:A3)+1")
+    assert main.parse_formula("SUM(A1:A3)+1") is first
+    assert main._parse_formula_cached.cache_info().maxsize == main.FORMULA_CACHE_SIZE
+    with pytest.raises(main._FormulaUnsupported):
+        main.parse_formula("A1&B1")
+
+
+def test_sumif_totals_excel_matching_rules():
+    crit = pd.Series(["A", "a ", 5, "5", None, "B", "B", "C"])
+    values = pd.Series([1, 2, 3, 4, 100, "7", True, 2.5])
+    # Case-folding + strip, angka = teks angka, teks/boolean di range jumlah diabaikan, kriteria kosong dilewati
+    assert main.sumif_totals(crit, values) == {"a": 3.0, 5.0: 7.0, "c": 2.5}
+
+
+def test_values_mode_and_evaluator_agree(evaluated):
+    wb, streamed, cached = evaluated
+    aggregator = main.SumifAggregator(wb, streamed)
+    dash = wb["Dashboard"]
+    dash["E1"], dash["E2"] = "a", "=SUMIF(Stream!$A:$A,E1,Stream!$C:$C)"
+    expected = main.FormulaEvaluator(wb, streamed).cell("Dashboard", 2, 5)
+    assert aggregator.evaluate(dash, dash["E2"].value) == expected == 30.0
@@ -0,0 +1,121 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import main
+
+ROW3 = {1: "No", 2: "Nama Pelanggan", 3: "nama_pelanggan", 4: None, 5: "Customer  Number", 7: 2024,
+        8: "Kumulatif Januari", 9: "Stand Alone Januari", 10: "Kumulatif Februari", 11: "hargaInstallasi",
+        12: "  Alamat ", 40: "ID-Pelanggan", 99: "Kolom 99", 120: "Di luar scan"}
+RAW_COLUMNS = ["namaPelanggan", "Customer Number", "alamat", "ID Pelanggan", "Kolom99", "diluarscan", "tidak ada", "2024"]
+
+
+def make_sheet():
+    ws = Workbook().active
+    ws.cell(1, 1).value = "Laporan"
+    ws.cell(2, 6).value = "Periode"
+    ws.cell(2, 30).value = "BULAN BERJALAN"
+    ws.cell(4, 3).value = "Bulan berjalan (lama)"
+    for col, value in ROW3.items():
+        if value is not None:
+            ws.cell(3, col).value = value
+    return ws
+
+
+# --- Implementasi lama (scan ws.cell per posisi, range(1, 100)) sebagai pembanding ---
+def legacy_template_headers(ws, max_col=100):
+    headers = []
+    for col in range(1, max_col):
+        val = ws.cell(3, col).value
+        if val:
+            headers.append((col, str(val).strip()))
+    return headers
+
+
+def legacy_map(ws, raw_columns):
+    template_headers = legacy_template_headers(ws)
+    raw_to_template = {}
+    for raw_col in raw_columns:
+        raw_clean = main.clean_header(raw_col)
+        for template_col_idx, template_col_name in template_headers:
+            if raw_clean == main.clean_header(template_col_name):
+                raw_to_template[raw_col] = template_col_idx
+                break
+    return raw_to_template
+
+
+def legacy_bulan_berjalan(ws):
+    for row_idx in range(1, 6):
+        for col_idx in range(1, 100):
+            cell_val = ws.cell(row_idx, col_idx).value
+            if cell_val and "bulan berjalan" in str(cell_val).lower():
+                return row_idx, col_idx
+    return None
+
+
+def legacy_find_column_by_name(ws, col_name, header_row=3, fuzzy=True):
+    col_clean = main.clean_header(col_name)
+    for col_idx in range(1, ws.max_column + 1):
+        cell_val = ws.cell(header_row, col_idx).value
+        if not cell_val:
+            continue
+        cell_clean = main.clean_header(str(cell_val))
+        if fuzzy:
+            if col_clean in cell_clean or cell_clean in col_clean:
+                return col_idx
+        elif col_clean == cell_clean:
+            return col_idx
+    return None
+
+
+@pytest.fixture
+def index():
+    return main.SheetHeaderIndex.from_worksheet(make_sheet(), rows=range(1, 6), max_col=99)
+
+
+def test_row_matches_legacy_scan(index):
+    assert index.row(3) == legacy_template_headers(make_sheet())
+
+
+def test_mapping_matches_legacy_scan(index):
+    expected = legacy_map(make_sheet(), RAW_COLUMNS)
+    assert {raw: index.find(raw, row=3) for raw in RAW_COLUMNS if index.find(raw, row=3) is not None} == expected
+
+
+def test_find_text_matches_legacy_scan(index):
+    assert index.find_text("bulan berjalan") == legacy_bulan_berjalan(make_sheet()) == (2, 30)
+
+
+@pytest.mark.parametrize("name", ["Nama Pelanggan", "nama", "Kumulatif", "harga", "Alamat", "ID", "2024", "xyz"])
+@pytest.mark.parametrize("fuzzy", [True, False])
+def test_find_column_by_name_matches_legacy(name, fuzzy):
+    ws = make_sheet()
+    assert main.find_column_by_name(ws, name, fuzzy=fuzzy) == legacy_find_column_by_name(make_sheet(), name, fuzzy=fuzzy)
+
+
+def test_columns_with_matches_legacy_dashboard_scan(index):
+    ws = make_sheet()
+    legacy_lalu = next((c.column for c in ws[3] if "januari" in str(c.value).lower() and "kumulatif" in str(c.value).lower()), None)
+    legacy_month = [c.column for c in ws[3] if "januari" in str(c.value).lower()]
+    assert next(iter(index.columns_with("januari", "kumulatif", row=3)), None) == legacy_lalu == 8
+    assert index.columns_with("januari", row=3) == legacy_month == [8, 9]
+
+
+def test_from_cells_equals_from_worksheet(index):
+    ws = make_sheet()
+    cells = {(r, c): ws.cell(r, c).value for r in range(1, 6) for c in range(1, 100) if ws.cell(r, c).value is not None}
+    assert main.SheetHeaderIndex.from_cells(cells).entries == index.entries
+
+
+def test_from_worksheet_does_not_create_cells():
+    ws = make_sheet()
+    before = len(main.sheet_cells(ws))
+    main.SheetHeaderIndex.from_worksheet(ws, rows=range(1, 6), max_col=149)
+    assert len(main.sheet_cells(ws)) == before
+
+
+def test_find_row_matches_legacy_iterrows():
+    df = pd.DataFrame([["Row Labels", None, None], ["x", "Customer Name", "Customer No"], ["customer number", 1, 2]])
+    legacy = next(i for i, r in df.iterrows()
+                  if any(k in r.astype(str).str.lower().tolist() for k in ["customer no", "customer name", "customer number"]))
+    assert main.SheetHeaderIndex.from_frame(df).find_row({"customer no", "customer name", "customer number"}) == legacy == 1
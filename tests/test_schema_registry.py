@@ -0,0 +1,130 @@
+import json
+import threading
+
+import pytest
+
+import main
+
+TEMPLATE = {(3, 1): "No", (3, 2): "Nama Pelanggan", (3, 3): "Customer Number", (3, 4): "Alamat", (3, 5): "Harga Installasi"}
+SPECIAL = {"namaPerusahaan": "Nama Pelanggan"}
+RAW_A = ["customerNumber", "namaPerusahaan", "alamat", "hargaInstalasi"]
+RAW_B = ["customerNumber", "namaPerusahaan", "alamatt", "hargaInstalasi", "kolomBaru"]
+
+
+def headers(cells=TEMPLATE):
+    return main.SheetHeaderIndex.from_cells(cells)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "schema.json")
+
+
+def resolve(path, raw, cells=TEMPLATE, special=SPECIAL):
+    return main.SchemaMappingRegistry(path).resolve("Data Pelanggan", raw, headers(cells), special)
+
+
+def forbid_compute(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("mapping dihitung ulang, seharusnya hit registry")
+    monkeypatch.setattr(main.SchemaMappingRegistry, "compute", staticmethod(fail))
+
+
+def test_miss_computes_and_persists(path):
+    mapping, drift = resolve(path, RAW_A)
+    assert mapping == {"customerNumber": 3, "namaPerusahaan": 2, "alamat": 4}
+    assert drift is None
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)["Data Pelanggan"]
+    assert len(entries) == 1
+    assert next(iter(entries.values()))["raw"] == RAW_A
+
+
+def test_hit_reuses_mapping_without_compute(path, monkeypatch):
+    first, _ = resolve(path, RAW_A)
+    forbid_compute(monkeypatch)
+    mapping, drift = resolve(path, RAW_A)
+    assert mapping == first
+    assert drift is None
+
+
+def test_drift_on_new_schema(path):
+    resolve(path, RAW_A)
+    mapping, drift = resolve(path, RAW_B)
+    assert mapping == {"customerNumber": 3, "namaPerusahaan": 2}
+    assert drift["raw_added"] == ["kolomBaru"]
+    assert drift["raw_renamed"] == [("alamat", "alamatt")]
+    assert drift["raw_missing"] == []
+    assert drift["raw_unmapped"] == ["kolomBaru", "alamatt"]
+    assert drift["template_lost"] == ["Alamat"]
+    assert drift["special_changed"] is False
+
+
+def test_drift_on_template_change(path):
+    resolve(path, RAW_A)
+    moved = {**TEMPLATE, (3, 6): TEMPLATE[(3, 4)], (3, 4): "Kota"}
+    mapping, drift = resolve(path, RAW_A, cells=moved)
+    assert mapping["alamat"] == 6
+    assert drift["template_added"] == ["Kota"]
+    assert drift["template_moved"] == [("Alamat", 4, 6)]
+    assert drift["raw_added"] == drift["raw_missing"] == []
+
+
+def test_drift_on_special_mapping_change(path):
+    resolve(path, RAW_A)
+    _, drift = resolve(path, RAW_A, special={})
+    assert drift["special_changed"] is True
+
+
+def test_return_to_old_schema_reports_drift_and_reuses_mapping(path, monkeypatch):
+    mapping_a, _ = resolve(path, RAW_A)
+    resolve(path, RAW_B)
+    forbid_compute(monkeypatch)
+    mapping, drift = resolve(path, RAW_A)     # A → B → A: beda dengan run sebelumnya (B)
+    assert mapping == mapping_a
+    assert drift["raw_missing"] == ["kolomBaru"]
+    assert drift["raw_renamed"] == [("alamatt", "alamat")]
+    _, drift = resolve(path, RAW_A)           # A lagi: tidak ada drift
+    assert drift is None
+
+
+def test_non_string_labels_kept(path):
+    raw = [2024, "customerNumber", 3.5]
+    resolve(path, raw, cells={**TEMPLATE, (3, 7): "2024"})
+    mapping, _ = resolve(path, raw, cells={**TEMPLATE, (3, 7): "2024"})
+    assert mapping == {2024: 7, "customerNumber": 3}
+
+
+def test_oldest_entries_evicted(path, monkeypatch):
+    monkeypatch.setattr(main.SchemaMappingRegistry, "MAX_ENTRIES", 3)
+    for i in range(5):
+        resolve(path, RAW_A + [f"extra{i}"])
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)["Data Pelanggan"]
+    assert [e["raw"][-1] for e in entries.values()] == ["extra2", "extra3", "extra4"]
+
+
+def test_without_path_nothing_written(tmp_path):
+    mapping, drift = main.SchemaMappingRegistry(None).resolve("Data OPT", RAW_A, headers(), SPECIAL)
+    assert mapping["customerNumber"] == 3 and drift is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_parallel_jobs_keep_all_entries(path):
+    errors = []
+
+    def run(i):
+        try:
+            resolve(path, RAW_A + [f"job{i}"])
+        except Exception as e:  # dilaporkan lewat assert di bawah
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)["Data Pelanggan"]
+    assert sorted(e["raw"][-1] for e in entries.values()) == sorted(f"job{i}" for i in range(8))
@@ -0,0 +1,89 @@
+import datetime
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+
+import main
+
+HEADER = ["Nomor", "Nama", "Rumus", "Nilai", "Aktif", "Tanggal", "Rumus SUM", "Jam"]
+COLUMNS = [1, 2, 4, 5, 6, 8]   # layout kolom jarang: kolom 3 & 7 diisi rumus row
+FORMULAS = {3: "=A{row}*2", 7: "=SUM(A{row}:D{row})+$A$1"}
+
+
+def make_frame():
+    return pd.DataFrame({
+        "Nomor": [1, 2, 3, 4],
+        "Nama": ["PT A", " spasi depan", "#N/A", None],
+        "Nilai": [1.5, np.nan, 1e20, -0.1],
+        "Aktif": [True, False, None, True],
+        "Tanggal": [datetime.datetime(2024, 1, 31, 8, 30), datetime.date(2024, 2, 1), pd.NaT, None],
+        "Jam": [datetime.time(7, 15), None, datetime.timedelta(hours=5), "teks & <xml>"],
+    })
+
+
+def make_workbook():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    for c, name in enumerate(HEADER, 1):
+        ws.cell(1, c).value = name
+    return wb
+
+
+def save_with_openpyxl(df):
+    """Referensi: tulis cell per cell lewat openpyxl lalu wb.save()"""
+    wb = make_workbook()
+    ws = wb["Data"]
+    for i, row in enumerate(df.itertuples(index=False, name=None)):
+        r = 2 + i
+        for col, value in zip(COLUMNS, row):
+            if value is not None and not (not isinstance(value, str) and pd.isna(value)):
+                ws.cell(r, col).value = value
+        for col, formula in FORMULAS.items():
+            ws.cell(r, col).value = formula.format(row=r)
+    out = io.BytesIO()
+    wb.save(out)
+    return out
+
+
+def save_streamed(df, chunk_rows=2):
+    wb = make_workbook()
+    stream = main.StreamedSheetRows(df, start_row=2, chunk_rows=chunk_rows, columns=COLUMNS, formulas=FORMULAS)
+    out = io.BytesIO()
+    main.save_workbook_streaming(wb, out, {"Data": stream})
+    assert stream.rows_written == len(df)
+    return out
+
+
+def cells(buffer):
+    ws = load_workbook(buffer)["Data"]
+    return ws.dimensions, {(c.row, c.column): (c.value, c.data_type, c.number_format)
+                           for row in ws.iter_rows() for c in row if c.value is not None}
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 2000])
+def test_streamed_sheet_equals_openpyxl_writer(chunk_rows):
+    df = make_frame()
+    assert cells(save_streamed(df, chunk_rows)) == cells(save_with_openpyxl(df))
+
+
+def test_streamed_sheet_without_rows_keeps_header():
+    df = make_frame().iloc[0:0]
+    assert cells(save_streamed(df)) == cells(save_with_openpyxl(df))
+
+
+def test_compiled_row_formula_matches_template_row():
+    template = "=SUM(AY4:BJ4)+$A$4*{1}"
+    compiled = main.compile_row_formula(template, template_row=4)
+    assert compiled.format(row=4) == template
+    assert compiled.format(row=10) == "=SUM(AY10:BJ10)+$A$4*{1}"
+
+
+def test_illegal_characters_rejected():
+    df = pd.DataFrame({"Nama": ["ok", "bel\x07"]})
+    wb = make_workbook()
+    with pytest.raises(Exception, match="cannot be used in worksheets"):
+        main.save_workbook_streaming(wb, io.BytesIO(), {"Data": main.StreamedSheetRows(df, columns=[2])})